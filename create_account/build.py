@@ -50,6 +50,7 @@ def build_exe():
         "--name=CreateAccount",         # exe 名稱
         "--clean",                      # 清理暫存檔
         "--noupx",                      # 不使用 UPX 壓縮（避免部分防毒軟體誤判）
+        "--paths=..",                   # 共用模組 jfw_common 位於上層目錄
         "main.py"
     ]
     
@@ -61,6 +62,7 @@ def build_exe():
         "--name=CreateAccount",         # exe 名稱
         "--clean",                      # 清理暫存檔
         "--noupx",                      # 不使用 UPX 壓縮
+        "--paths=..",                   # 共用模組 jfw_common 位於上層目錄
         "main.py"
     ]
     
@@ -4,6 +4,7 @@ import subprocess
 import time
 import platform
 import random
+import queue
 import threading
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -11,7 +12,47 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+
+# 共用模組（jfw_common）位於專案根目錄
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from jfw_common.driver_pool import DriverPool, is_driver_alive
+from jfw_common.driver_resolver import resolve_chromedriver
+from jfw_common import waits, endpoints, tracing, metrics
+from jfw_common.cli import build_parser, add_journal_arguments, add_session_arguments, apply_common_arguments
+from jfw_common.work_queue import WorkerPool, JobFailed
+from jfw_common.scheduling import StepTimings, longest_first
+from jfw_common.journal import RunJournal
+from jfw_common.ledger import LedgerWriter, FORMATS as LEDGER_FORMATS
+from jfw_common.session_store import open_store
+
+
+# 同一個瀏覽器最多服務幾個代理後重新啟動
+DRIVER_MAX_USES = 20
+
+# 預設同時處理的用戶數（可用 --workers 調整）
+MAX_WORKERS = 5
+
+# 同一個序號發生錯誤（瀏覽器掛掉、頁面逾時）後最多重試幾次
+MAX_SLOT_RETRIES = 2
+
+# risk_control 的結果：已確認創建 / 已按下創建但無法確認 / 尚未送出就失敗
+RISK_CREATED = "created"
+RISK_SUBMITTED = "submitted"
+RISK_NOT_SUBMITTED = "not_submitted"
+
+
+class SlotNotSubmitted(Exception):
+    """封控流程在按下「創建」前失敗（重試是安全的，重試用完才視為帳號已滿）"""
+
+# 沒有歷史紀錄時的步驟預估耗時（秒），每隻帳號合計約 45 秒
+LOGIN_DEFAULT_SECONDS = 20
+ACCOUNT_STEP_DEFAULTS = {
+    "agent_control": 12,
+    "create_account": 10,
+    "set_credit_limit": 5,
+    "hold_position": 8,
+    "risk_control": 10,
+}
 
 
 # ============================
@@ -23,7 +64,7 @@ def safe_click(driver, element, retry=3):
         try:
             # 先捲動到元素位置
             driver.execute_script("arguments[0].scrollIntoView({behavior: 'auto', block: 'center'});", element)
-            time.sleep(0.3)
+            waits.element_stable(driver, element, timeout=3, label="捲動到元素")
             
             # 等待元素可點擊
             WebDriverWait(driver, 5).until(lambda d: element.is_displayed() and element.is_enabled())
@@ -38,7 +79,7 @@ def safe_click(driver, element, retry=3):
                     driver.execute_script("arguments[0].click();", element)
                     return True
                 except:
-                    time.sleep(0.5)
+                    waits.pause(0.5, label="點擊重試間隔")
             else:
                 print(f"點擊失敗：{e}")
                 raise
@@ -51,7 +92,7 @@ def safe_send_keys(driver, element, text, retry=3):
         try:
             # 先捲動到元素位置
             driver.execute_script("arguments[0].scrollIntoView({behavior: 'auto', block: 'center'});", element)
-            time.sleep(0.3)
+            waits.element_stable(driver, element, timeout=3, label="捲動到元素")
             
             # 等待元素可互動
             WebDriverWait(driver, 5).until(lambda d: element.is_displayed() and element.is_enabled())
@@ -63,7 +104,7 @@ def safe_send_keys(driver, element, text, retry=3):
         except Exception as e:
             if attempt < retry - 1:
                 print(f"輸入失敗 (嘗試 {attempt + 1}/{retry})，重試中...")
-                time.sleep(0.5)
+                waits.pause(0.5, label="輸入重試間隔")
             else:
                 print(f"輸入失敗：{e}")
                 raise
@@ -71,14 +112,13 @@ def safe_send_keys(driver, element, text, retry=3):
 
 
 # ============================
-# 建立 Chrome Driver(使用 ChromeDriverManager)
+# 建立 Chrome Driver(使用本機快取的 chromedriver)
 # ============================
 def create_driver():
-    """建立 Selenium ChromeDriver（使用 ChromeDriverManager 自動下載）"""
+    """建立 Selenium ChromeDriver（chromedriver 每個行程只解析一次，並快取到本機）"""
 
-    # 直接使用 ChromeDriverManager 自動下載對應版本的 chromedriver
-    print("使用 ChromeDriverManager 自動下載 chromedriver...")
-    driver_path = ChromeDriverManager().install()
+    # 快取沒有對應版本時才會透過 ChromeDriverManager 下載
+    driver_path = resolve_chromedriver()
 
     # ============================
     # Chrome Options
@@ -168,15 +208,18 @@ def generate_random_name():
 #  讀取用戶資訊
 # ============================
 
-def read_user_info():
-    """從專案資料夾的用戶資訊.txt讀取帳號、密碼、創建數量"""
-    # 取得專案資料夾路徑（支援打包後的 exe）
+def get_base_dir():
+    """取得專案資料夾路徑（支援打包後的 exe）"""
     if getattr(sys, 'frozen', False):
         # 打包後的 exe，使用 exe 所在目錄
-        BASE_DIR = os.path.dirname(sys.executable)
-    else:
-        # 開發環境，使用 .py 檔案所在目錄
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+        return os.path.dirname(sys.executable)
+    # 開發環境，使用 .py 檔案所在目錄
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def read_user_info():
+    """從專案資料夾的用戶資訊.txt讀取帳號、密碼、創建數量"""
+    BASE_DIR = get_base_dir()
     
     info_file = os.path.join(BASE_DIR, "用戶資訊.txt")
     print(f"尋找用戶資訊檔案：{info_file}")
@@ -264,25 +307,6 @@ def get_desktop_path():
         return current_dir
 
 
-# ============================
-#  ⭐ 新增：帳號紀錄 TXT
-# ============================
-
-def init_agent_txt(agent_account, agent_password, txt_path):
-    """第一次登入代理就建立 TXT 並寫入代理帳密（含中文標題）"""
-    if not os.path.exists(txt_path):
-        with open(txt_path, "w", encoding="utf-8") as f:
-            f.write("代理帳號,代理密碼\n")
-            f.write(f"{agent_account},{agent_password}\n")
-            f.write("遊戲帳號,遊戲密碼\n")   # 先寫標題，內容等最後 append
-
-
-def append_random_account(created_account, txt_path):
-    """封控後把隨機生成的遊戲帳號寫入 TXT"""
-    with open(txt_path, "a", encoding="utf-8") as f:
-        f.write(f"{created_account['account']},{created_account['password']}\n")
-
-
 # ============================
 #  登入代理帳號
 # ============================
@@ -302,7 +326,7 @@ def login(driver, account, password):
     try:
         # 等待頁面完全載入
         # print(f"[{account}] 等待登入頁面載入...")
-        time.sleep(3)
+        waits.settle(driver, timeout=15, label="登入頁載入")
 
         # === 3️⃣ 輸入帳號 ===
         print(f"[{account}] 尋找帳號輸入欄位...")
@@ -322,7 +346,8 @@ def login(driver, account, password):
         safe_click(driver, login_btn)
 
         # 等待跳轉完成
-        time.sleep(4) 
+        waits.url_changed(driver, "agent-login", timeout=15, label="登入跳轉")
+        waits.settle(driver, timeout=15, label="登入後載入")
 
     except Exception as e:
         print(f"[{account}] 登入時發生錯誤：{e}")
@@ -344,10 +369,8 @@ def agent_control(driver, account, is_first_time=True):
 
     wait = WebDriverWait(driver, 15)
 
-    if is_first_time:
-        time.sleep(10)  # 第一次等待頁面加載
-    else:
-        time.sleep(2)  # 第二次開始只需短暫等待
+    # 第一次需要等首頁完整載入，之後頁面已在快取中，通常立即完成
+    waits.settle(driver, timeout=30 if is_first_time else 10, label="代理控制-首頁載入")
 
     try:
         # === 1️⃣ 點擊「帳號管理」（只有第一次需要）===
@@ -356,42 +379,42 @@ def agent_control(driver, account, is_first_time=True):
             account_manage_btn = wait.until(EC.element_to_be_clickable((By.XPATH, account_manage_xpath)))
             account_manage_btn.click()
             # print(f"[{account}] ✔ 已點擊 帳號管理")
-            time.sleep(3)  # 等待頁面加載
+            waits.settle(driver, timeout=15, label="代理控制-帳號管理")  # 等待頁面加載
         
         # === 2️⃣ 點擊「代理帳號」 ===
         agent_button_xpath = "//span[text()='代理帳號']"
         agent_btn = wait.until(EC.element_to_be_clickable((By.XPATH, agent_button_xpath)))
         agent_btn.click()
         # print(f"[{account}] ✔ 已點擊 代理帳號")
-        time.sleep(5)  # 等待頁面加載
+        waits.settle(driver, timeout=15, label="代理控制-代理帳號")  # 等待頁面加載
 
         # === 3️⃣ 點擊「直屬玩家」 ===
         direct_member_xpath = "//div[text()='直屬玩家']"
         dm_btn = wait.until(EC.element_to_be_clickable((By.XPATH, direct_member_xpath)))
         dm_btn.click()
         # print(f"[{account}] ✔ 已點擊 直屬玩家")
-        time.sleep(2)  # 等待頁面加載
+        waits.settle(driver, timeout=15, label="代理控制-直屬玩家")  # 等待頁面加載
 
         # === 4️⃣ 點擊「創建信用/現金玩家」 ===
         create_button_xpath = "//span[contains(text(), '創建信用/現金玩家')]"
         create_btn = wait.until(EC.element_to_be_clickable((By.XPATH, create_button_xpath)))
         create_btn.click()
         # print(f"[{account}] ✔ 已點擊 創建信用/現金玩家")
-        time.sleep(2)  # 等待頁面加載
+        waits.settle(driver, timeout=15, label="代理控制-創建玩家選單")  # 等待頁面加載
 
         # === 5️⃣ 點擊「創建現金玩家」 ===
         cash_member_xpath = "//div[text()='創建現金玩家']"
         cash_btn = wait.until(EC.element_to_be_clickable((By.XPATH, cash_member_xpath)))
         cash_btn.click()
         # print(f"[{account}] ✔ 已點擊 創建現金玩家")
-        time.sleep(2)  # 等待頁面加載
+        waits.settle(driver, timeout=15, label="代理控制-創建現金玩家")  # 等待頁面加載
 
         # === 6️⃣ 點擊「確認」 ===        
         confirm_button_xpath = "//span[text()=' 確認 ']"
         confirm_btn = wait.until(EC.element_to_be_clickable((By.XPATH, confirm_button_xpath)))
         confirm_btn.click()
         # print(f"[{account}] ✔ 已點擊 確認")
-        time.sleep(5)  # 等待頁面加載
+        waits.settle(driver, timeout=15, label="代理控制-確認")  # 等待頁面加載
 
     except Exception as e:
         print(f"[{account}] agent_control 發生錯誤：{e}")
@@ -434,7 +457,7 @@ def create_account(driver, account):
         if ok_btn.is_displayed():
             print(f"[{account}] 偵測到彈窗 → 點擊 OK")
             safe_click(driver, ok_btn)
-            time.sleep(0.5)
+            waits.invisible(driver, ok_button_xpath, timeout=5, label="關閉彈窗")
     except:
         pass
 
@@ -445,17 +468,14 @@ def create_account(driver, account):
     random_switch = wait.until(EC.element_to_be_clickable((By.XPATH, random_switch_xpath)))
     safe_click(driver, random_switch)
     # print(f"[{account}] 已點擊隨機開關")
-    time.sleep(3)  # 等待帳號生成
 
-    # === 3️⃣ 讀取生成帳號 ===
+    # === 3️⃣ 讀取生成帳號（帳號一產生就繼續）===
     account_input = wait.until(
         EC.presence_of_element_located((By.XPATH, account_input_xpath))
     )
-    account_value = account_input.get_attribute("value")
-
-    if not account_value:
-        time.sleep(1)
-        account_value = account_input.get_attribute("value")
+    # 逾時直接拋出例外，交給 run_session 的重試流程（不能把 False 當成帳號寫入紀錄）
+    account_value = waits.input_filled(driver, account_input, timeout=10, label="等待隨機帳號",
+                                       raise_on_timeout=True)
 
     print(f"[{account}] 生成帳號：{account_value}")
 
@@ -484,12 +504,12 @@ def create_account(driver, account):
     safe_send_keys(driver, nickname_input, nickname)
 
     print(f"[{account}] 已輸入暱稱：{nickname}")
-    time.sleep(1)
+    waits.input_filled(driver, nickname_input, expected=nickname, timeout=5, label="暱稱輸入完成")
     
     # === 6️⃣ 點擊下一步 === 
     next1_button = wait.until(EC.element_to_be_clickable((By.XPATH, next1_button_xpath)))
     safe_click(driver, next1_button)
-    time.sleep(3)  # 等待下一頁加載
+    waits.settle(driver, timeout=15, label="創建帳號-下一步")  # 等待下一頁加載
 
     # 若要回傳整組資訊，可以這樣：
     return {
@@ -525,7 +545,7 @@ def set_credit_limit(driver, account):
     safe_send_keys(driver, credit_input, limit_value)
     # print(f"[{account}] 已輸入額度：{limit_value}")
 
-    time.sleep(0.3)
+    waits.input_filled(driver, credit_input, expected=limit_value, timeout=5, label="額度輸入完成")
 
     # === 3️⃣ 按下下一步 ===
     next_button = wait.until(
@@ -534,7 +554,7 @@ def set_credit_limit(driver, account):
     safe_click(driver, next_button)
 
     # print(f"[{account}] 已按下下一步（Next）")
-    time.sleep(3)  # 等待下一頁加載
+    waits.settle(driver, timeout=15, label="設定額度-下一步")  # 等待下一頁加載
 
 
 # ============================
@@ -553,13 +573,13 @@ def hold_position(driver, account):
     # 下滑到下一步按鈕
     driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", next_btn)
     # print(f"[{account}] 已下滑到下一步按鈕")
-    time.sleep(1)
+    waits.element_stable(driver, next_btn, timeout=5, label="下滑到下一步")
     
     # 點擊下一步
     next_btn = wait.until(EC.element_to_be_clickable((By.XPATH, next_btn_xpath)))
     safe_click(driver, next_btn)
     # print(f"[{account}] ✔ 已點擊下一步")
-    time.sleep(2)
+    waits.settle(driver, timeout=15, label="持倉-下一步")
 
     # === 2️⃣ 找到保存按鈕並下滑 ===
     save_btn_xpath = "//div[contains(@class, 'save') and text()='保存']"
@@ -568,26 +588,31 @@ def hold_position(driver, account):
     # 下滑到保存按鈕
     driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", save_btn)
     # print(f"[{account}] 已下滑到保存按鈕")
-    time.sleep(2)
+    waits.element_stable(driver, save_btn, timeout=5, label="下滑到保存")
 
     # === 3️⃣ 點擊保存 ===
     save_btn = wait.until(EC.element_to_be_clickable((By.XPATH, save_btn_xpath)))
     safe_click(driver, save_btn)
     # print(f"[{account}] ✔ 已點擊保存")
-    time.sleep(2)
+    waits.settle(driver, timeout=15, label="持倉-保存")
 
 
 # ============================
 #  risk_control
 # ============================
 
-def risk_control(driver, account):
+def risk_control(driver, account, on_submit=None):
     """
     封控（risk control）點擊下一步 → 點擊創建
-    返回值：True 表示成功，False 表示失敗（不應寫入 txt）
+    on_submit 在按下「創建」後立即呼叫（寫入執行紀錄），之後的失敗都不能重試
+    返回值：
+        RISK_CREATED：創建成功
+        RISK_SUBMITTED：已按下創建，但之後發生錯誤，無法確認帳號是否已建立
+        RISK_NOT_SUBMITTED：按下創建前就失敗（可能帳號已滿）
     """
 
     wait = WebDriverWait(driver, 15)
+    submitted = False
 
     # print(f"[{account}] 進入封控流程...")
     
@@ -597,104 +622,393 @@ def risk_control(driver, account):
         next_btn = wait.until(EC.element_to_be_clickable((By.XPATH, next_btn_xpath)))
         safe_click(driver, next_btn)
         # print(f"[{account}] ✔ 已點擊下一步")
-        time.sleep(3)
+        waits.settle(driver, timeout=15, label="封控-下一步")
         
         # === 2️⃣ 點擊創建(使用更精確的 XPath，避免點到創建會員)===
         create_btn_xpath = "//button[contains(@class, 'confirm-btn') and contains(., '創建')]"
         create_btn = wait.until(EC.element_to_be_clickable((By.XPATH, create_btn_xpath)))
         safe_click(driver, create_btn)
+        submitted = True
+        if on_submit is not None:
+            on_submit()
         # print(f"[{account}] ✔ 已點擊創建")
-        time.sleep(5)
+        waits.settle(driver, timeout=30, label="封控-創建")
         
         # === 3️⃣ 導回主頁面防止 bug ===
-        driver.get("https://ad.jfw-win.com/#/")
+        driver.get(endpoints.page_url(endpoints.HOME_ROUTE))
         # print(f"[{account}] ✔ 已導回主頁面")
-        time.sleep(2)
+        waits.settle(driver, timeout=15, label="導回主頁面")
         
         # === 4️⃣ 沒報錯就是成功 ===
         print(f"[{account}] ✔ 創建成功")
-        return True
+        return RISK_CREATED
         
     except Exception as e:
+        if submitted:
+            print(f"[{account}] ✗ 已按下創建，但無法確認結果: {e}")
+            return RISK_SUBMITTED
         print(f"[{account}] ✗ 創建失敗: {e}")
-        return False
+        return RISK_NOT_SUBMITTED
+
+# =======================================
+#  步驟耗時與排程預估
+# =======================================
+
+def run_step(timings, step, fn, *args):
+    """執行一個步驟並記錄耗時（啟用追蹤時同時記錄成 span）"""
+    start = time.perf_counter()
+    try:
+        with tracing.span(step):
+            return fn(*args)
+    finally:
+        timings.record(step, time.perf_counter() - start)
+
+
+def estimate_user_cost(user_info, timings, sessions=1):
+    """依歷史步驟耗時預估一個用戶的總耗時（秒），多個 session 時以最忙的 session 計算"""
+    per_account = sum(timings.mean(step, default) for step, default in ACCOUNT_STEP_DEFAULTS.items())
+    accounts_per_session = -(-user_info["create_count"] // max(1, sessions))  # 向上取整
+    return timings.mean("login", LOGIN_DEFAULT_SECONDS) + accounts_per_session * per_account
+
+
+# =======================================
+#  創建進度（寫入執行紀錄，中斷後可接續）
+# =======================================
+
+class UserProgress:
+    """
+    單一用戶的創建進度，同一代理的所有 session 共用（執行緒安全）
+    每成功創建一隻帳號就寫入執行紀錄，重新執行時只補上尚未處理的序號
+    已按下創建（account_submitted）或封控失敗的序號視為已結束，不會再創建一次
+    """
+
+    def __init__(self, user_info, journal):
+        self.agent = user_info["account"]
+        self.requested = user_info["create_count"]
+        self.journal = journal
+        self.retried = 0
+        self.failed = 0
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+        # 上次中斷前已確認創建的序號
+        self.confirmed = {
+            r["slot"]: {"account": r["account"], "password": r["password"]}
+            for r in journal.find("account_created", agent=self.agent)
+        }
+        # 已按下創建但沒有確認紀錄的序號（帳號可能已建立）
+        self.unconfirmed = {
+            r["slot"]: {"account": r["account"], "password": r["password"]}
+            for r in journal.find("account_submitted", agent=self.agent)
+            if r["slot"] not in self.confirmed
+        }
+        # 封控失敗（通常是帳號已滿）的序號
+        self.rejected = {r["slot"] for r in journal.find("slot_failed", agent=self.agent, rejected=True)}
+        self.resumed = len(self.confirmed)
+        self.created = []
+
+    @property
+    def created_total(self):
+        """已確認創建的數量（含上次中斷前完成的）"""
+        with self._lock:
+            return len(self.confirmed)
+
+    @property
+    def settled_total(self):
+        """已結束的序號數量（已創建、已送出但未確認、封控失敗）"""
+        with self._lock:
+            return len(set(self.confirmed) | set(self.unconfirmed) | self.rejected)
+
+    def mark_done_if_complete(self):
+        """全部序號都已結束時寫入 agent_done"""
+        if self.settled_total >= self.requested and not self.journal.find("agent_done", agent=self.agent):
+            self.journal.record("agent_done", agent=self.agent, requested=self.requested)
+
+    def pending_slots(self):
+        """尚未結束的序號"""
+        with self._lock:
+            settled = set(self.confirmed) | set(self.unconfirmed) | self.rejected
+        return [i for i in range(1, self.requested + 1) if i not in settled]
+
+    def unconfirmed_accounts(self):
+        """已送出但未確認的帳號（寫入帳號紀錄時加上未確認標記）"""
+        with self._lock:
+            return [dict(account, unconfirmed=True) for account in self.unconfirmed.values()]
+
+    def mark_submitted(self, slot, created_account):
+        """按下「創建」後立即呼叫：之後即使失敗也不再重試這個序號"""
+        self.journal.record("account_submitted", agent=self.agent, slot=slot,
+                            account=created_account["account"], password=created_account["password"])
+
+    def mark_unconfirmed(self, slot, created_account):
+        """已按下創建但無法確認結果"""
+        with self._lock:
+            self.unconfirmed[slot] = created_account
+        metrics.failures.inc(kind="unconfirmed")
+
+    def mark_created(self, slot, created_account):
+        with self._lock:
+            self.confirmed[slot] = created_account
+            self.unconfirmed.pop(slot, None)
+            self.created.append(created_account)
+        metrics.accounts_created.inc(agent=self.agent)
+        self.journal.record("account_created", agent=self.agent, slot=slot,
+                            account=created_account["account"], password=created_account["password"])
+
+    def mark_error(self, slot, error):
+        """
+        記錄一次失敗，回傳這個序號是否還要重試
+        封控在按下「創建」前失敗（SlotNotSubmitted）且重試次數用完時，
+        視為封控失敗（通常是帳號已滿），這個序號就此結束，之後的執行也不再處理
+        """
+        with self._lock:
+            attempts = self._attempts[slot] = self._attempts.get(slot, 0) + 1
+            retry = attempts <= MAX_SLOT_RETRIES
+            rejected = not retry and isinstance(error, SlotNotSubmitted)
+            if retry:
+                self.retried += 1
+            else:
+                self.failed += 1
+            if rejected:
+                self.rejected.add(slot)
+        metrics.failures.inc(kind="risk_control" if rejected else "create")
+        if rejected:
+            self.journal.record("slot_failed", agent=self.agent, slot=slot,
+                                attempt=attempts, error=str(error), retry=False, rejected=True)
+        else:
+            self.journal.record("slot_failed", agent=self.agent, slot=slot,
+                                attempt=attempts, error=str(error), retry=retry)
+        return retry
+
+    def summary(self):
+        with self._lock:
+            unconfirmed = len(self.unconfirmed)
+        return (f"要求 {self.requested}，已創建 {self.created_total}"
+                f"（本次 {len(self.created)}，先前 {self.resumed}），未確認 {unconfirmed}，"
+                f"重試 {self.retried}，失敗 {self.failed}")
+
 
 # =======================================
 #  單一用戶的工作流程
 # =======================================
 
-def process_user(user_info):
-    """處理單一用戶的帳號創建流程"""
+def open_session(driver, user_info, timings, tag, session_store=None):
+    """前往登入頁並登入代理；有保存的登入狀態且仍有效時直接沿用"""
     account = user_info["account"]
-    password = user_info["password"]
-    create_count = user_info["create_count"]
+    if session_store is not None:
+        if run_step(timings, "restore_login", session_store.restore, driver, account, endpoints.HOME_ROUTE):
+            print(f"[{tag}] 沿用已保存的登入狀態")
+            return
     
-    print(f"\n[{account}] ========== 開始處理 ==========")
-    print(f"[{account}] 將創建 {create_count} 隻帳號")
+    url = endpoints.page_url(endpoints.LOGIN_ROUTE)
+    print(f"[{tag}] 前往網站：{url}")
+    driver.get(url)
+    run_step(timings, "login", login, driver, account, user_info["password"])
+    if session_store is not None:
+        session_store.save(driver, account)
+
+
+@tracing.traced("session", cat="agent")
+def run_session(user_info, pool, timings, slots, ledger, tag, progress, session_store=None):
+    """
+    單一瀏覽器 session：登入代理後不斷從 slots 取出待創建的序號，直到佇列清空
+    同一代理開多個 session 時，每個 session 各自執行此函數
+
+    按下「創建」前發生例外時，該序號放回佇列重試（最多 MAX_SLOT_RETRIES 次），
+    並歸還目前的瀏覽器（已掛掉的直接關閉）、借一個新的重新登入後繼續；
+    封控送不出去的序號重試用完後才視為帳號已滿
+    按下「創建」後的序號一律不重試（避免重複創建），無法確認結果的以未確認寫入帳號紀錄
+    """
+    create_count = user_info["create_count"]
+    tracing.set_agent(user_info["account"])
     
+    driver = None
+    is_first_time = True
     try:
-        # 建立專屬的 driver
-        driver = create_driver()
-        
-        # 前往登入頁面
-        url = "https://ad.jfw-win.com/#/agent-login"
-        print(f"[{account}] 前往網站：{url}")
-        driver.get(url)
-        
-        # 登入
-        login(driver, account, password)
-        
-        # 建立 TXT 檔案（使用穩健的桌面路徑獲取方法）
-        desktop_path = get_desktop_path()
-        txt_path = os.path.join(desktop_path, f"{account}.txt")
-        print(f"[{account}]  TXT 檔案將儲存至：{txt_path}")
-        init_agent_txt(account, password, txt_path)
-        
-        # 循環創建帳號
-        for i in range(1, create_count + 1):
-            print(f"\n[{account}] ===== 開始創建第 {i}/{create_count} 隻帳號 =====")
-            
-            # 第一次執行需要點擊「帳號管理」，第二次開始不需要
-            is_first_time = (i == 1)
-            agent_control(driver, account, is_first_time)
-            created_account = create_account(driver, account)
-            print(f"[{account}] 本次創建的帳號：{created_account}")
-            
-            set_credit_limit(driver, account)
-            hold_position(driver, account)
+        while True:
+            try:
+                i = slots.get_nowait()
+            except queue.Empty:
+                break
             
-            # 執行封控並檢查是否成功
-            success = risk_control(driver, account)
+            try:
+                if driver is None:
+                    # 從連線池借出已啟動的 driver 並登入
+                    driver = pool.acquire()
+                    open_session(driver, user_info, timings, tag, session_store)
+                    is_first_time = True
+                
+                print(f"\n[{tag}] ===== 開始創建第 {i}/{create_count} 隻帳號 =====")
+                
+                # 每個 session 第一次執行需要點擊「帳號管理」，第二次開始不需要
+                run_step(timings, "agent_control", agent_control, driver, tag, is_first_time)
+                is_first_time = False
+                created_account = run_step(timings, "create_account", create_account, driver, tag)
+                print(f"[{tag}] 本次創建的帳號：{created_account}")
+                
+                run_step(timings, "set_credit_limit", set_credit_limit, driver, tag)
+                run_step(timings, "hold_position", hold_position, driver, tag)
+                
+                # 執行封控並檢查是否成功（按下創建的當下就寫入執行紀錄）
+                result = run_step(timings, "risk_control", risk_control, driver, tag,
+                                  lambda: progress.mark_submitted(i, created_account))
+                if result == RISK_NOT_SUBMITTED:
+                    # 尚未送出：交給下方的重試流程，重試用完才視為帳號已滿
+                    if not is_driver_alive(driver):
+                        raise RuntimeError("瀏覽器已失效")
+                    raise SlotNotSubmitted("封控失敗（尚未按下創建，可能帳號已滿）")
+                
+                # 已按下創建：之後記錄失敗只印出錯誤，絕不放回佇列（重試會重複創建）
+                try:
+                    if result == RISK_CREATED:
+                        # 成功才寫入 txt：先落地到執行紀錄，再交給背景寫入器批次寫檔
+                        try:
+                            progress.mark_created(i, created_account)
+                        finally:
+                            ledger.add(user_info["account"], created_account)
+                        print(f"[{tag}] ✓ 已記錄：{created_account}")
+                    else:
+                        # 帳號可能已建立：重試會重複創建，改以未確認寫入 txt 供人工核對
+                        try:
+                            progress.mark_unconfirmed(i, created_account)
+                        finally:
+                            ledger.add(user_info["account"], dict(created_account, unconfirmed=True))
+                        print(f"[{tag}] ? 無法確認是否創建成功，已標記為未確認：{created_account}")
+                except Exception as e:
+                    print(f"[{tag}] 第 {i} 隻帳號已送出，但寫入紀錄失敗（不重試）：{e}")
+                
+                if result == RISK_SUBMITTED:
+                    # 頁面狀態已不可信：歸還瀏覽器，下一個序號重新借用並登入
+                    broken = not is_driver_alive(driver)
+                    pool.release(driver, broken=broken)
+                    driver = None
             
-            if success:
-                # 只有成功才寫入 txt
-                append_random_account(created_account, txt_path)
-                print(f"[{account}] ✓ 已寫入：{created_account} → {txt_path}")
-            else:
-                # 失敗則不寫入，可能帳號已滿
-                print(f"[{account}] ✗ 創建失敗（可能帳號已滿），本次帳號不寫入 txt")
-                print(f"[{account}] 建議檢查代理帳號是否已達上限")
-        
-        print(f"\n[{account}] 全部 {create_count} 隻帳號創建完畢！")
-        print(f"[{account}] 5 秒後關閉瀏覽器...")
-        time.sleep(5)
+            except Exception as e:
+                broken = driver is not None and not is_driver_alive(driver)
+                print(f"[{tag}] 第 {i} 隻帳號發生錯誤：{e}")
+                if progress.mark_error(i, e):
+                    slots.put(i)
+                    print(f"[{tag}] 第 {i} 隻帳號稍後重試")
+                elif isinstance(e, SlotNotSubmitted):
+                    print(f"[{tag}] 第 {i} 隻帳號已重試 {MAX_SLOT_RETRIES} 次仍無法送出，視為帳號已滿，不寫入 txt")
+                    print(f"[{tag}] 建議檢查代理帳號是否已達上限")
+                else:
+                    print(f"[{tag}] 第 {i} 隻帳號已重試 {MAX_SLOT_RETRIES} 次，放棄")
+                
+                # 頁面狀態已不可信：歸還瀏覽器，下一個序號重新借用並登入
+                print(f"[{tag}] {'瀏覽器已失效' if broken else '頁面狀態異常'}，重新建立 session")
+                pool.release(driver, broken=broken)
+                driver = None
         
-        driver.quit()
-        print(f"[{account}] ========== 處理完成 ==========\n")
+        if driver is not None:
+            print(f"[{tag}] 等待頁面完成後歸還瀏覽器...")
+            waits.settle(driver, timeout=10, label="歸還前等待")
         
     except Exception as e:
-        print(f"[{account}] 發生錯誤：{e}")
-        try:
-            driver.quit()
-        except:
-            pass
+        print(f"[{tag}] 發生錯誤：{e}")
+    finally:
+        # 歸還瀏覽器（連線池會清除登入狀態，壞掉的瀏覽器會直接關閉）
+        pool.release(driver)
+
+
+@tracing.traced(cat="agent")
+def process_user(user_info, pool, timings, journal, ledger, sessions=1, session_store=None):
+    """
+    處理單一用戶的帳號創建流程（瀏覽器由連線池借出，步驟耗時記錄到 timings）
+    session_store 不為 None 時，登入前先嘗試沿用已保存的登入狀態
+    sessions > 1 時同一代理同時登入多個瀏覽器，待創建的帳號透過佇列分給各 session
+    執行紀錄中已確認的帳號不會重複創建，回傳 UserProgress
+    沒有全部創建完成時拋出 JobFailed（UserProgress 保留在 result），工作佇列會標記為失敗
+    """
+    account = user_info["account"]
+    password = user_info["password"]
+    create_count = user_info["create_count"]
+    tracing.set_agent(account)
+    
+    progress = UserProgress(user_info, journal)
+    pending = progress.pending_slots()
+    
+    print(f"\n[{account}] ========== 開始處理 ==========")
+    if progress.resumed:
+        print(f"[{account}] 執行紀錄中已創建 {progress.resumed}/{create_count} 隻，接續創建剩餘 {len(pending)} 隻")
+    if progress.unconfirmed:
+        print(f"[{account}] 執行紀錄中有 {len(progress.unconfirmed)} 隻已送出但未確認，不會重新創建，請人工核對")
+    if not pending:
+        ledger.open(account, password, os.path.join(get_desktop_path(), f"{account}.txt"),
+                    known=list(progress.confirmed.values()) + progress.unconfirmed_accounts())
+        progress.mark_done_if_complete()
+        metrics.agents_done.inc()
+        print(f"[{account}] ========== 已全部完成 ==========\n")
+        return progress
+    
+    sessions = max(1, min(sessions, len(pending)))
+    print(f"[{account}] 將創建 {len(pending)} 隻帳號（{sessions} 個瀏覽器同時進行）")
+    
+    # 建立 TXT 檔案（使用穩健的桌面路徑獲取方法）
+    # 執行紀錄中已確認（或已送出未確認）但 TXT 裡沒有的帳號（上次中斷前尚未寫檔）會一併補上
+    desktop_path = get_desktop_path()
+    txt_path = os.path.join(desktop_path, f"{account}.txt")
+    print(f"[{account}]  TXT 檔案將儲存至：{txt_path}")
+    ledger.open(account, password, txt_path,
+                known=list(progress.confirmed.values()) + progress.unconfirmed_accounts())
+    
+    # 待創建的序號佇列，所有 session 共用
+    slots = queue.Queue()
+    for i in pending:
+        slots.put(i)
+    
+    if sessions == 1:
+        run_session(user_info, pool, timings, slots, ledger, account, progress, session_store)
+    else:
+        threads = [
+            threading.Thread(
+                target=run_session,
+                args=(user_info, pool, timings, slots, ledger, f"{account}#{n}", progress, session_store),
+                name=f"{account}#{n}",
+            )
+            for n in range(1, sessions + 1)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
+    progress.mark_done_if_complete()
+    if not progress.pending_slots():
+        metrics.agents_done.inc()
+    
+    print(f"\n[{account}] {progress.summary()}")
+    print(f"[{account}] ========== 處理完成 ==========\n")
+    if progress.created_total < progress.requested:
+        raise JobFailed(progress.summary(), result=progress)
+    return progress
 
 
 # =======================================
 #  主程式 - 使用多線程處理多個用戶
 # =======================================
 
-def main():
+def parse_args(argv=None):
+    """解析命令列參數（直接執行時全部使用預設值）"""
+    parser = build_parser("自動創建帳號系統", default_workers=MAX_WORKERS)
+    parser.add_argument(
+        "--sessions-per-agent", type=int,
+        default=int(os.environ.get("JFW_SESSIONS_PER_AGENT", 1)),
+        help="同一代理同時登入幾個瀏覽器分攤創建數量（預設 1；平台若限制單一登入請維持 1）",
+    )
+    add_journal_arguments(parser, os.path.join(get_base_dir(), "創建紀錄.jsonl"))
+    add_session_arguments(parser, os.path.join(get_base_dir(), "登入狀態.json"))
+    parser.add_argument(
+        "--ledger-format", action="append", choices=sorted(LEDGER_FORMATS), default=None,
+        help="帳號紀錄輸出格式，可重複指定（預設只輸出桌面 TXT，例如 --ledger-format csv 另存 CSV）",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    apply_common_arguments(args)
+    
     print("=" * 50)
     print("自動創建帳號系統 (多線程版本)")
     print("=" * 50)
@@ -710,46 +1024,98 @@ def main():
     for user in users:
         print(f"  - {user['account']} (創建 {user['create_count']} 個帳號)")
     
-    # 分批處理參數
-    BATCH_SIZE = 5  # 每批最多 5 個線程
-    total_users = len(users)
-    total_batches = (total_users + BATCH_SIZE - 1) // BATCH_SIZE  # 向上取整
+    # 同時處理的用戶上限：任一用戶完成後，空出的 worker 立刻接手下一個用戶
+    workers = max(1, min(args.workers, len(users)))
+    sessions = max(1, args.sessions_per_agent)
+    print(f"\n使用 {workers} 個 worker 處理 {len(users)} 個用戶，每個用戶 {sessions} 個瀏覽器")
     
-    print(f"\n將分 {total_batches} 批處理，每批最多 {BATCH_SIZE} 個用戶")
+    # 執行紀錄：上次中斷時接續同一輪，已確認創建的帳號不再重複創建
+    journal = RunJournal(args.journal, fresh=args.fresh, max_age_hours=args.resume_hours)
+    if journal.resumed:
+        done = len(journal.find("account_created"))
+        print(f"\n接續上次未完成的執行（{journal.run_id}）：已確認創建 {done} 隻帳號")
+    elif journal.stale_run_id:
+        print(f"\n上次未完成的執行（{journal.stale_run_id}）已超過 {args.resume_hours:g} 小時，開始新的一輪")
     
-    # 分批處理
-    for batch_num in range(total_batches):
-        start_idx = batch_num * BATCH_SIZE
-        end_idx = min(start_idx + BATCH_SIZE, total_users)
-        batch_users = users[start_idx:end_idx]
-        
-        print(f"\n{'=' * 50}")
-        print(f"開始處理第 {batch_num + 1}/{total_batches} 批 ({len(batch_users)} 個用戶)")
-        print(f"{'=' * 50}")
-        
-        # 建立本批次的線程列表
-        threads = []
-        
-        # 為本批次的每個用戶建立線程
-        for user in batch_users:
-            thread = threading.Thread(target=process_user, args=(user,))
-            threads.append(thread)
-            thread.start()
-            time.sleep(2)  # 錯開啟動時間，避免同時啟動太多瀏覽器
-        
-        # 等待本批次所有線程完成
-        for thread in threads:
-            thread.join()
-        
-        print(f"\n第 {batch_num + 1}/{total_batches} 批處理完成！")
-        
-        # 如果還有下一批，稍作等待
-        if batch_num < total_batches - 1:
-            print(f"等待 3 秒後開始下一批...")
-            time.sleep(3)
+    # 依創建數量與歷史步驟耗時預估，最久的用戶最先開始，縮短整體完成時間
+    timings = StepTimings(os.path.join(get_base_dir(), "步驟耗時.json"))
+    ordered_users, predicted = longest_first(users, lambda u: estimate_user_cost(u, timings, sessions), workers)
+    print("\n執行順序（預估耗時由長到短）：")
+    for user in ordered_users:
+        print(f"  - {user['account']}：約 {estimate_user_cost(user, timings, sessions) / 60:.1f} 分鐘")
+    print(f"預估總耗時：{predicted / 60:.1f} 分鐘")
+    
+    # 建立瀏覽器連線池並預先啟動所有 worker 需要的瀏覽器
+    pool = DriverPool(create_driver, size=workers * sessions, max_uses=DRIVER_MAX_USES)
+    pool.prewarm(workers * sessions)
+    
+    # 所有 session 的帳號都交給單一背景執行緒批次寫檔
+    ledger = LedgerWriter(formats=["txt"] + (args.ledger_format or []))
+    
+    # 定時印出進度（執行紀錄中已確認、已送出或封控失敗的序號不計入本次要創建的數量）
+    remaining = sum(len(UserProgress(u, journal).pending_slots()) for u in users)
+    monitor = metrics.RunMonitor(metrics.accounts_created, total=remaining, unit="隻帳號",
+                                 interval=args.status_interval, port=args.metrics_port)
+    monitor.watch_pool(pool)
+    monitor.start()
+    
+    # 保存的登入狀態（--reuse-login），沿用時省下登入表單的時間
+    session_store = open_store(args)
+    
+    work_queue = WorkerPool(concurrency=workers, name="create")
+    for user in ordered_users:
+        work_queue.submit(user["account"], process_user, user, pool, timings, journal, ledger, sessions,
+                          session_store)
+    try:
+        jobs = work_queue.run()
+    finally:
+        # 先把帳號全部寫進檔案，才能標記這一輪結束
+        ledger.close()
+        monitor.stop()
+    
+    pool.close()
+    
+    # 全部用戶都達到創建數量才結束這一輪，否則下次執行會接續
+    progresses = [job.result for job in jobs if job.result is not None]
+    failed = [job.job_id for job in jobs if not job.ok]
+    if failed:
+        print(f"\n以下 {len(failed)} 個用戶處理失敗或未完成：{', '.join(failed)}")
+    unfinished = [u["account"] for u in users if not journal.find("agent_done", agent=u["account"])]
+    if unfinished:
+        print(f"\n{len(unfinished)} 個用戶未完成（{', '.join(unfinished)}），重新執行會從執行紀錄繼續")
+    else:
+        journal.finish()
+    journal.close()
+    
+    try:
+        timings.save()
+    except OSError as e:
+        print(f"儲存步驟耗時紀錄失敗：{e}")
+    try:
+        metrics_path = monitor.dump(os.path.join(get_base_dir(), "執行指標.json"))
+    except OSError as e:
+        print(f"儲存執行指標失敗：{e}")
+        metrics_path = None
     
     print("\n" + "=" * 50)
     print("所有用戶處理完成！")
+    print(work_queue.summary())
+    print("創建結果：")
+    for progress in progresses:
+        print(f"  {progress.agent}：{progress.summary()}")
+    print(f"合計：要求 {sum(p.requested for p in progresses)}，"
+          f"已創建 {sum(p.created_total for p in progresses)}，"
+          f"重試 {sum(p.retried for p in progresses)}，失敗 {sum(p.failed for p in progresses)}")
+    print(f"預估總耗時 {predicted / 60:.1f} 分鐘，實際 {work_queue.wall_time / 60:.1f} 分鐘")
+    print(ledger.summary())
+    print(pool.summary())
+    if session_store is not None:
+        print(session_store.summary())
+    print(waits.stats.summary())
+    print(monitor.summary() + (f"（已寫入 {metrics_path}）" if metrics_path else ""))
+    trace_path = tracing.save()
+    if trace_path:
+        print(f"{tracing.tracer.summary()}，已輸出：{trace_path}")
     print("=" * 50)
 
 
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+報表解析效能測試
+產生 10 / 100 / 1,000 / 10,000 筆 strip-item 的模擬報表頁，
+比較 lxml 與 BeautifulSoup 解析器的耗時，並確認兩者輸出完全相同
+
+用法：python bench_parser.py [--sizes 10 100 1000 10000] [--repeat 3]
+"""
+import argparse
+import random
+import sys
+import time
+
+from report_parser import parse_report_bs4, parse_report_lxml
+
+PANEL_TITLES = ['注單筆數', '下注金額', '有效投注', '玩家輸贏', '玩家退水', '玩家盈虧', '應收下線']
+
+
+# ============================
+# 模擬報表頁
+# ============================
+def _panel(title, rnd):
+    """數值涵蓋實際頁面的幾種寫法：整數+小數 span、單一 span、純文字"""
+    number = f"{rnd.randint(-999999, 9999999):,}"
+    kind = rnd.randint(0, 3)
+    if kind == 0:
+        value = (f'<span data-v-95d7a5b4=""><span data-v-95d7a5b4="">{number}</span>'
+                 f'<span data-v-95d7a5b4="">.{rnd.randint(0, 99):02d}</span></span>')
+    elif kind == 1:
+        value = f'<span data-v-95d7a5b4=""> {number} </span>'
+    elif kind == 2:
+        value = f'\n  {number}\n'
+    else:
+        value = f'<span><!-- 金額 --><span>{number}</span>\n<span>.5</span></span>'
+    return (f'<div class="panelBox" data-v-95d7a5b4="">'
+            f'<div class="item-data-feild-title title-sm" data-v-95d7a5b4=""> {title} </div>'
+            f'<div class="item-data-des" data-v-95d7a5b4="">{value}</div></div>')
+
+
+def _strip_item(i, rnd):
+    status = '<div class="tag" data-v-95d7a5b4=""><div class="txt"> 正常 </div></div>'
+    if i % 7 == 0:
+        status = '<div class="tag"><span>停用</span></div>'
+    panels = ''.join(_panel(title, rnd) for title in PANEL_TITLES)
+    return (f'<div class="strip-item" data-v-95d7a5b4="">'
+            f'<div class="cratedate" data-v-95d7a5b4="">帳號：agent{i:05d}</div>'
+            f'<div class="cratedate" data-v-95d7a5b4="">名稱: 代理&amp;{i}&nbsp;</div>'
+            f'<div class="cratedate"><span>帳號</span> <b>不符合 .string</b></div>'
+            f'{status}{panels}<div class="panelBox"><div class="empty"></div></div></div>')
+
+
+def build_page(count, seed=0):
+    """產生含 count 筆 strip-item 的報表頁（另含一個不符合條件的 strip-item）"""
+    rnd = random.Random(seed)
+    items = ''.join(_strip_item(i, rnd) for i in range(count))
+    return ('<html><head><title>報表</title></head><body><div id="app">'
+            '<div class="strip-item">未帶 data-v 屬性</div>'
+            f'{items}</div></body></html>')
+
+
+# ============================
+# 測試
+# ============================
+def best_of(fn, html, repeat):
+    """執行 repeat 次，回傳最短耗時（秒）與最後一次的輸出"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(html, "上週")
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def same_output(a, b):
+    """內容與欄位順序都要相同"""
+    return [list(row.items()) for row in a] == [list(row.items()) for row in b]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="報表解析效能測試")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'筆數':>8} {'頁面大小':>10} {'BeautifulSoup':>14} {'lxml':>10} {'倍數':>7}  輸出")
+    mismatched = False
+    for size in args.sizes:
+        html = build_page(size)
+        # 大頁面 BeautifulSoup 很慢，只跑一次
+        repeat = args.repeat if size <= 1000 else 1
+        bs4_time, bs4_rows = best_of(parse_report_bs4, html, repeat)
+        lxml_time, lxml_rows = best_of(parse_report_lxml, html, args.repeat)
+        ok = len(lxml_rows) == size and same_output(bs4_rows, lxml_rows)
+        mismatched = mismatched or not ok
+        print(f"{size:>8} {len(html) / 1024:>8.0f}KB {bs4_time * 1000:>12.1f}ms "
+              f"{lxml_time * 1000:>8.1f}ms {bs4_time / lxml_time:>6.1f}x  {'相同' if ok else '不同！'}")
+
+    if mismatched:
+        print("lxml 與 BeautifulSoup 的輸出不一致")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
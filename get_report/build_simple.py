@@ -39,6 +39,7 @@ def main():
         "--clean",                      # 清理暫存
         "--noconfirm",                  # 不詢問
         f"--name={EXE_NAME}",           # exe 名稱
+        f"--paths={base_dir.parent}",   # 共用模組 jfw_common 位於上層目錄
         "--hidden-import=selenium",     # 隱藏導入
         "--hidden-import=bs4",
         "--hidden-import=pandas",
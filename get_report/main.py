@@ -1,18 +1,29 @@
 import os
 import sys
-import platform
-import subprocess
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import time
-from bs4 import BeautifulSoup
-import pandas as pd
+import math
 from pathlib import Path
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+# 共用模組（jfw_common）位於專案根目錄
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from jfw_common.driver_pool import DriverPool
+from jfw_common.driver_resolver import resolve_chromedriver
+from jfw_common import waits, endpoints, tracing, metrics
+from jfw_common.cli import build_parser, add_session_arguments, apply_common_arguments
+from jfw_common.work_queue import WorkerPool
+from jfw_common.session_store import open_store
+
+from report_parser import build_report_row, parse_report_html
+from report_cache import ReportCache, period_start, is_closed
+from report_history import HistoryStore, METRIC_COLUMNS, print_weekly_totals
 
 # ============================
 # 取得執行檔所在目錄（支援 PyInstaller 打包）
@@ -30,12 +41,6 @@ def get_base_dir():
         # 如果是 Python 腳本
         return os.path.dirname(os.path.abspath(__file__))
 
-# ============================
-# 設定參數（可獨立管理）
-# ============================
-LOGIN_URL = "https://ad.jfw-win.com/#/agent-login"
-PERSONAL_URL = "https://ad.jfw-win.com/#/agent/report-manage/agentReport"
-
 # ============================
 # 報表功能 XPath 常數
 # ============================
@@ -44,11 +49,23 @@ XPATH_LEDGER = "//div[@class='pk-radio-label-normal' and text()='總帳損益']"
 XPATH_LAST_WEEK = "//div[@class='pk-radio-label-mini' and text()='上週']"
 XPATH_SEARCH = "/html/body/div/div[2]/div/section/main/div[4]/div[3]/button"
 
+# 要查詢的報表週期（radio value, 週期名稱），每個週期各開一個分頁同時查詢
+REPORT_PERIODS = [("lastweek", "上週"), ("curweek", "本週")]
+
+# 同一個瀏覽器最多服務幾個代理後重新啟動
+DRIVER_MAX_USES = 20
+
+# 預設同時查詢的代理數（可用 --workers 調整）
+MAX_WORKERS = 5
+
+# 已結束週期的報表快取保留週數（可用 --cache-weeks 調整）
+CACHE_RETENTION_WEEKS = 8
+
 # ============================
 # 建立 Selenium Driver
 # ============================
 def create_driver():
-    """使用 webdriver-manager 自動管理 ChromeDriver"""
+    """建立 Chrome Driver（chromedriver 由本機快取提供，必要時才用 webdriver-manager 下載）"""
     print("正在初始化 Chrome Driver...")
     
     # Chrome Options
@@ -75,20 +92,9 @@ def create_driver():
     chrome_options.add_argument("--disk-cache-size=0")
     chrome_options.add_argument("--media-cache-size=0")
 
-    # 使用 webdriver-manager 自動下載和管理 chromedriver
+    # chromedriver 每個行程只解析一次並快取到本機（macOS 權限也在快取時處理）
     try:
-        driver_path = ChromeDriverManager().install()
-        
-        # macOS 需要移除 quarantine 屬性
-        if platform.system() == 'Darwin':
-            try:
-                subprocess.run(['xattr', '-d', 'com.apple.quarantine', driver_path], 
-                             capture_output=True, check=False)
-                subprocess.run(['chmod', '+x', driver_path], 
-                             capture_output=True, check=False)
-                print("已處理 macOS ChromeDriver 權限")
-            except Exception as e:
-                print(f"權限處理警告: {e}")
+        driver_path = resolve_chromedriver()
         
         service = Service(driver_path)
         driver = webdriver.Chrome(service=service, options=chrome_options)
@@ -202,6 +208,8 @@ def click_radio_by_value(driver, value, timeout=10):
 
     # 4. 點擊 label（ElementUI 必須點 label 才會變 checked）
     driver.execute_script("arguments[0].click();", label_el)
+    waits.wait_until(lambda: "is-checked" in label_el.get_attribute("class"),
+                     timeout=timeout, label="報表週期勾選")
     # print(f"👉 已幫你打勾：{value}")
 
 def click_search_button(driver, timeout=10):
@@ -221,104 +229,135 @@ def click_search_button(driver, timeout=10):
 
     # print("XPath 已成功點擊:立即查詢")
 
+# ============================
+# 報表解析
+# ============================
+# 在頁面內一次取出所有報表列，只回傳原始文字（去空白、去逗號在 Python 端處理，
+# 與 report_parser 的 HTML 解析共用 build_report_row，兩種方式輸出完全相同）
+# 回傳 null 表示「無資料」
+EXTRACT_REPORT_JS = """
+var imgs = document.getElementsByTagName('img');
+for (var i = 0; i < imgs.length; i++) {
+    if ((imgs[i].getAttribute('src') || '').indexOf('icon_no content') >= 0) return null;
+}
+// 與 BeautifulSoup 的 .string 相同：只有單一子節點時往下取，直到文字節點
+function onlyString(node) {
+    while (node.childNodes.length === 1) {
+        var child = node.childNodes[0];
+        if (child.nodeType === 3 || child.nodeType === 4 || child.nodeType === 8) return child.data;
+        if (child.nodeType !== 1) return null;
+        node = child;
+    }
+    return null;
+}
+function directChildren(el, tag) {
+    var out = [];
+    for (var c = el.firstElementChild; c; c = c.nextElementSibling) {
+        if (c.tagName.toLowerCase() === tag) out.push(c);
+    }
+    return out;
+}
+var items = [];
+var strips = document.querySelectorAll('div.strip-item[data-v-95d7a5b4=""]');
+for (var s = 0; s < strips.length; s++) {
+    var item = strips[s];
+    var row = {account: null, name: null, status: null, panels: []};
+    var dates = item.querySelectorAll('div.cratedate');
+    for (var d = 0; d < dates.length; d++) {
+        var str = onlyString(dates[d]);
+        if (str === null) continue;
+        if (row.account === null && str.indexOf('帳號') >= 0) row.account = dates[d].textContent;
+        if (row.name === null && str.indexOf('名稱') >= 0) row.name = dates[d].textContent;
+    }
+    var tag = item.querySelector('div.tag');
+    if (tag) {
+        var txt = tag.querySelector('div.txt');
+        if (txt) row.status = txt.textContent;
+    }
+    var panels = item.querySelectorAll('div.panelBox');
+    for (var p = 0; p < panels.length; p++) {
+        var title = panels[p].querySelector('div[class*="item-data-feild-title"]');
+        if (!title) continue;
+        var des = panels[p].querySelector('div.item-data-des');
+        if (!des) continue;
+        var parts;
+        var span = directChildren(des, 'span')[0];
+        if (span) {
+            var inner = directChildren(span, 'span');
+            parts = inner.length >= 2 ? [inner[0].textContent, inner[1].textContent] : [span.textContent];
+        } else {
+            parts = [des.textContent];
+        }
+        row.panels.push([title.textContent, parts]);
+    }
+    items.push(row);
+}
+return items;
+"""
+
+
+@tracing.traced
 def parse_agent_report(driver, week_type="上週"):
     """
     解析代理報表資料
+    優先在瀏覽器內直接取出報表列（只傳回需要的文字），失敗時改用 page_source 解析
     
     :param driver: Selenium WebDriver
     :param week_type: 報表週期，"本週" 或 "上週"
     """
     # 等待頁面載入完成
-    time.sleep(3)
+    waits.settle(driver, timeout=30, label=f"{week_type}報表載入")
     
-    # 取得頁面 HTML
-    html = driver.page_source
-    soup = BeautifulSoup(html, 'html.parser')
+    try:
+        items = driver.execute_script(EXTRACT_REPORT_JS)
+    except Exception as e:
+        print(f"瀏覽器端解析失敗，改用 HTML 解析：{e}")
+        return parse_report_html(driver.page_source, week_type)
     
-    # 檢查是否有「無資料」圖片
-    no_content_img = soup.find('img', {'src': lambda x: x and 'icon_no content' in x})
-    if no_content_img:
+    if items is None:
         print(f"{week_type}無資料")
         return []
     
-    # 找到所有的 strip-item
-    strip_items = soup.find_all('div', {'class': 'strip-item', 'data-v-95d7a5b4': ''})
-    
     results = []
-    
-    for item in strip_items:
+    for item in items:
         try:
-            # 提取基本資訊
-            data = {}
-            
-            # 報表週期
-            data['報表週期'] = week_type
-            
-            # 帳號
-            account_elem = item.find('div', {'class': 'cratedate'}, string=lambda x: x and '帳號' in x)
-            if account_elem:
-                data['帳號'] = account_elem.text.replace('帳號：', '').replace('帳號:', '').strip()
-            
-            # 名稱
-            name_elem = item.find('div', {'class': 'cratedate'}, string=lambda x: x and '名稱' in x)
-            if name_elem:
-                data['名稱'] = name_elem.text.replace('名稱：', '').replace('名稱:', '').strip()
-            
-            # 狀態
-            tag_elem = item.find('div', {'class': 'tag'})
-            if tag_elem:
-                txt_elem = tag_elem.find('div', {'class': 'txt'})
-                if txt_elem:
-                    data['狀態'] = txt_elem.text.strip()
-            
-            # 提取所有數據面板
-            panels = item.find_all('div', {'class': 'panelBox'})
-            
-            for panel in panels:
-                # 取得標題
-                title_elem = panel.find('div', {'class': lambda x: x and 'item-data-feild-title' in x})
-                if not title_elem:
-                    continue
-                    
-                title = title_elem.text.strip()
-                
-                # 取得數值
-                value_elem = panel.find('div', {'class': 'item-data-des'})
-                if value_elem:
-                    # 處理數值,包含整數和小數部分
-                    value_span = value_elem.find('span', recursive=False)
-                    if value_span:
-                        # 找到所有直接子 span
-                        inner_spans = value_span.find_all('span', recursive=False)
-                        if len(inner_spans) >= 2:
-                            # 有整數和小數部分
-                            integer_part = inner_spans[0].text.strip()
-                            decimal_part = inner_spans[1].text.strip()
-                            # 移除逗號
-                            integer_part = integer_part.replace(',', '')
-                            # 組合完整數值
-                            value = integer_part + decimal_part
-                        else:
-                            # 只有一個值
-                            value = value_span.text.strip().replace(',', '')
-                    else:
-                        # 沒有 span 標籤,直接取文字
-                        value = value_elem.text.strip().replace(',', '')
-                    
-                    data[title] = value
-            
-            if data:
-                results.append(data)
-                
+            results.append(build_report_row(week_type, item))
         except Exception as e:
             print(f"解析項目時發生錯誤: {e}")
-            continue
-    
     return results
 
+# Excel 欄位順序
+REPORT_COLUMNS = [
+    '帳號', '名稱', '狀態',
+    '注單筆數', '下注金額', '有效投注',
+    '玩家輸贏', '玩家退水', '玩家盈虧',
+    '應收下線'
+]
+
+# 與 pandas to_excel 相同的標題列樣式
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style="thin"), right=Side(style="thin"),
+                       top=Side(style="thin"), bottom=Side(style="thin"))
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+
+
+def sum_receivable(rows):
+    """應收下線總計（無法解析的值略過）"""
+    values = []
+    for row in rows:
+        try:
+            value = float(row['應收下線'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if not math.isnan(value):
+            values.append(value)
+    return math.fsum(values)
+
+
 def save_results_to_excel(all_results):
     """
-    將所有結果儲存到 Excel 檔案,本週和上週分開工作表
+    將所有結果儲存到 Excel 檔案（單一工作表：上週在上、本週在下，各自附應收下線總計）
+    一次走訪資料直接串流寫出每一列，記憶體用量不隨列數增加
     """
     # 取得桌面路徑
     desktop_path = Path.home() / "Desktop"
@@ -331,201 +370,333 @@ def save_results_to_excel(all_results):
     lastweek_data = [r for r in all_results if r.get('報表週期') == '上週']
     curweek_data = [r for r in all_results if r.get('報表週期') == '本週']
     
-    # 轉換為 DataFrame
-    df_last = pd.DataFrame(lastweek_data)
-    df_cur = pd.DataFrame(curweek_data)
+    # 各週期輸出的欄位（依固定順序，只保留有資料的欄位）
+    last_cols = [col for col in REPORT_COLUMNS if any(col in r for r in lastweek_data)]
+    cur_cols = [col for col in REPORT_COLUMNS if any(col in r for r in curweek_data)]
+    if not last_cols:
+        lastweek_data = []
+    if not cur_cols:
+        curweek_data = []
     
-    # 移除報表週期欄位(因為已經用工作表名稱區分)
-    if not df_last.empty:
-        df_last = df_last.drop('報表週期', axis=1, errors='ignore')
-    if not df_cur.empty:
-        df_cur = df_cur.drop('報表週期', axis=1, errors='ignore')
+    if not lastweek_data and not curweek_data:
+        print("沒有資料可儲存")
+        return None
     
-    # 定義欄位順序
-    column_order = [
-        '帳號', '名稱', '狀態',
-        '注單筆數', '下注金額', '有效投注',
-        '玩家輸贏', '玩家退水', '玩家盈虧',
-        '應收下線'
-    ]
+    # 以上週欄位為主，本週多出的欄位接在後面
+    all_columns = last_cols or cur_cols
+    all_columns = all_columns + [col for col in cur_cols if col not in all_columns]
+    first_col = all_columns[0]
     
-    # 調整上週資料欄位順序
-    if not df_last.empty:
-        existing_cols_last = [col for col in column_order if col in df_last.columns]
-        df_last = df_last[existing_cols_last]
+    def label_row(label, receivable=None):
+        """標題 / 總計列：第一欄為文字，應收下線欄放總計"""
+        row = {first_col: label}
+        if receivable is not None:
+            row['應收下線'] = f'{receivable:.2f}'
+        return [row.get(col, '') for col in all_columns]
     
-    # 調整本週資料欄位順序
-    if not df_cur.empty:
-        existing_cols_cur = [col for col in column_order if col in df_cur.columns]
-        df_cur = df_cur[existing_cols_cur]
+    # 應收下線總計只計算一次
+    lastweek_total = sum_receivable(lastweek_data) if '應收下線' in last_cols else None
+    curweek_total = sum_receivable(curweek_data) if '應收下線' in cur_cols else None
     
-    # 將上週和本週資料合併到同一個 DataFrame
-    # 在本週資料前加入空行分隔
-    combined_data = []
-    all_columns = []
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
     
-    # 收集所有可能的欄位
-    if not df_last.empty:
-        all_columns = list(df_last.columns)
-    if not df_cur.empty and not all_columns:
-        all_columns = list(df_cur.columns)
+    header = []
+    for col in all_columns:
+        cell = WriteOnlyCell(sheet, value=col)
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGNMENT
+        header.append(cell)
+    sheet.append(header)
     
-    if not df_last.empty:
-        # 加入上週標題行
-        header_data = {col: '上週' if col == all_columns[0] else '' for col in all_columns}
-        header_row = pd.DataFrame([header_data], columns=all_columns)
-        combined_data.append(header_row)
-        combined_data.append(df_last)
+    if lastweek_data:
+        sheet.append(label_row('上週'))
+        for r in lastweek_data:
+            sheet.append([r.get(col) if col in last_cols else None for col in all_columns])
+        if lastweek_total is not None:
+            sheet.append(label_row('上週總計', lastweek_total))
     
-    if not df_cur.empty:
-        # 加入空行和本週標題
-        if combined_data:
-            # 空行
-            empty_data = {col: '' for col in all_columns}
-            empty_row = pd.DataFrame([empty_data], columns=all_columns)
-            combined_data.append(empty_row)
-            # 再加一個空行
-            combined_data.append(pd.DataFrame([empty_data], columns=all_columns))
-        
-        # 本週標題
-        header_data = {col: '本週' if col == all_columns[0] else '' for col in all_columns}
-        header_row = pd.DataFrame([header_data], columns=all_columns)
-        combined_data.append(header_row)
-        combined_data.append(df_cur)
+    if curweek_data:
+        # 上週與本週之間空兩行
+        if lastweek_data:
+            sheet.append(label_row(''))
+            sheet.append(label_row(''))
+        sheet.append(label_row('本週'))
+        for r in curweek_data:
+            sheet.append([r.get(col) for col in all_columns])
+        if curweek_total is not None:
+            sheet.append(label_row('本週總計', curweek_total))
     
-    if combined_data:
-        df_final = pd.concat(combined_data, ignore_index=True)
-        
-        # 加入上週和本週的應收下線總計
-        if not df_last.empty and '應收下線' in df_last.columns:
-            # 計算上週總計
-            lastweek_total = pd.to_numeric(df_last['應收下線'], errors='coerce').sum()
-            total_data_last = {col: '上週總計' if col == all_columns[0] else (f'{lastweek_total:.2f}' if col == '應收下線' else '') for col in all_columns}
-            total_row_last = pd.DataFrame([total_data_last], columns=all_columns)
-            
-            # 找到上週資料的結束位置並插入總計行
-            last_week_end_idx = len(df_last) + 1  # +1 因為有標題行
-            df_final = pd.concat([
-                df_final.iloc[:last_week_end_idx],
-                total_row_last,
-                df_final.iloc[last_week_end_idx:]
-            ], ignore_index=True)
-        
-        if not df_cur.empty and '應收下線' in df_cur.columns:
-            # 計算本週總計
-            curweek_total = pd.to_numeric(df_cur['應收下線'], errors='coerce').sum()
-            total_data_cur = {col: '本週總計' if col == all_columns[0] else (f'{curweek_total:.2f}' if col == '應收下線' else '') for col in all_columns}
-            total_row_cur = pd.DataFrame([total_data_cur], columns=all_columns)
-            
-            # 在最後加入本週總計
-            df_final = pd.concat([df_final, total_row_cur], ignore_index=True)
-        
-        # 儲存為單一工作表的 Excel
-        df_final.to_excel(filepath, index=False, engine='openpyxl')
-        
-        print(f" Excel 已儲存至桌面: {filepath}")
-        if not df_last.empty:
-            print(f"上週資料: {len(df_last)} 筆")
-            if '應收下線' in df_last.columns:
-                lastweek_total = pd.to_numeric(df_last['應收下線'], errors='coerce').sum()
-                print(f"上週應收下線總計: {lastweek_total:.2f}")
-        if not df_cur.empty:
-            print(f"本週資料: {len(df_cur)} 筆")
-            if '應收下線' in df_cur.columns:
-                curweek_total = pd.to_numeric(df_cur['應收下線'], errors='coerce').sum()
-                print(f"本週應收下線總計: {curweek_total:.2f}")
-    else:
-        print("沒有資料可儲存")
-        return None
+    workbook.save(filepath)
+    
+    print(f" Excel 已儲存至桌面: {filepath}")
+    if lastweek_data:
+        print(f"上週資料: {len(lastweek_data)} 筆")
+        if lastweek_total is not None:
+            print(f"上週應收下線總計: {lastweek_total:.2f}")
+    if curweek_data:
+        print(f"本週資料: {len(curweek_data)} 筆")
+        if curweek_total is not None:
+            print(f"本週應收下線總計: {curweek_total:.2f}")
     
     return str(filepath)
 
+# ============================
+# 單一代理的報表查詢
+# ============================
+@tracing.traced("login")
+def login_agent(driver, acc, pwd, session_store=None):
+    """登入代理並進入報表頁；有保存的登入狀態且仍有效時直接沿用"""
+    if session_store is not None and session_store.restore(driver, acc, endpoints.REPORT_ROUTE):
+        print(f"[{acc}] 沿用已保存的登入狀態")
+        return
+
+    driver.get(endpoints.page_url(endpoints.LOGIN_ROUTE))
+
+    input_account_password(driver, acc, pwd)
+    waits.input_filled(driver, "//input[@placeholder='請輸入密碼']", expected=pwd,
+                       timeout=5, label="帳密輸入完成")
+    click_login_button(driver)
+    waits.url_changed(driver, "agent-login", timeout=30, label="登入跳轉")
+    waits.settle(driver, timeout=30, label="登入後載入")
+    if session_store is not None:
+        session_store.save(driver, acc)
+
+    driver.get(endpoints.page_url(endpoints.REPORT_ROUTE))
+    waits.settle(driver, timeout=30, label="報表頁載入")
+
+
+@tracing.traced
+def submit_week_query(driver, radio_value):
+    """切換報表週期並按下查詢（不等待結果）"""
+    click_radio_by_value(driver, radio_value)
+    waits.settle(driver, timeout=15, label="切換報表週期")
+    click_search_button(driver)
+
+
+@tracing.traced
+def read_week_report(driver, acc, week_type):
+    """等待目前分頁的查詢結果並解析，回傳該週的報表資料"""
+    print(f"[{acc}] 等待{week_type}查詢結果載入...")
+    waits.settle(driver, timeout=60, label="查詢結果載入")
+
+    # 解析報表資料
+    print(f"[{acc}] 開始解析{week_type}報表資料...")
+    results = parse_agent_report(driver, week_type=week_type)
+
+    if results:
+        lines = [f"[{acc}] 成功解析{week_type} {len(results)} 筆資料", f"[{acc}] {week_type}資料摘要:"]
+        for idx, data in enumerate(results[:3], 1):
+            lines.append(f"{idx}. {data.get('帳號', 'N/A')} - {data.get('名稱', 'N/A')}")
+            if '玩家輸贏' in data:
+                lines.append(f"玩家輸贏: {data['玩家輸贏']}")
+        if len(results) > 3:
+            lines.append(f"... 還有 {len(results) - 3} 筆資料")
+        # 多個代理同時執行，摘要一次輸出避免交錯
+        print("\n".join(lines))
+    else:
+        print(f"[{acc}] {week_type}未找到任何資料")
+
+    return results
+
+
+def query_week_report(driver, acc, radio_value, week_type):
+    """在目前分頁查詢單一報表週期"""
+    print(f"\n[{acc}] 開始查詢【{week_type}】報表...")
+    submit_week_query(driver, radio_value)
+    return read_week_report(driver, acc, week_type)
+
+
+@tracing.traced
+def open_report_tabs(driver, count):
+    """
+    在同一個登入 session 再開 count - 1 個報表分頁，回傳所有分頁（目前分頁在第一個）
+    以 window.open 開啟，新分頁會沿用目前分頁的登入資訊
+    """
+    main_handle = driver.current_window_handle
+    existing = set(driver.window_handles)
+    for _ in range(count - 1):
+        driver.execute_script("window.open(arguments[0], '_blank');",
+                              endpoints.page_url(endpoints.REPORT_ROUTE))
+    waits.wait_until(lambda: len(driver.window_handles) >= len(existing) + count - 1,
+                     timeout=10, label="開啟報表分頁", raise_on_timeout=True)
+    new_handles = [h for h in driver.window_handles if h not in existing]
+    for handle in new_handles:
+        driver.switch_to.window(handle)
+        waits.settle(driver, timeout=30, label="報表頁載入")
+        if "agent-login" in driver.current_url:
+            raise RuntimeError("新分頁未沿用登入狀態")
+    driver.switch_to.window(main_handle)
+    return [main_handle] + new_handles
+
+
+def close_extra_tabs(driver, main_handle):
+    """關閉 main_handle 以外的分頁並回到 main_handle"""
+    for handle in driver.window_handles:
+        if handle == main_handle:
+            continue
+        try:
+            driver.switch_to.window(handle)
+            driver.close()
+        except Exception:
+            pass
+    driver.switch_to.window(main_handle)
+
+
+def query_reports_in_tabs(driver, acc, periods):
+    """
+    每個報表週期各用一個分頁：先在所有分頁送出查詢，再依序讀取結果
+    各分頁的查詢同時在背景載入，一個代理大約只需要一次報表載入的時間
+    開分頁失敗時改為在目前分頁逐一查詢
+
+    :param periods: [(radio value, 週期名稱), ...]
+    :return: 與 periods 對應的報表資料列表 [[...], [...]]
+    """
+    main_handle = driver.current_window_handle
+    if len(periods) > 1:
+        try:
+            handles = open_report_tabs(driver, len(periods))
+        except Exception as e:
+            print(f"[{acc}] 無法開啟多個報表分頁，改為逐一查詢：{e}")
+            close_extra_tabs(driver, main_handle)
+        else:
+            try:
+                for handle, (radio_value, week_type) in zip(handles, periods):
+                    driver.switch_to.window(handle)
+                    print(f"\n[{acc}] 開始查詢【{week_type}】報表...")
+                    submit_week_query(driver, radio_value)
+
+                results = []
+                for handle, (radio_value, week_type) in zip(handles, periods):
+                    driver.switch_to.window(handle)
+                    results.append(read_week_report(driver, acc, week_type))
+                return results
+            finally:
+                close_extra_tabs(driver, main_handle)
+
+    return [query_week_report(driver, acc, radio_value, week_type) for radio_value, week_type in periods]
+
+
+@tracing.traced(cat="agent")
+def collect_agent_report(acc, pwd, pool, cache=None, session_store=None):
+    """
+    查詢單一代理的上週與本週報表（瀏覽器由連線池借出）
+    回傳 上週資料 + 本週資料，順序與逐一執行時相同
+    已結束的週期優先讀取快取，全部命中時不開瀏覽器
+    session_store 不為 None 時，登入前先嘗試沿用已保存的登入狀態
+    """
+    tracing.set_agent(acc)
+    print(f"\n[{acc}] 開始處理")
+    by_period = {}
+    if cache is not None:
+        for radio_value, week_type in REPORT_PERIODS:
+            if not is_closed(radio_value):
+                continue
+            rows = cache.get(acc, period_start(radio_value), week_type)
+            if rows is not None:
+                print(f"[{acc}] {week_type}報表使用快取（{len(rows)} 筆）")
+                by_period[radio_value] = rows
+
+    pending = [period for period in REPORT_PERIODS if period[0] not in by_period]
+    if pending:
+        driver = pool.acquire()
+        try:
+            login_agent(driver, acc, pwd, session_store)
+            fetched = query_reports_in_tabs(driver, acc, pending)
+        except Exception:
+            metrics.failures.inc(kind="report")
+            raise
+        finally:
+            pool.release(driver)
+        for (radio_value, week_type), rows in zip(pending, fetched):
+            by_period[radio_value] = rows
+            if cache is not None and is_closed(radio_value):
+                try:
+                    cache.put(acc, period_start(radio_value), week_type, rows)
+                except OSError as e:
+                    print(f"[{acc}] 寫入{week_type}報表快取失敗：{e}")
+
+    metrics.agents_done.inc()
+    print(f"[{acc}] 帳號處理完成")
+    # 每列加上登入的代理帳號，寫入歷史資料庫時使用（Excel 不輸出此欄）
+    return [dict(row, 代理=acc) for radio_value, _ in REPORT_PERIODS for row in by_period[radio_value]]
+
+
 # ============================
 # 主程式
 # ============================
-def main():
+def parse_args(argv=None):
+    """解析命令列參數（直接執行時全部使用預設值）"""
+    parser = build_parser("JFW 代理報表抓取工具", default_workers=MAX_WORKERS)
+    parser.add_argument(
+        "--refresh", action="store_true",
+        help="不使用報表快取，所有週期都重新查詢（查詢結果仍會更新快取）",
+    )
+    parser.add_argument(
+        "--cache-weeks", type=int, default=CACHE_RETENTION_WEEKS,
+        help=f"報表快取保留週數（預設 {CACHE_RETENTION_WEEKS}）",
+    )
+    parser.add_argument(
+        "--history", choices=list(METRIC_COLUMNS), metavar="欄位",
+        help=f"不查詢報表，只輸出歷史資料庫中該欄位的各週合計（{'/'.join(METRIC_COLUMNS)}）",
+    )
+    parser.add_argument(
+        "--history-by", choices=["agent", "member"], default="agent",
+        help="歷史合計依代理（agent，預設）或會員（member）彙總",
+    )
+    parser.add_argument("--history-weeks", type=int, help="只顯示最近幾週")
+    parser.add_argument("--history-agent", help="只顯示指定代理")
+    add_session_arguments(parser, os.path.join(get_base_dir(), "登入狀態.json"))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    apply_common_arguments(args)
+
+    history_path = os.path.join(get_base_dir(), "報表歷史.sqlite3")
+    if args.history:
+        store = HistoryStore(history_path)
+        print_weekly_totals(store, args.history, by=args.history_by,
+                            weeks=args.history_weeks, agent=args.history_agent)
+        store.close()
+        return
+
     user_list = read_all_user_info()
-    all_results = []  # 儲存所有帳號的結果
+    if not user_list:
+        print("\n 用戶資訊.txt 中沒有帳號")
+        return
 
-    for index, (acc, pwd) in enumerate(user_list, start=1):
-        print("\n============================")
-        print(f"處理第 {index} 組帳號：{acc}")
-        print("============================")
+    # 已結束週期（上週）的報表快取
+    cache = ReportCache(os.path.join(get_base_dir(), "報表快取"),
+                        retention_weeks=args.cache_weeks, refresh=args.refresh)
+    cache.prune()
 
-        driver = create_driver()
-        driver.get(LOGIN_URL)
+    # 多個代理同時查詢，每個 worker 使用自己的瀏覽器，代理之間只清除登入狀態
+    workers = max(1, min(args.workers, len(user_list)))
+    print(f"共 {len(user_list)} 個帳號，同時查詢 {workers} 個")
+    pool = DriverPool(create_driver, size=workers, max_uses=DRIVER_MAX_USES)
+    pool.prewarm(workers)
 
-        input_account_password(driver, acc, pwd)
-        time.sleep(1)
-        click_login_button(driver)
-        time.sleep(5)
+    monitor = metrics.RunMonitor(metrics.agents_done, total=len(user_list), unit="個代理",
+                                 interval=args.status_interval, port=args.metrics_port)
+    monitor.watch_pool(pool)
+    monitor.start()
 
-        driver.get(PERSONAL_URL)
-        time.sleep(5)
-    
-        
-        # === 查詢上週報表 ===
-        print("\n開始查詢【上週】報表...")
-        click_radio_by_value(driver, "lastweek")
-        time.sleep(2)
-        click_search_button(driver)
-        
-        # 等待查詢結果載入
-        print("等待查詢結果載入...")
-        time.sleep(5)
-        
-        # 解析報表資料
-        print("開始解析上週報表資料...")
-        results_lastweek = parse_agent_report(driver, week_type="上週")
-        
-        if results_lastweek:
-            print(f"成功解析上週 {len(results_lastweek)} 筆資料")
-            all_results.extend(results_lastweek)
-            
-            # 顯示摘要
-            print("\n上週資料摘要:")
-            for idx, data in enumerate(results_lastweek[:3], 1):
-                print(f"{idx}. {data.get('帳號', 'N/A')} - {data.get('名稱', 'N/A')}")
-                if '玩家輸贏' in data:
-                    print(f"玩家輸贏: {data['玩家輸贏']}")
-            
-            if len(results_lastweek) > 3:
-                print(f"... 還有 {len(results_lastweek) - 3} 筆資料")
-        else:
-            print("上週未找到任何資料")
-        
-        # === 查詢本週報表 ===
-        print("\n 開始查詢【本週】報表...")
-        click_radio_by_value(driver, "curweek")
-        time.sleep(2)
-        click_search_button(driver)
-        
-        # 等待查詢結果載入
-        print("等待查詢結果載入...")
-        time.sleep(5)
-        
-        # 解析報表資料
-        print("開始解析本週報表資料...")
-        results_curweek = parse_agent_report(driver, week_type="本週")
-        
-        if results_curweek:
-            print(f"成功解析本週 {len(results_curweek)} 筆資料")
-            all_results.extend(results_curweek)
-            
-            # 顯示摘要
-            print("\n本週資料摘要:")
-            for idx, data in enumerate(results_curweek[:3], 1):
-                print(f"{idx}. {data.get('帳號', 'N/A')} - {data.get('名稱', 'N/A')}")
-                if '玩家輸贏' in data:
-                    print(f"玩家輸贏: {data['玩家輸贏']}")
-            
-            if len(results_curweek) > 3:
-                print(f"... 還有 {len(results_curweek) - 3} 筆資料")
-        else:
-            print("本週未找到任何資料")
-        
-        driver.quit()
-        print(f"帳號 {acc} 處理完成")
+    # 保存的登入狀態（--reuse-login），沿用時省下登入表單的時間
+    session_store = open_store(args)
+
+    work_queue = WorkerPool(concurrency=workers, name="report")
+    for acc, pwd in user_list:
+        work_queue.submit(acc, collect_agent_report, acc, pwd, pool, cache, session_store)
+    jobs = work_queue.run()
+    monitor.stop()
+    pool.close()
+
+    # 依 用戶資訊.txt 的順序合併結果；單一代理失敗不影響其他代理
+    all_results = [row for job in jobs if job.ok for row in job.result]
+    failed = [job.job_id for job in jobs if not job.ok]
 
     # 所有帳號處理完成後,統一儲存到一個 Excel
     if all_results:
@@ -534,6 +705,33 @@ def main():
     else:
         print("\n 沒有任何資料可儲存")
 
+    # 累積到歷史資料庫（Excel 每次覆蓋，歷史資料庫保留各週數字）
+    if all_results:
+        try:
+            store = HistoryStore(history_path)
+            count = store.append(all_results, {week_type: period_start(radio_value)
+                                               for radio_value, week_type in REPORT_PERIODS})
+            store.close()
+            print(f"已寫入歷史資料庫 {count} 筆：{history_path}")
+        except Exception as e:
+            print(f"寫入歷史資料庫失敗：{e}")
+
+    if failed:
+        print(f"\n以下 {len(failed)} 個帳號查詢失敗，未列入報表：{', '.join(failed)}")
+    print(work_queue.summary())
+    print(cache.summary())
+    print(pool.summary())
+    if session_store is not None:
+        print(session_store.summary())
+    print(waits.stats.summary())
+    try:
+        metrics_path = monitor.dump(os.path.join(get_base_dir(), "執行指標.json"))
+        print(f"{monitor.summary()}（已寫入 {metrics_path}）")
+    except OSError as e:
+        print(f"儲存執行指標失敗：{e}")
+    trace_path = tracing.save()
+    if trace_path:
+        print(f"{tracing.tracer.summary()}，已輸出：{trace_path}")
     print("\n 所有帳號流程已完成！")
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+"""
+已結束週期的報表快取
+上週的數字在週結束後不會再變動，依 (代理, 週期起始日, 週期類型) 存成 JSON，
+之後的執行直接讀取，不必再登入查詢；只有本週這類進行中的週期需要開瀏覽器
+"""
+import json
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+
+# 週結束後多久才視為數字已定案（避免剛過週一凌晨時還有注單在結算）
+SETTLE_GRACE = timedelta(hours=12)
+
+
+def period_start(radio_value, today=None):
+    """回傳報表週期的起始日（週一）"""
+    today = today or date.today()
+    monday = today - timedelta(days=today.weekday())
+    if radio_value == "lastweek":
+        return monday - timedelta(days=7)
+    return monday
+
+
+def is_closed(radio_value, now=None):
+    """週期是否已結束且過了結算緩衝時間（只有已定案的週期會寫入快取）"""
+    if radio_value != "lastweek":
+        return False
+    now = now or datetime.now()
+    monday = datetime.combine(period_start("curweek", now.date()), datetime.min.time())
+    return now >= monday + SETTLE_GRACE
+
+
+class ReportCache:
+    """
+    :param directory: 快取資料夾
+    :param retention_weeks: 保留幾週內的快取，更舊的在 prune() 時刪除
+    :param refresh: True 時不讀取快取（仍會寫入最新結果）
+    """
+
+    def __init__(self, directory, retention_weeks=8, refresh=False):
+        self.directory = directory
+        self.retention_weeks = retention_weeks
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # 統計資料
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.skipped_empty = 0
+        self.pruned = 0
+
+    def _path(self, agent, start, period_type):
+        safe_agent = re.sub(r"[^\w.-]", "_", agent)
+        return os.path.join(self.directory, f"{safe_agent}_{start.isoformat()}_{period_type}.json")
+
+    def get(self, agent, start, period_type):
+        """回傳快取的報表資料；沒有快取（或 refresh）時回傳 None"""
+        if self.refresh:
+            return None
+        try:
+            with open(self._path(agent, start, period_type), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry["rows"]
+
+    def put(self, agent, start, period_type, rows):
+        """
+        寫入一個週期的報表資料（先寫暫存檔再取代），回傳是否已寫入
+        空的結果不寫入：報表還沒載入完成就逾時也會解析出空列表，無法與真正的無資料區分，
+        寫入的話之後的執行會一直讀到錯誤的空報表
+        """
+        if not rows:
+            with self._lock:
+                self.skipped_empty += 1
+            return False
+        path = self._path(agent, start, period_type)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        entry = {
+            "agent": agent,
+            "period_start": start.isoformat(),
+            "period_type": period_type,
+            "fetched_at": datetime.now().isoformat(timespec="seconds"),
+            "rows": rows,
+        }
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stored += 1
+        return True
+
+    def prune(self, today=None):
+        """刪除超過保留週數的快取檔，回傳刪除數量"""
+        today = today or date.today()
+        oldest = period_start("curweek", today) - timedelta(weeks=self.retention_weeks)
+        pattern = re.compile(r"_(\d{4}-\d{2}-\d{2})_[^_]+\.json$")
+        removed = 0
+        for name in os.listdir(self.directory):
+            match = pattern.search(name)
+            if not match:
+                continue
+            try:
+                start = date.fromisoformat(match.group(1))
+            except ValueError:
+                continue
+            if start < oldest:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except OSError:
+                    pass
+        self.pruned += removed
+        return removed
+
+    def summary(self):
+        """回傳快取統計摘要"""
+        line = f"報表快取：命中 {self.hits} 次，未命中 {self.misses} 次，新增 {self.stored} 筆"
+        if self.skipped_empty:
+            line += f"，空結果未寫入 {self.skipped_empty} 筆"
+        if self.pruned:
+            line += f"，清除過期 {self.pruned} 筆"
+        if self.refresh:
+            line += "（--refresh：本次不讀取快取）"
+        return line
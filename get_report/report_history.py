@@ -0,0 +1,132 @@
+"""
+代理報表歷史資料
+每次執行的報表列存進 SQLite（數值欄位以數字型別儲存），同一代理、同一週、同一帳號只保留最新一次，
+查詢時用 pandas 一次彙總整個資料庫，計算各週合計與週增減
+"""
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+# 報表欄位 -> 資料庫欄位（數值）
+METRIC_COLUMNS = {
+    '注單筆數': 'bet_count',
+    '下注金額': 'bet_amount',
+    '有效投注': 'valid_bet',
+    '玩家輸贏': 'player_win',
+    '玩家退水': 'player_rebate',
+    '玩家盈虧': 'player_profit',
+    '應收下線': 'receivable',
+}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS report_rows (
+    agent TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    account TEXT NOT NULL,
+    period_type TEXT NOT NULL,
+    name TEXT,
+    status TEXT,
+    fetched_at TEXT NOT NULL,
+    bet_count INTEGER,
+    {", ".join(f"{column} REAL" for column in list(METRIC_COLUMNS.values())[1:])},
+    PRIMARY KEY (agent, period_start, account)
+);
+CREATE INDEX IF NOT EXISTS idx_report_rows_period ON report_rows (period_start);
+"""
+
+
+def _to_number(value, cast=float):
+    """'1234.50'、'-12' 轉成數字，空值或無法解析時為 None"""
+    try:
+        return cast(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class HistoryStore:
+    """
+    :param path: SQLite 檔路徑
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+
+    def append(self, rows, period_starts, fetched_at=None):
+        """
+        寫入報表列（同一代理、同一週、同一帳號以最新一次為準，例如上週的定案數字會取代本週的暫時數字）
+
+        :param rows: 報表資料（需有「代理」「報表週期」「帳號」欄）
+        :param period_starts: {週期名稱: 週期起始日}
+        :return: 寫入筆數
+        """
+        fetched_at = fetched_at or datetime.now().isoformat(timespec="seconds")
+        records = []
+        for row in rows:
+            start = period_starts.get(row.get('報表週期'))
+            if start is None or not row.get('代理') or not row.get('帳號'):
+                continue
+            records.append((
+                row['代理'], start.isoformat(), row['帳號'], row['報表週期'],
+                row.get('名稱'), row.get('狀態'), fetched_at,
+                _to_number(row.get('注單筆數'), int),
+                *(_to_number(row.get(field)) for field in list(METRIC_COLUMNS)[1:]),
+            ))
+        columns = ["agent", "period_start", "account", "period_type", "name", "status", "fetched_at",
+                   *METRIC_COLUMNS.values()]
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO report_rows ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                records,
+            )
+        return len(records)
+
+    def weekly_totals(self, metric, by="agent", weeks=None, agent=None):
+        """
+        各週合計（列為代理或會員，欄為週期起始日），最後加上週增減
+
+        :param metric: 報表欄位名稱，例如 '應收下線'
+        :param by: "agent" 依代理彙總；"member" 依代理下的每個帳號彙總
+        :param weeks: 只取最近幾週
+        :param agent: 只看指定代理
+        """
+        column = METRIC_COLUMNS[metric]
+        keys = ["agent"] if by == "agent" else ["agent", "account"]
+        query = f"SELECT agent, account, period_start, {column} AS value FROM report_rows"
+        params = []
+        if agent:
+            query += " WHERE agent = ?"
+            params.append(agent)
+        df = pd.read_sql_query(query, self._conn, params=params)
+        if df.empty:
+            return df
+
+        if weeks:
+            recent = sorted(df["period_start"].unique())[-weeks:]
+            df = df[df["period_start"].isin(recent)]
+
+        table = df.pivot_table(index=keys, columns="period_start", values="value",
+                               aggfunc="sum", fill_value=0.0)
+        table.columns.name = None
+        table.index.names = ["代理"] if by == "agent" else ["代理", "帳號"]
+        if table.shape[1] >= 2:
+            table["週增減"] = table.iloc[:, -1] - table.iloc[:, -2]
+        return table
+
+    def close(self):
+        self._conn.close()
+
+
+def print_weekly_totals(store, metric, by="agent", weeks=None, agent=None):
+    """在終端機輸出各週合計表"""
+    table = store.weekly_totals(metric, by=by, weeks=weeks, agent=agent)
+    if table.empty:
+        print("歷史資料庫中沒有資料")
+        return
+    title = "代理" if by == "agent" else "會員"
+    print(f"\n{metric}：依{title}彙總（共 {len(table)} 列）")
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(table.to_string(float_format=lambda v: f"{v:,.2f}"))
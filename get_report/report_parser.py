@@ -0,0 +1,234 @@
+"""
+代理報表 HTML 解析
+瀏覽器端解析（main.EXTRACT_REPORT_JS）失敗時，改用 page_source 在本機解析
+提供 lxml（預先編譯的 XPath）與 BeautifulSoup 兩種實作，輸出完全相同，
+效能比較請執行 bench_parser.py
+"""
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+    import lxml.html
+except ImportError:  # 沒有 lxml 時只使用 BeautifulSoup
+    etree = None
+
+
+def build_report_row(week_type, item):
+    """
+    把一筆報表原始文字整理成輸出格式
+
+    :param item: {"account", "name", "status": 原始文字或 None, "panels": [(標題, [數值片段])]}
+    """
+    data = {}
+
+    # 報表週期
+    data['報表週期'] = week_type
+
+    # 帳號
+    if item['account'] is not None:
+        data['帳號'] = item['account'].replace('帳號：', '').replace('帳號:', '').strip()
+
+    # 名稱
+    if item['name'] is not None:
+        data['名稱'] = item['name'].replace('名稱：', '').replace('名稱:', '').strip()
+
+    # 狀態
+    if item['status'] is not None:
+        data['狀態'] = item['status'].strip()
+
+    # 數據面板
+    for title, parts in item['panels']:
+        if len(parts) >= 2:
+            # 有整數和小數部分，整數移除逗號後組合完整數值
+            value = parts[0].strip().replace(',', '') + parts[1].strip()
+        else:
+            # 只有一個值
+            value = parts[0].strip().replace(',', '')
+        data[title.strip()] = value
+
+    return data
+
+
+def parse_report_bs4(html, week_type="上週"):
+    """
+    以 BeautifulSoup（html.parser）解析報表 HTML
+    
+    :param html: 頁面 HTML
+    :param week_type: 報表週期，"本週" 或 "上週"
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # 檢查是否有「無資料」圖片
+    no_content_img = soup.find('img', {'src': lambda x: x and 'icon_no content' in x})
+    if no_content_img:
+        print(f"{week_type}無資料")
+        return []
+    
+    # 找到所有的 strip-item
+    strip_items = soup.find_all('div', {'class': 'strip-item', 'data-v-95d7a5b4': ''})
+    
+    results = []
+    
+    for item in strip_items:
+        try:
+            raw = {'account': None, 'name': None, 'status': None, 'panels': []}
+            
+            # 帳號
+            account_elem = item.find('div', {'class': 'cratedate'}, string=lambda x: x and '帳號' in x)
+            if account_elem:
+                raw['account'] = account_elem.text
+            
+            # 名稱
+            name_elem = item.find('div', {'class': 'cratedate'}, string=lambda x: x and '名稱' in x)
+            if name_elem:
+                raw['name'] = name_elem.text
+            
+            # 狀態
+            tag_elem = item.find('div', {'class': 'tag'})
+            if tag_elem:
+                txt_elem = tag_elem.find('div', {'class': 'txt'})
+                if txt_elem:
+                    raw['status'] = txt_elem.text
+            
+            # 提取所有數據面板
+            panels = item.find_all('div', {'class': 'panelBox'})
+            
+            for panel in panels:
+                # 取得標題
+                title_elem = panel.find('div', {'class': lambda x: x and 'item-data-feild-title' in x})
+                if not title_elem:
+                    continue
+                
+                # 取得數值
+                value_elem = panel.find('div', {'class': 'item-data-des'})
+                if value_elem:
+                    value_span = value_elem.find('span', recursive=False)
+                    if value_span:
+                        # 找到所有直接子 span，有兩個以上代表分成整數和小數部分
+                        inner_spans = value_span.find_all('span', recursive=False)
+                        if len(inner_spans) >= 2:
+                            parts = [inner_spans[0].text, inner_spans[1].text]
+                        else:
+                            parts = [value_span.text]
+                    else:
+                        # 沒有 span 標籤,直接取文字
+                        parts = [value_elem.text]
+                    raw['panels'].append((title_elem.text, parts))
+            
+            results.append(build_report_row(week_type, raw))
+                
+        except Exception as e:
+            print(f"解析項目時發生錯誤: {e}")
+            continue
+    
+    return results
+
+
+# ============================
+# lxml 解析（預先編譯的 XPath）
+# ============================
+# 以下 XPath 依照 BeautifulSoup 的比對規則撰寫：
+# {'class': 'x'} 比對 class 中任一個 token；{'class': lambda} 比對 class 字串的子字串；
+# {'data-v-95d7a5b4': ''} 需要屬性存在且值為空；.text 不包含註解（XPath string()）
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+if etree is not None:
+    _NO_CONTENT = etree.XPath("//img[contains(@src, 'icon_no content')]")
+    _STRIP_ITEMS = etree.XPath(f"//div[{_has_class('strip-item')}][@data-v-95d7a5b4='']")
+    _CRATEDATES = etree.XPath(f".//div[{_has_class('cratedate')}]")
+    _TAG = etree.XPath(f"(.//div[{_has_class('tag')}])[1]")
+    _TXT = etree.XPath(f"(.//div[{_has_class('txt')}])[1]")
+    _PANELS = etree.XPath(f".//div[{_has_class('panelBox')}]")
+    _TITLE = etree.XPath("(.//div[contains(@class, 'item-data-feild-title')])[1]")
+    _DES = etree.XPath(f"(.//div[{_has_class('item-data-des')}])[1]")
+    _CHILD_SPANS = etree.XPath("span")
+    _TEXT = etree.XPath("string()", smart_strings=False)
+
+
+def _only_string(el):
+    """與 BeautifulSoup 的 .string 相同：只有單一子節點時往下取，直到文字（或註解）節點"""
+    while True:
+        if len(el) == 0:
+            return el.text or None
+        if len(el) > 1 or el.text or el[0].tail:
+            return None
+        el = el[0]
+        if not isinstance(el.tag, str):
+            # 註解 / processing instruction
+            return el.text
+
+
+def _first(xpath, el):
+    found = xpath(el)
+    return found[0] if found else None
+
+
+def parse_report_lxml(html, week_type="上週"):
+    """
+    以 lxml 解析報表 HTML（XPath 預先編譯，整份文件只建立一次 C 語言的樹）
+    
+    :param html: 頁面 HTML
+    :param week_type: 報表週期，"本週" 或 "上週"
+    """
+    doc = lxml.html.document_fromstring(html)
+    
+    # 檢查是否有「無資料」圖片
+    if _NO_CONTENT(doc):
+        print(f"{week_type}無資料")
+        return []
+    
+    results = []
+    
+    for item in _STRIP_ITEMS(doc):
+        try:
+            raw = {'account': None, 'name': None, 'status': None, 'panels': []}
+            
+            # 帳號 / 名稱：第一個 .string 含有關鍵字的 cratedate
+            for elem in _CRATEDATES(item):
+                string = _only_string(elem)
+                if string is None:
+                    continue
+                if raw['account'] is None and '帳號' in string:
+                    raw['account'] = _TEXT(elem)
+                if raw['name'] is None and '名稱' in string:
+                    raw['name'] = _TEXT(elem)
+            
+            # 狀態
+            tag_elem = _first(_TAG, item)
+            if tag_elem is not None:
+                txt_elem = _first(_TXT, tag_elem)
+                if txt_elem is not None:
+                    raw['status'] = _TEXT(txt_elem)
+            
+            # 數據面板
+            for panel in _PANELS(item):
+                title_elem = _first(_TITLE, panel)
+                if title_elem is None:
+                    continue
+                value_elem = _first(_DES, panel)
+                if value_elem is None:
+                    continue
+                value_span = _first(_CHILD_SPANS, value_elem)
+                if value_span is not None:
+                    inner_spans = _CHILD_SPANS(value_span)
+                    if len(inner_spans) >= 2:
+                        parts = [_TEXT(inner_spans[0]), _TEXT(inner_spans[1])]
+                    else:
+                        parts = [_TEXT(value_span)]
+                else:
+                    parts = [_TEXT(value_elem)]
+                raw['panels'].append((_TEXT(title_elem), parts))
+            
+            results.append(build_report_row(week_type, raw))
+        
+        except Exception as e:
+            print(f"解析項目時發生錯誤: {e}")
+            continue
+    
+    return results
+
+
+# 預設使用 lxml，沒有安裝時改用 BeautifulSoup
+parse_report_html = parse_report_lxml if etree is not None else parse_report_bs4
@@ -0,0 +1,4 @@
+"""
+JFW 後台工具共用模組
+create_account / get_report / return_points 三個工具共用的基礎元件
+"""
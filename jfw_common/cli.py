@@ -0,0 +1,90 @@
+"""
+共用命令列參數
+三個工具都可以直接雙擊執行（全部使用預設值），需要調整時再加參數
+"""
+import argparse
+import os
+
+from jfw_common import driver_resolver, endpoints, tracing
+from jfw_common.journal import DEFAULT_RESUME_HOURS
+
+
+def build_parser(description, default_workers=5):
+    """建立包含共用參數的 ArgumentParser"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--workers", type=int,
+        default=int(os.environ.get("JFW_WORKERS", default_workers)),
+        help=f"同時處理的代理數量上限（預設 {default_workers}，可用環境變數 JFW_WORKERS 設定）",
+    )
+    parser.add_argument(
+        "--offline-driver", action="store_true",
+        help="只使用本機快取的 chromedriver，不連網",
+    )
+    parser.add_argument(
+        "--base-url",
+        help=f"後台網址（預設 {endpoints.DEFAULT_BASE_URL}，可用環境變數 JFW_BASE_URL 設定），"
+             "例如 http://127.0.0.1:8765 連到本機模擬後台",
+    )
+    parser.add_argument(
+        "--metrics-port", type=int,
+        default=int(os.environ["JFW_METRICS_PORT"]) if os.environ.get("JFW_METRICS_PORT") else None,
+        help="在本機這個 port 提供 Prometheus 格式的即時指標（/metrics），0 表示自動選擇，"
+             "也可用環境變數 JFW_METRICS_PORT 設定",
+    )
+    parser.add_argument(
+        "--status-interval", type=float, default=30,
+        help="每隔幾秒印出一行進度狀態（目前速率、預估剩餘時間），0 表示不印（預設 30）",
+    )
+    parser.add_argument(
+        "--trace", metavar="PATH", default=os.environ.get("JFW_TRACE"),
+        help="記錄每個步驟的耗時並輸出成 Chrome Trace JSON（可用 chrome://tracing 或 Perfetto 開啟），"
+             "也可用環境變數 JFW_TRACE 設定",
+    )
+    return parser
+
+
+def add_journal_arguments(parser, default_path):
+    """加入執行紀錄參數（--journal / --fresh），中斷後重新執行可以接續上次的進度"""
+    parser.add_argument(
+        "--journal", default=default_path,
+        help=f"執行紀錄檔路徑（預設 {os.path.basename(default_path)}），中斷後重新執行會從紀錄繼續",
+    )
+    parser.add_argument(
+        "--fresh", action="store_true",
+        help="忽略上次未完成的執行紀錄，重新開始新的一輪",
+    )
+    parser.add_argument(
+        "--resume-hours", type=float, default=DEFAULT_RESUME_HOURS,
+        help=f"上次未完成的執行開始超過幾小時就不再接續（預設 {DEFAULT_RESUME_HOURS:g}）",
+    )
+    return parser
+
+
+def add_session_arguments(parser, default_path):
+    """加入登入狀態保存參數（--reuse-login / --session-file / --session-hours）"""
+    parser.add_argument(
+        "--reuse-login", action="store_true",
+        default=os.environ.get("JFW_REUSE_LOGIN", "").strip().lower() in ("1", "true", "yes"),
+        help="保存每個代理的登入狀態，下次執行先沿用（檢查失效才重新登入），"
+             "也可用環境變數 JFW_REUSE_LOGIN=1 設定",
+    )
+    parser.add_argument(
+        "--session-file", default=default_path,
+        help=f"登入狀態保存檔路徑（預設 {os.path.basename(default_path)}，內含登入憑證，請勿外流）",
+    )
+    parser.add_argument(
+        "--session-hours", type=float, default=6,
+        help="保存的登入狀態幾小時內有效（預設 6）",
+    )
+    return parser
+
+
+def apply_common_arguments(args):
+    """套用共用參數的全域設定"""
+    if args.offline_driver:
+        driver_resolver.set_offline(True)
+    if args.base_url:
+        endpoints.set_base_url(args.base_url)
+    if args.trace:
+        tracing.enable(args.trace)
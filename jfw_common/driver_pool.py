@@ -0,0 +1,276 @@
+"""
+Chrome Driver 連線池
+預先啟動 Chrome 並在代理之間重複使用，避免每個代理都重新啟動瀏覽器
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# ============================
+# Driver 狀態工具
+# ============================
+def is_driver_alive(driver):
+    """檢查瀏覽器是否仍可操作（視窗被關閉或 chromedriver 掛掉都會回傳 False）"""
+    try:
+        driver.window_handles
+        return True
+    except Exception:
+        return False
+
+
+def quit_quietly(driver):
+    """關閉瀏覽器，忽略所有錯誤"""
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def reset_session(driver):
+    """
+    清除上一個代理留下的登入狀態
+    關閉多餘分頁、清除 cookies / localStorage / sessionStorage，最後停在空白頁
+    """
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+    # 清除目前網域的所有儲存資料（localStorage、IndexedDB、cache storage...）
+    try:
+        origin = driver.execute_script("return window.location.origin;")
+        if origin and origin.startswith("http"):
+            driver.execute_cdp_cmd(
+                "Storage.clearDataForOrigin",
+                {"origin": origin, "storageTypes": "all"},
+            )
+    except Exception:
+        pass
+    try:
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    except Exception:
+        pass
+
+    # 清除所有網域的 cookies
+    try:
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    except Exception:
+        driver.delete_all_cookies()
+
+    driver.get("about:blank")
+
+
+# ============================
+# 連線池
+# ============================
+class DriverPool:
+    """
+    執行緒安全的 Chrome Driver 連線池
+
+    :param factory: 建立新 driver 的函數（例如各工具的 create_driver）
+    :param size: 同時存在的 driver 上限
+    :param max_uses: 每個 driver 最多借用幾次，超過後關閉並重新啟動
+    """
+
+    def __init__(self, factory, size=1, max_uses=20):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_uses = max_uses
+
+        self._idle = deque()
+        self._uses = {}          # id(driver) -> 已借用次數
+        self._total = 0          # 目前存在的 driver 數量（含借出中）
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # 統計資料
+        self.cold_starts = 0
+        self.cold_start_seconds = 0.0
+        self.reuses = 0
+        self.recycled = 0
+        self.crashed = 0
+
+    # ----------------------------
+    # 啟動 / 丟棄
+    # ----------------------------
+    def _start_driver(self):
+        """啟動一個新的 driver（呼叫前必須已預留 _total 名額）"""
+        start = time.perf_counter()
+        try:
+            driver = self.factory()
+        except BaseException:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self.cold_starts += 1
+            self.cold_start_seconds += elapsed
+            self._uses[id(driver)] = 0
+        return driver
+
+    def _discard(self, driver):
+        """關閉 driver 並釋放名額"""
+        quit_quietly(driver)
+        with self._cond:
+            self._uses.pop(id(driver), None)
+            self._total -= 1
+            self._cond.notify()
+
+    def prewarm(self, count=None):
+        """預先平行啟動 count 個瀏覽器放入池中（預設補滿到 size）"""
+        with self._cond:
+            count = self.size if count is None else count
+            count = max(0, min(count, self.size - self._total))
+            self._total += count
+
+        errors = []
+
+        def _warm():
+            try:
+                driver = self._start_driver()
+            except Exception as e:
+                errors.append(e)
+                return
+            with self._cond:
+                self._idle.append(driver)
+                self._cond.notify()
+
+        threads = [threading.Thread(target=_warm, name=f"prewarm-{i}") for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            print(f"預熱瀏覽器時有 {len(errors)} 個失敗：{errors[0]}")
+        return count - len(errors)
+
+    # ----------------------------
+    # 借用 / 歸還
+    # ----------------------------
+    def acquire(self):
+        """借出一個可用的 driver，池中沒有閒置且已達上限時會等待"""
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("DriverPool 已關閉")
+                while not self._idle and self._total >= self.size:
+                    self._cond.wait()
+                if self._idle:
+                    driver = self._idle.popleft()
+                    reused = True
+                else:
+                    self._total += 1
+                    reused = False
+
+            if not reused:
+                driver = self._start_driver()
+            elif not is_driver_alive(driver):
+                # 閒置期間瀏覽器已經掛掉，丟棄後重新借用
+                with self._cond:
+                    self.crashed += 1
+                self._discard(driver)
+                continue
+
+            with self._cond:
+                self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+                if reused:
+                    self.reuses += 1
+            return driver
+
+    def release(self, driver, broken=False):
+        """
+        歸還 driver
+        已損壞、達到使用上限或清除失敗的 driver 會直接關閉，名額讓給下一次重新啟動
+        """
+        if driver is None:
+            return
+
+        if broken or not is_driver_alive(driver):
+            with self._cond:
+                self.crashed += 1
+            self._discard(driver)
+            return
+
+        with self._cond:
+            closed = self._closed
+            uses = self._uses.get(id(driver), 0)
+        if closed:
+            self._discard(driver)
+            return
+        if uses >= self.max_uses:
+            with self._cond:
+                self.recycled += 1
+            self._discard(driver)
+            return
+
+        try:
+            reset_session(driver)
+        except Exception:
+            with self._cond:
+                self.crashed += 1
+            self._discard(driver)
+            return
+
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+
+    @contextmanager
+    def session(self):
+        """with pool.session() as driver: ... 結束後自動歸還"""
+        driver = self.acquire()
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """關閉池中所有閒置的 driver，借出中的 driver 會在歸還時關閉"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for driver in idle:
+            self._discard(driver)
+
+    # ----------------------------
+    # 統計
+    # ----------------------------
+    @property
+    def open_count(self):
+        """目前開著的瀏覽器數（含借出中）"""
+        with self._cond:
+            return self._total
+
+    @property
+    def busy_count(self):
+        """目前借出中的瀏覽器數"""
+        with self._cond:
+            return self._total - len(self._idle)
+
+    @property
+    def average_start_seconds(self):
+        if not self.cold_starts:
+            return 0.0
+        return self.cold_start_seconds / self.cold_starts
+
+    @property
+    def saved_seconds(self):
+        """重複使用省下的啟動時間（以平均冷啟動時間估算）"""
+        return self.reuses * self.average_start_seconds
+
+    def summary(self):
+        """回傳連線池統計摘要"""
+        return (
+            f"瀏覽器連線池：啟動 {self.cold_starts} 次"
+            f"（平均 {self.average_start_seconds:.1f} 秒）、重複使用 {self.reuses} 次、"
+            f"回收 {self.recycled} 次、異常 {self.crashed} 次，"
+            f"約節省 {self.saved_seconds:.1f} 秒啟動時間"
+        )
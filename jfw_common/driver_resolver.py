@@ -0,0 +1,197 @@
+"""
+ChromeDriver 路徑解析
+每個行程只解析一次，並把 chromedriver 依 Chrome 主版本快取到本機，
+快取命中時完全不需要連網；離線模式下絕不呼叫 webdriver-manager
+"""
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+
+# 快取目錄（可用環境變數 JFW_DRIVER_CACHE_DIR 覆蓋）
+CACHE_DIR = os.environ.get(
+    "JFW_DRIVER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".jfw_chromedriver"),
+)
+CACHE_INDEX = os.path.join(CACHE_DIR, "cache.json")
+
+_lock = threading.Lock()
+_resolved_path = None
+_offline = os.environ.get("JFW_DRIVER_OFFLINE", "").strip().lower() in ("1", "true", "yes")
+
+
+def set_offline(offline=True):
+    """開啟/關閉離線模式（離線時只使用本機快取）"""
+    global _offline
+    _offline = offline
+
+
+# ============================
+# 偵測 Chrome 版本（不經過網路）
+# ============================
+def _chrome_version_windows():
+    import winreg
+
+    keys = [
+        (winreg.HKEY_CURRENT_USER, r"Software\Google\Chrome\BLBeacon"),
+        (winreg.HKEY_LOCAL_MACHINE, r"Software\Google\Chrome\BLBeacon"),
+        (winreg.HKEY_LOCAL_MACHINE, r"Software\WOW6432Node\Google\Chrome\BLBeacon"),
+    ]
+    for root, path in keys:
+        try:
+            with winreg.OpenKey(root, path) as key:
+                return winreg.QueryValueEx(key, "version")[0]
+        except OSError:
+            continue
+    return None
+
+
+def _chrome_version_mac():
+    import plistlib
+
+    plist = "/Applications/Google Chrome.app/Contents/Info.plist"
+    if not os.path.exists(plist):
+        return None
+    with open(plist, "rb") as f:
+        return plistlib.load(f).get("CFBundleShortVersionString")
+
+
+def _chrome_version_linux():
+    for binary in ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser"):
+        try:
+            result = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=5)
+        except (FileNotFoundError, subprocess.TimeoutExpired):
+            continue
+        match = re.search(r"\d+(\.\d+)+", result.stdout)
+        if match:
+            return match.group(0)
+    return None
+
+
+def detect_chrome_version():
+    """回傳本機 Chrome 版本字串（例如 '131.0.6778.86'），偵測不到回傳 None"""
+    try:
+        system = platform.system()
+        if system == "Windows":
+            return _chrome_version_windows()
+        if system == "Darwin":
+            return _chrome_version_mac()
+        return _chrome_version_linux()
+    except Exception:
+        return None
+
+
+def _major(version):
+    return version.split(".")[0] if version else None
+
+
+# ============================
+# 本機快取
+# ============================
+def _load_index():
+    try:
+        with open(CACHE_INDEX, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(index):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = CACHE_INDEX + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, CACHE_INDEX)
+
+
+def _lookup_cache(major):
+    """依主版本查快取；major 為 None 時回傳最新的一筆"""
+    index = _load_index()
+    entries = [(k, v) for k, v in index.items() if os.path.exists(v.get("path", ""))]
+    if major is not None:
+        entries = [(k, v) for k, v in entries if k == major]
+    if not entries:
+        return None
+    entries.sort(key=lambda kv: kv[1].get("cached_at", 0), reverse=True)
+    return entries[0][1]["path"]
+
+
+def _store_cache(major, chrome_version, source_path):
+    """把 webdriver-manager 下載的 chromedriver 複製到快取目錄並記錄"""
+    target_dir = os.path.join(CACHE_DIR, major or "unknown")
+    os.makedirs(target_dir, exist_ok=True)
+    target = os.path.join(target_dir, os.path.basename(source_path))
+    shutil.copy2(source_path, target)
+    os.chmod(target, 0o755)
+
+    # macOS 需要移除 quarantine 屬性
+    if platform.system() == "Darwin":
+        subprocess.run(["xattr", "-d", "com.apple.quarantine", target], capture_output=True, check=False)
+
+    index = _load_index()
+    index[major or "unknown"] = {
+        "path": target,
+        "chrome_version": chrome_version,
+        "cached_at": time.time(),
+    }
+    _save_index(index)
+    return target
+
+
+# ============================
+# 對外介面
+# ============================
+def resolve_chromedriver():
+    """
+    取得 chromedriver 路徑（執行緒安全，每個行程只解析一次）
+
+    1. 同一行程已解析過 → 直接回傳
+    2. 本機快取有對應 Chrome 主版本 → 直接使用，不連網
+       偵測不到版本時 → 優先使用版本未知時下載的快取，其次是最新的快取
+    3. 離線模式 → 使用最新的快取，沒有快取則丟出 RuntimeError
+    4. 其餘情況（完全沒有可用快取）才呼叫 ChromeDriverManager 下載並寫入快取
+    """
+    global _resolved_path
+    if _resolved_path:
+        return _resolved_path
+
+    with _lock:
+        if _resolved_path:
+            return _resolved_path
+
+        start = time.perf_counter()
+        chrome_version = detect_chrome_version()
+        major = _major(chrome_version)
+
+        # 偵測不到版本時無法確認相容性，沿用上次在同樣情況下下載的（或最新的）快取，
+        # 避免每次執行都連網；都沒有快取才交給 webdriver-manager
+        if major:
+            path = _lookup_cache(major)
+        else:
+            path = _lookup_cache("unknown") or _lookup_cache(None)
+        source = "本機快取"
+        if path is None and _offline:
+            path = _lookup_cache(None)
+            if path is None:
+                raise RuntimeError(
+                    f"離線模式下找不到 chromedriver 快取（{CACHE_DIR}），請先在有網路時執行一次"
+                )
+        if path is None:
+            from webdriver_manager.chrome import ChromeDriverManager
+
+            source = "webdriver-manager"
+            path = ChromeDriverManager().install()
+            try:
+                path = _store_cache(major, chrome_version, path)
+            except OSError as e:
+                print(f"寫入 chromedriver 快取失敗，改用原始路徑：{e}")
+
+        _resolved_path = path
+        elapsed = time.perf_counter() - start
+        print(f"ChromeDriver 來源：{source}（Chrome {chrome_version or '版本未知'}，{elapsed * 1000:.0f} ms）")
+        return _resolved_path
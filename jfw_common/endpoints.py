@@ -0,0 +1,31 @@
+"""
+後台網址
+預設連到正式站；可用 --base-url 或環境變數 JFW_BASE_URL 改成其他位置，
+例如本機的模擬後台（python -m jfw_standin）
+"""
+import os
+
+DEFAULT_BASE_URL = "https://ad.jfw-win.com"
+
+# 後台頁面（hash 路由）
+LOGIN_ROUTE = "/agent-login"
+HOME_ROUTE = "/"
+AGENT_USER_ROUTE = "/agent/user-manage/agent-user"
+REPORT_ROUTE = "/agent/report-manage/agentReport"
+
+_base_url = (os.environ.get("JFW_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+
+
+def set_base_url(url):
+    """改變後台網址（需在開始連線前呼叫）"""
+    global _base_url
+    _base_url = url.rstrip("/")
+
+
+def base_url():
+    return _base_url
+
+
+def page_url(route):
+    """組出後台頁面網址，例如 page_url(LOGIN_ROUTE) -> https://ad.jfw-win.com/#/agent-login"""
+    return f"{_base_url}/#{route}"
@@ -0,0 +1,111 @@
+"""
+執行紀錄（append-only JSONL）
+每個事件寫入一行並立即 fsync，程式中斷後重新執行可以從上次的進度繼續
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_RESUME_HOURS = 12
+
+
+class RunJournal:
+    """
+    :param path: JSONL 檔路徑
+    :param fresh: True 時不接續上次未完成的執行，直接開始新的一輪
+    :param max_age_hours: 上一輪開始超過幾小時就不再接續（None 表示不限制）
+
+    上一輪沒有 run_end 事件（被中斷）且仍在時限內時會沿用同一個 run_id 繼續，
+    find() 只會查詢目前這一輪的紀錄；超過時限的未完成執行記在 stale_run_id
+    """
+
+    def __init__(self, path, fresh=False, max_age_hours=DEFAULT_RESUME_HOURS):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = []
+        self.stale_run_id = None
+
+        last_run_id = None
+        last_run_started = None
+        last_run_ended = True
+        for record in self._load():
+            if record.get("run_id") != last_run_id:
+                last_run_id = record.get("run_id")
+                last_run_started = record.get("ts", 0)
+            last_run_ended = record.get("event") == "run_end"
+            self._records.append(record)
+
+        expired = (max_age_hours is not None and last_run_started is not None
+                   and time.time() - last_run_started > max_age_hours * 3600)
+        if last_run_id and not last_run_ended and not fresh and not expired:
+            self.run_id = last_run_id
+            self.resumed = True
+        else:
+            if last_run_id and not last_run_ended and not fresh:
+                self.stale_run_id = last_run_id
+            self.run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+            self.resumed = False
+        self._records = [r for r in self._records if r.get("run_id") == self.run_id]
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        # 前一次中斷可能留下沒有換行的半行，先補換行避免新紀錄黏在後面
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write("\n")
+            self._file.flush()
+        if not self.resumed:
+            self.record("run_start")
+
+    def _load(self):
+        """讀取既有紀錄；中斷時寫到一半的最後一行會被略過"""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records
+
+    def record(self, event, **fields):
+        """寫入一筆事件並立即落地"""
+        record = {"run_id": self.run_id, "ts": time.time(), "event": event}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._records.append(record)
+        return record
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def find(self, event=None, **fields):
+        """查詢目前這一輪中符合條件的紀錄"""
+        with self._lock:
+            records = list(self._records)
+        return [
+            r for r in records
+            if (event is None or r.get("event") == event)
+            and all(r.get(k) == v for k, v in fields.items())
+        ]
+
+    def finish(self):
+        """標記這一輪已完整結束，下次執行會開始新的一輪"""
+        self.record("run_end")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,248 @@
+"""
+帳號紀錄背景寫入器
+所有 worker 只把創建好的帳號放進佇列，由單一背景執行緒批次寫檔：
+累積 batch_size 筆或每 flush_interval 秒寫入一次，先寫暫存檔再取代原檔，
+中途中斷也不會留下寫到一半的行
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+
+# ============================
+# 檔案格式
+# ============================
+# 已按下創建但無法確認結果的帳號（可能已建立），在 txt / csv 行尾加上此標記
+UNCONFIRMED_MARK = "未確認"
+
+
+def _mark(account):
+    return UNCONFIRMED_MARK if account.get("unconfirmed") else ""
+
+
+def _txt_header(agent, agent_password):
+    return ["代理帳號,代理密碼", f"{agent},{agent_password}", "遊戲帳號,遊戲密碼"]
+
+
+def _txt_row(agent, account):
+    row = f"{account['account']},{account['password']}"
+    return f"{row},{UNCONFIRMED_MARK}" if account.get("unconfirmed") else row
+
+
+def _txt_keys(lines):
+    """遊戲帳號標題之後每一行的第一欄"""
+    try:
+        start = lines.index("遊戲帳號,遊戲密碼") + 1
+    except ValueError:
+        return set()
+    return {line.split(",", 1)[0] for line in lines[start:] if line}
+
+
+def _csv_header(agent, agent_password):
+    return ["代理帳號,遊戲帳號,遊戲密碼,建立時間,備註"]
+
+
+def _csv_row(agent, account):
+    return f"{agent},{account['account']},{account['password']},{account.get('created_at', '')},{_mark(account)}"
+
+
+def _csv_keys(lines):
+    return {line.split(",")[1] for line in lines[1:] if line.count(",") >= 2}
+
+
+def _jsonl_header(agent, agent_password):
+    return []
+
+
+def _jsonl_row(agent, account):
+    return json.dumps({"agent": agent, **account}, ensure_ascii=False)
+
+
+def _jsonl_keys(lines):
+    keys = set()
+    for line in lines:
+        try:
+            keys.add(json.loads(line)["account"])
+        except (ValueError, KeyError, TypeError):
+            continue
+    return keys
+
+
+# 格式名稱 -> (副檔名, 編碼, 標題, 單行格式, 解析已寫入帳號)
+FORMATS = {
+    "txt": (".txt", "utf-8", _txt_header, _txt_row, _txt_keys),
+    "csv": (".csv", "utf-8-sig", _csv_header, _csv_row, _csv_keys),
+    "jsonl": (".jsonl", "utf-8", _jsonl_header, _jsonl_row, _jsonl_keys),
+}
+
+
+class _LedgerFile:
+    """單一紀錄檔：內容保留在記憶體，flush 時整份以暫存檔取代原檔"""
+
+    def __init__(self, path, fmt, agent, agent_password):
+        _, self.encoding, header, self.format_row, parse_keys = FORMATS[fmt]
+        self.path = path
+        self.agent = agent
+        self.lines = self._read() or header(agent, agent_password)
+        self.keys = parse_keys(self.lines)
+        self.dirty = not os.path.exists(path)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding=self.encoding) as f:
+            return [line.rstrip("\n") for line in f if line.strip()]
+
+    def add(self, account):
+        if account["account"] in self.keys:
+            return False
+        self.keys.add(account["account"])
+        self.lines.append(self.format_row(self.agent, account))
+        self.dirty = True
+        return True
+
+    def flush(self):
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding=self.encoding) as f:
+            f.write("\n".join(self.lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+# ============================
+# 背景寫入器
+# ============================
+class LedgerWriter:
+    """
+    :param flush_interval: 最長幾秒寫入一次
+    :param batch_size: 累積幾筆就立即寫入
+    :param formats: 要輸出的格式（txt 為原本的桌面 TXT，另可加 csv / jsonl）
+    """
+
+    def __init__(self, flush_interval=2.0, batch_size=20, formats=("txt",)):
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.formats = [fmt for fmt in FORMATS if fmt in formats] or ["txt"]
+
+        self._queue = queue.Queue()
+        self._files = {}         # agent -> [_LedgerFile, ...]
+        self._unflushed = 0
+
+        # 統計資料
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+
+        self._thread = threading.Thread(target=self._run, name="ledger-writer", daemon=True)
+        self._thread.start()
+
+    # ----------------------------
+    # worker 端（只放進佇列，不碰磁碟）
+    # ----------------------------
+    def open(self, agent, agent_password, txt_path, known=()):
+        """
+        登記代理的紀錄檔（不存在時建立並寫入標題）
+        known 為執行紀錄中已確認的帳號，檔案中缺少的會補寫進去
+        """
+        self._queue.put(("open", agent, agent_password, txt_path, list(known)))
+
+    def add(self, agent, account):
+        """
+        加入一筆創建成功的帳號 {"account": ..., "password": ...}
+        已送出但無法確認結果的帳號帶 "unconfirmed": True，寫入時會加上未確認標記
+        """
+        account = dict(account)
+        account.setdefault("created_at", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self._queue.put(("add", agent, account))
+
+    def close(self):
+        """寫入所有剩餘資料並停止背景執行緒"""
+        self._queue.put(("close",))
+        self._thread.join()
+
+    # ----------------------------
+    # 背景執行緒
+    # ----------------------------
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                message = self._queue.get(timeout=max(0.0, next_flush - time.monotonic()))
+            except queue.Empty:
+                message = None
+
+            if message is not None:
+                kind = message[0]
+                if kind == "close":
+                    self._flush()
+                    return
+                try:
+                    if kind == "open":
+                        self._open(*message[1:])
+                    elif kind == "add":
+                        self._add(*message[1:])
+                except Exception as e:
+                    # 單筆資料異常不能讓背景執行緒結束，否則之後的帳號都不會寫入
+                    self.errors += 1
+                    print(f"帳號紀錄處理失敗：{e}")
+
+            if self._unflushed >= self.batch_size or time.monotonic() >= next_flush:
+                self._flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def _open(self, agent, agent_password, txt_path, known):
+        if agent not in self._files:
+            base = os.path.splitext(txt_path)[0]
+            try:
+                self._files[agent] = [
+                    _LedgerFile(base + FORMATS[fmt][0], fmt, agent, agent_password)
+                    for fmt in self.formats
+                ]
+            except OSError as e:
+                self.errors += 1
+                print(f"[{agent}] 讀取帳號紀錄檔失敗：{e}")
+                return
+        for account in known:
+            self._add(agent, account, count=False)
+        # 新建立的檔案立即寫入標題
+        self._flush()
+
+    def _add(self, agent, account, count=True):
+        added = False
+        for ledger_file in self._files.get(agent, []):
+            added = ledger_file.add(account) or added
+        if added:
+            self._unflushed += 1
+            if count:
+                self.written += 1
+
+    def _flush(self):
+        flushed = False
+        for ledger_files in self._files.values():
+            for ledger_file in ledger_files:
+                if not ledger_file.dirty:
+                    continue
+                try:
+                    ledger_file.flush()
+                    flushed = True
+                except OSError as e:
+                    # 檔案被其他程式（例如 Excel）鎖住時保留在記憶體，下次再寫
+                    self.errors += 1
+                    print(f"寫入 {ledger_file.path} 失敗，稍後重試：{e}")
+        if flushed:
+            self.flushes += 1
+        self._unflushed = 0
+
+    def summary(self):
+        """回傳寫入統計摘要"""
+        line = f"帳號紀錄：寫入 {self.written} 筆，批次寫檔 {self.flushes} 次（{'/'.join(self.formats)}）"
+        if self.errors:
+            line += f"，寫檔失敗 {self.errors} 次"
+        return line
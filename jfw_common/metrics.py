@@ -0,0 +1,403 @@
+"""
+執行中的計數與耗時統計
+長時間執行時不用翻 console 也能知道進度：
+- 計數器 / 直方圖 / 即時數值都記在同一個 registry（執行緒安全）
+- RunMonitor 定時印出一行狀態（目前速率、預估剩餘時間），
+  可選擇在本機開一個 Prometheus 文字格式的 HTTP 端點，結束時把同樣的數字寫成 JSON
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from jfw_common import tracing
+
+
+# ============================
+# 指標
+# ============================
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"標籤必須是 {labelnames}，收到 {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只會增加的計數（例如已創建帳號數）"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self):
+        """所有標籤的合計"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self):
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self.samples()]
+
+    def snapshot(self):
+        return {",".join(key) or "total": value for key, value in self.samples()}
+
+
+class Gauge:
+    """目前的數值，可直接設定或指定讀取函數（例如目前開著的瀏覽器數）"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._value = 0
+        self._function = None
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, function):
+        """每次讀取時呼叫 function() 取得目前數值"""
+        self._function = function
+
+    def value(self):
+        if self._function is not None:
+            try:
+                return self._function()
+            except Exception:
+                return self._value
+        return self._value
+
+    def render(self):
+        return [f"{self.name} {_format_value(self.value())}"]
+
+    def snapshot(self):
+        return self.value()
+
+
+class Histogram:
+    """耗時分布（固定區間），可估算 p50 / p95"""
+
+    kind = "histogram"
+
+    DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._lock = threading.Lock()
+        self._values = {}   # key -> [各區間次數..., 總和, 次數]
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            return sorted((key, list(entry)) for key, entry in self._values.items())
+
+    def quantile(self, entry, q):
+        """由區間次數線性內插估算百分位數"""
+        count = entry[-1]
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets):
+            in_bucket = entry[i]
+            if seen + in_bucket >= rank and in_bucket:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / in_bucket
+            seen += in_bucket
+            lower = bound
+        return lower
+
+    def render(self):
+        lines = []
+        for key, entry in self.samples():
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += entry[i]
+                le = (("le", _format_value(float(bound))),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry[-2])}")
+            lines.append(f"{self.name}_count{labels} {entry[-1]}")
+        return lines
+
+    def snapshot(self):
+        result = {}
+        for key, entry in self.samples():
+            count = entry[-1]
+            result[",".join(key) or "total"] = {
+                "count": count,
+                "sum": round(entry[-2], 3),
+                "mean": round(entry[-2] / count, 3) if count else None,
+                "p50": round(self.quantile(entry, 0.50), 3),
+                "p95": round(self.quantile(entry, 0.95), 3),
+            }
+        return result
+
+
+class Registry:
+    """所有指標的集合"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text):
+        return self._register(Gauge(name, help_text))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self):
+        """Prometheus 文字格式"""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics()}
+
+
+registry = Registry()
+
+# 三個工具共用的指標
+accounts_created = registry.counter("jfw_accounts_created_total", "已創建的帳號數", ("agent",))
+members_adjusted = registry.counter("jfw_members_adjusted_total", "已上下分的會員數", ("agent",))
+agents_done = registry.counter("jfw_agents_done_total", "已處理完成的代理數")
+failures = registry.counter("jfw_failures_total", "失敗次數", ("kind",))
+step_seconds = registry.histogram("jfw_step_seconds", "每個步驟的耗時（秒）", ("step",))
+active_browsers = registry.gauge("jfw_active_browsers", "目前開著的瀏覽器數")
+busy_browsers = registry.gauge("jfw_busy_browsers", "目前借出中的瀏覽器數")
+
+
+def _observe_step(name, cat, agent, seconds, ok):
+    """步驟耗時直接取自 tracing 的 span（run_step 與 @tracing.traced 的函數），只在 RunMonitor 執行期間註冊"""
+    if cat == "step":
+        step_seconds.observe(seconds, step=name)
+
+
+# ============================
+# HTTP 端點
+# ============================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1", registry=registry):
+    """在背景執行緒提供 /metrics（port 為 0 時自動選一個），回傳 server，結束時呼叫 shutdown()"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+# ============================
+# 執行監控
+# ============================
+def _format_minutes(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f} 秒"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} 分鐘"
+    return f"{seconds / 3600:.1f} 小時"
+
+
+class RunMonitor:
+    """
+    單次執行的進度監控：定時印出一行狀態、提供 HTTP 端點、結束時寫出 JSON
+
+    :param progress: 代表進度的計數器（例如 accounts_created）
+    :param total: 本次要完成的數量
+    :param unit: 進度單位（例如「隻帳號」）
+    :param interval: 狀態列印間隔（秒），0 表示不印
+    :param port: HTTP 端點的 port，None 表示不開
+    :param window: 計算目前速率的時間範圍（秒）
+    :param extras: 狀態列額外顯示的計數器 [(名稱, counter), ...]
+    """
+
+    def __init__(self, progress, total, unit, interval=30, port=None, window=300, extras=(),
+                 registry=registry):
+        self.progress = progress
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.port = port
+        self.window = window
+        self.extras = list(extras)
+        self.registry = registry
+
+        self._baseline = progress.total()   # 同一程序內可能已累計過（例如效能測試）
+        self._samples = deque()
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+        self.started_at = None
+        self.url = None
+
+    def watch_pool(self, pool):
+        """瀏覽器數量直接讀取連線池"""
+        active_browsers.set_function(lambda: pool.open_count)
+        busy_browsers.set_function(lambda: pool.busy_count)
+
+    def start(self):
+        self.started_at = time.time()
+        self._samples.append((time.perf_counter(), 0))
+        tracing.tracer.add_listener(_observe_step)
+        if self.port is not None:
+            self._server = start_http_server(self.port)
+            self.url = f"http://127.0.0.1:{self._server.server_address[1]}/metrics"
+            print(f"即時指標：{self.url}")
+        if self.interval and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="status", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        tracing.tracer.remove_listener(_observe_step)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            print(self.status_line())
+
+    @property
+    def done(self):
+        return self.progress.total() - self._baseline
+
+    def rate(self):
+        """最近 window 秒的速率（每分鐘）"""
+        now = time.perf_counter()
+        done = self.done
+        self._samples.append((now, done))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+        since, before = self._samples[0]
+        if now - since <= 0:
+            return 0.0
+        return (done - before) / (now - since) * 60
+
+    def status_line(self):
+        done = self.done
+        rate = self.rate()
+        parts = [f"[狀態] {done}/{self.total} {self.unit}"]
+        if self.total:
+            parts[0] += f"（{done / self.total:.0%}）"
+        parts.append(f"{rate:.1f}/分")
+        for label, counter in self.extras:
+            parts.append(f"{label} {counter.total()}")
+        parts.append(f"失敗 {failures.total()}")
+        parts.append(f"瀏覽器 {busy_browsers.value()}/{active_browsers.value()} 使用中")
+        remaining = self.total - done
+        if remaining <= 0:
+            parts.append("已完成")
+        elif rate > 0:
+            parts.append(f"預估剩餘 {_format_minutes(remaining / rate * 60)}")
+        else:
+            parts.append("預估剩餘 —")
+        return "，".join(parts)
+
+    def dump(self, path):
+        """把所有指標寫成 JSON，回傳路徑"""
+        data = {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds")
+            if self.started_at else None,
+            "elapsed_seconds": round(time.time() - self.started_at, 1) if self.started_at else None,
+            "progress": {"done": self.done, "total": self.total, "unit": self.unit},
+            "metrics": self.registry.snapshot(),
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def summary(self):
+        elapsed = time.time() - self.started_at if self.started_at else 0
+        average = self.done / elapsed * 60 if elapsed > 0 else 0
+        return (f"執行指標：完成 {self.done}/{self.total} {self.unit}，平均 {average:.1f}/分，"
+                f"失敗 {failures.total()}，耗時 {_format_minutes(elapsed)}")
@@ -0,0 +1,89 @@
+"""
+工作排程：依預估耗時做最長工作優先（LPT）排序
+並保存每個步驟的歷史耗時，讓下一次執行的預估更準
+"""
+import heapq
+import json
+import os
+import threading
+
+
+class StepTimings:
+    """
+    各步驟耗時紀錄（執行緒安全）
+    歷史平均存在 JSON 檔，本次執行的新樣本在 save() 時合併進去
+
+    :param path: JSON 檔路徑
+    :param history_weight: 合併時歷史平均最多視為幾筆樣本（越小越快反映最新速度）
+    """
+
+    def __init__(self, path, history_weight=50):
+        self.path = path
+        self.history_weight = history_weight
+        self._lock = threading.Lock()
+        self._history = self._load()
+        self._samples = {}
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, step, seconds):
+        """記錄一次步驟耗時"""
+        with self._lock:
+            self._samples.setdefault(step, []).append(seconds)
+
+    def mean(self, step, default):
+        """取得步驟平均耗時（歷史 + 本次），沒有紀錄時回傳 default"""
+        with self._lock:
+            history = self._history.get(step)
+            samples = self._samples.get(step, [])
+            weight = min(history["count"], self.history_weight) if history else 0
+            total = (history["mean"] * weight if history else 0.0) + sum(samples)
+            count = weight + len(samples)
+        return total / count if count else default
+
+    def save(self):
+        """把本次樣本合併進歷史並寫回檔案（先寫暫存檔再取代）"""
+        with self._lock:
+            for step, samples in self._samples.items():
+                history = self._history.get(step, {"count": 0, "mean": 0.0})
+                weight = min(history["count"], self.history_weight)
+                count = weight + len(samples)
+                self._history[step] = {
+                    "count": history["count"] + len(samples),
+                    "mean": (history["mean"] * weight + sum(samples)) / count,
+                }
+            self._samples = {}
+            data = dict(self._history)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def simulate_makespan(costs, workers):
+    """模擬 worker 依序從佇列取工作（做完一個取下一個），回傳預估總耗時"""
+    finish_times = [0.0] * max(1, min(workers, len(costs)) if costs else 1)
+    heapq.heapify(finish_times)
+    for cost in costs:
+        earliest = heapq.heappop(finish_times)
+        heapq.heappush(finish_times, earliest + cost)
+    return max(finish_times)
+
+
+def longest_first(jobs, cost_fn, workers):
+    """
+    最長工作優先排序
+
+    :param jobs: 工作列表
+    :param cost_fn: 回傳單一工作預估耗時（秒）的函數
+    :param workers: worker 數量
+    :return: (排序後的工作列表, 預估總耗時)
+    """
+    ordered = sorted(jobs, key=cost_fn, reverse=True)
+    return ordered, simulate_makespan([cost_fn(job) for job in ordered], workers)
@@ -0,0 +1,179 @@
+"""
+登入狀態保存
+登入成功後把代理的 cookies 與 localStorage 存到檔案；之後的執行（或中斷後重新執行）
+先還原登入狀態，開一次目標頁確認仍有效，失效才走完整的登入表單
+
+檔案內含登入憑證，只存在本機，超過有效時間的紀錄不會使用
+"""
+import json
+import os
+import threading
+import time
+
+from jfw_common import endpoints, waits
+
+DEFAULT_TTL_HOURS = 6
+
+# 還原時寫回瀏覽器的 cookie 欄位（其餘欄位 add_cookie 不接受）
+COOKIE_FIELDS = ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")
+
+_READ_STORAGE_JS = """
+var data = {};
+for (var i = 0; i < localStorage.length; i++) {
+    var key = localStorage.key(i);
+    data[key] = localStorage.getItem(key);
+}
+return data;
+"""
+
+_WRITE_STORAGE_JS = """
+var data = arguments[0];
+for (var key in data) { localStorage.setItem(key, data[key]); }
+"""
+
+
+class SessionStore:
+    """
+    依 (後台網址, 代理) 保存登入狀態（執行緒安全）
+
+    :param path: 保存檔路徑
+    :param ttl_hours: 保存後幾小時內有效
+    """
+
+    def __init__(self, path, ttl_hours=DEFAULT_TTL_HOURS):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+        # 統計資料
+        self.restored = 0
+        self.expired = 0
+        self.rejected = 0
+        self.saved = 0
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"登入狀態檔無法讀取，忽略：{e}")
+            return {}
+        now = time.time()
+        return {key: entry for key, entry in entries.items() if entry.get("expires_at", 0) > now}
+
+    def _write(self):
+        """呼叫前必須持有 _lock"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        try:
+            os.chmod(tmp_path, 0o600)
+        except OSError:
+            pass
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _key(agent):
+        return f"{endpoints.base_url()}|{agent}"
+
+    # ----------------------------
+    # 保存 / 還原
+    # ----------------------------
+    def save(self, driver, agent):
+        """
+        登入成功後呼叫，保存目前的 cookies 與 localStorage
+        目前仍停在登入頁（登入失敗）時不保存，回傳是否已保存
+        """
+        try:
+            if endpoints.LOGIN_ROUTE in driver.current_url:
+                return False
+            cookies = driver.get_cookies()
+            storage = driver.execute_script(_READ_STORAGE_JS) or {}
+        except Exception as e:
+            print(f"[{agent}] 讀取登入狀態失敗：{e}")
+            return False
+
+        now = time.time()
+        entry = {
+            "agent": agent,
+            "base_url": endpoints.base_url(),
+            "saved_at": now,
+            "expires_at": now + self.ttl,
+            "cookies": cookies,
+            "local_storage": storage,
+        }
+        with self._lock:
+            self._entries[self._key(agent)] = entry
+            self.saved += 1
+            try:
+                self._write()
+            except OSError as e:
+                print(f"[{agent}] 寫入登入狀態檔失敗：{e}")
+        return True
+
+    def restore(self, driver, agent, route):
+        """
+        還原 agent 的登入狀態並開啟 route，確認仍在登入狀態時回傳 True
+        沒有保存、已過期或檢查失敗時回傳 False（失效的紀錄會刪除），呼叫端改走完整登入
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(agent))
+        if entry is None:
+            return False
+        if entry["expires_at"] <= time.time():
+            self.invalidate(agent)
+            with self._lock:
+                self.expired += 1
+            return False
+
+        try:
+            # cookies 與 localStorage 只能寫入目前網域，先開啟後台的任一頁
+            driver.get(endpoints.page_url(endpoints.LOGIN_ROUTE))
+            for cookie in entry["cookies"]:
+                try:
+                    driver.add_cookie({k: v for k, v in cookie.items() if k in COOKIE_FIELDS})
+                except Exception:
+                    pass
+            driver.execute_script(_WRITE_STORAGE_JS, entry["local_storage"])
+
+            # 經過 about:blank 再開啟目標頁，讓前端重新載入並讀取剛寫入的登入資訊
+            driver.get("about:blank")
+            driver.get(endpoints.page_url(route))
+            waits.settle(driver, timeout=30, label="還原登入狀態")
+            valid = endpoints.LOGIN_ROUTE not in driver.current_url
+        except Exception as e:
+            print(f"[{agent}] 還原登入狀態失敗：{e}")
+            valid = False
+
+        if not valid:
+            self.invalidate(agent)
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.restored += 1
+        return True
+
+    def invalidate(self, agent):
+        """刪除 agent 的登入狀態"""
+        with self._lock:
+            if self._entries.pop(self._key(agent), None) is None:
+                return
+            try:
+                self._write()
+            except OSError as e:
+                print(f"[{agent}] 寫入登入狀態檔失敗：{e}")
+
+    def summary(self):
+        return (f"登入狀態：沿用 {self.restored} 次、已過期 {self.expired} 次、"
+                f"檢查失效 {self.rejected} 次、新保存 {self.saved} 次")
+
+
+def open_store(args):
+    """依命令列參數建立 SessionStore，未指定 --reuse-login 時回傳 None"""
+    if not args.reuse_login:
+        return None
+    return SessionStore(args.session_file, ttl_hours=args.session_hours)
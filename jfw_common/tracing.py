@@ -0,0 +1,218 @@
+"""
+步驟追蹤
+以 span() 或 @traced 記錄每個步驟的開始時間與耗時，同一執行緒內的 span 會形成巢狀結構，
+並依代理分組；執行結束後輸出 Chrome Trace Event JSON，
+用 chrome://tracing 或 https://ui.perfetto.dev 開啟即可看出多執行緒執行時每個代理的時間花在哪裡
+
+預設關閉（沒有輸出路徑也沒有 listener 時，span 只多一次判斷），以 --trace 或環境變數 JFW_TRACE
+指定輸出路徑後啟用；另外可用 add_listener() 在每個 span 結束時收到通知（RunMonitor 執行期間
+用來統計步驟耗時），不需要輸出檔案，不再需要時以 remove_listener() 移除
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 最多保留的 span 數，超過的直接捨棄（避免長時間執行吃光記憶體）
+MAX_EVENTS = 500_000
+
+# 沒有對應代理的 span（啟動瀏覽器、主程式）歸到這一組
+MAIN_GROUP = "主程式"
+
+
+class Tracer:
+    """
+    收集 span 並輸出成 Chrome Trace Event（執行緒安全）
+    每個代理是一個 process（pid），每個執行緒是其中一條 thread（tid）
+    """
+
+    def __init__(self):
+        self.path = None
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._events = []
+        self._groups = {}     # 代理 -> pid
+        self._threads = {}    # (pid, tid) -> 執行緒名稱
+        self._listeners = []
+        self._origin = time.perf_counter()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    @property
+    def active(self):
+        """是否需要量測 span（有輸出路徑或有 listener）"""
+        return self.path is not None or bool(self._listeners)
+
+    def add_listener(self, listener):
+        """span 結束時呼叫 listener(name, cat, agent, seconds, ok)"""
+        with self._lock:
+            self._listeners = self._listeners + [listener]
+
+    def remove_listener(self, listener):
+        """移除 add_listener() 加入的 listener；沒有其他 listener 且未啟用輸出時 span 不再量測"""
+        with self._lock:
+            self._listeners = [l for l in self._listeners if l is not listener]
+
+    def enable(self, path):
+        """開始記錄，save() 時寫到 path"""
+        self.path = path
+
+    # ----------------------------
+    # 代理
+    # ----------------------------
+    def set_agent(self, agent):
+        """指定目前執行緒正在處理的代理，之後沒有指定代理的 span 都歸到這個代理"""
+        self._local.agent = agent
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _resolve_agent(self, stack):
+        """最內層有指定代理的 span，否則使用 set_agent 指定的代理"""
+        for agent in reversed(stack):
+            if agent is not None:
+                return agent
+        return getattr(self._local, "agent", None)
+
+    # ----------------------------
+    # 記錄
+    # ----------------------------
+    @contextmanager
+    def span(self, name, agent=None, cat="step", **args):
+        """
+        記錄 with 區塊的耗時；agent 未指定時沿用外層 span 或 set_agent 的代理
+        區塊丟出例外時記錄在 args["error"]，例外照常往外拋
+        """
+        if not self.active:
+            yield
+            return
+        stack = self._stack()
+        stack.append(agent)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            end = time.perf_counter()
+            # 結束時才決定代理：外層函數可能在 span 開始後才呼叫 set_agent
+            resolved = self._resolve_agent(stack)
+            stack.pop()
+            self._add(name, cat, resolved, start, end - start, args)
+
+    def _add(self, name, cat, agent, start, duration, args):
+        for listener in self._listeners:
+            try:
+                listener(name, cat, agent, duration, "error" not in args)
+            except Exception:
+                pass
+        if self.path is None:
+            return
+        thread = threading.current_thread()
+        group = agent or MAIN_GROUP
+        with self._lock:
+            if len(self._events) >= MAX_EVENTS:
+                self.dropped += 1
+                return
+            pid = self._groups.get(group)
+            if pid is None:
+                pid = self._groups[group] = len(self._groups) + 1
+            self._threads[(pid, thread.ident)] = thread.name
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": round((start - self._origin) * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+                "pid": pid,
+                "tid": thread.ident,
+            }
+            if args:
+                event["args"] = args
+            self._events.append(event)
+
+    # ----------------------------
+    # 輸出
+    # ----------------------------
+    def save(self, path=None):
+        """寫出 Chrome Trace Event JSON，回傳寫入的路徑（未啟用時回傳 None）"""
+        path = path or self.path
+        if path is None:
+            return None
+        with self._lock:
+            events = list(self._events)
+            groups = dict(self._groups)
+            threads = dict(self._threads)
+        metadata = []
+        for group, pid in groups.items():
+            metadata.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": group}})
+            metadata.append({"name": "process_sort_index", "ph": "M", "pid": pid, "args": {"sort_index": pid}})
+        for (pid, tid), thread_name in threads.items():
+            metadata.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        data = {"traceEvents": metadata + events, "displayTimeUnit": "ms", "otherData": {"dropped": self.dropped}}
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+    def summary(self):
+        with self._lock:
+            count = len(self._events)
+        line = f"追蹤紀錄：{count} 個 span，{len(self._groups)} 個代理分組"
+        if self.dropped:
+            line += f"，超過上限捨棄 {self.dropped} 個"
+        return line
+
+
+tracer = Tracer()
+if os.environ.get("JFW_TRACE"):
+    tracer.enable(os.environ["JFW_TRACE"])
+
+
+def enable(path):
+    tracer.enable(path)
+
+
+def set_agent(agent):
+    tracer.set_agent(agent)
+
+
+def span(name, agent=None, cat="step", **args):
+    """with tracing.span("步驟名稱"): ..."""
+    return tracer.span(name, agent=agent, cat=cat, **args)
+
+
+def traced(name=None, cat="step"):
+    """
+    函數裝飾器，每次呼叫記錄成一個 span（名稱預設為函數名稱）
+    可寫成 @traced、@traced() 或 @traced("名稱", cat="agent")
+    """
+    if callable(name):
+        return traced()(name)
+
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.active:
+                return fn(*args, **kwargs)
+            with tracer.span(label, cat=cat):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def save(path=None):
+    return tracer.save(path)
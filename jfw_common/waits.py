@@ -0,0 +1,286 @@
+"""
+條件式等待引擎
+取代固定秒數的 time.sleep：條件一成立就繼續，伺服器快流程就快
+每次等待實際花費的時間都會記錄下來，可用 stats.summary() 查看
+"""
+import os
+import threading
+import time
+
+from jfw_common import tracing
+
+
+# ============================
+# 設定（可用環境變數或 configure() 調整）
+# ============================
+POLL_INTERVAL = float(os.environ.get("JFW_WAIT_POLL", "0.1"))      # 輪詢間隔（秒）
+QUIET_TIME = float(os.environ.get("JFW_WAIT_QUIET", "0.3"))        # 判定「已穩定」需要維持的時間（秒）
+DEFAULT_TIMEOUT = float(os.environ.get("JFW_WAIT_TIMEOUT", "30"))  # 預設逾時（秒）
+VERBOSE = os.environ.get("JFW_WAIT_VERBOSE", "").strip().lower() in ("1", "true", "yes")
+
+
+def configure(poll_interval=None, quiet_time=None, default_timeout=None, verbose=None):
+    """調整全域等待參數"""
+    global POLL_INTERVAL, QUIET_TIME, DEFAULT_TIMEOUT, VERBOSE
+    if poll_interval is not None:
+        POLL_INTERVAL = poll_interval
+    if quiet_time is not None:
+        QUIET_TIME = quiet_time
+    if default_timeout is not None:
+        DEFAULT_TIMEOUT = default_timeout
+    if verbose is not None:
+        VERBOSE = verbose
+
+
+class WaitTimeout(TimeoutError):
+    """條件在逾時前未成立"""
+
+
+# ============================
+# 等待統計
+# ============================
+class WaitStats:
+    """依標籤累計等待次數、總耗時、最長耗時與逾時次數（執行緒安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def record(self, label, elapsed, ok):
+        with self._lock:
+            entry = self._data.setdefault(label, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+            if not ok:
+                entry[3] += 1
+        if VERBOSE:
+            state = "完成" if ok else "逾時"
+            print(f"[wait] {label} {state}，耗時 {elapsed:.2f} 秒")
+
+    def total_seconds(self):
+        with self._lock:
+            return sum(entry[1] for entry in self._data.values())
+
+    def summary(self, top=15):
+        """回傳依總耗時排序的等待統計表"""
+        with self._lock:
+            rows = sorted(self._data.items(), key=lambda kv: kv[1][1], reverse=True)
+        if not rows:
+            return "等待統計：無"
+        lines = [f"等待統計（共 {self.total_seconds():.1f} 秒）："]
+        for label, (count, total, longest, timeouts) in rows[:top]:
+            line = f"  {label}：{count} 次，總計 {total:.1f} 秒，平均 {total / count:.2f} 秒，最長 {longest:.2f} 秒"
+            if timeouts:
+                line += f"，逾時 {timeouts} 次"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+stats = WaitStats()
+
+
+# ============================
+# 核心輪詢
+# ============================
+def wait_until(condition, timeout=None, poll=None, label="wait", raise_on_timeout=False):
+    """
+    反覆呼叫 condition() 直到回傳真值
+    condition 丟出例外（例如 stale element）視為尚未成立
+
+    :return: condition 的回傳值；逾時回傳 False（raise_on_timeout=True 時丟出 WaitTimeout）
+    """
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    poll = POLL_INTERVAL if poll is None else poll
+    with tracing.span(label, cat="wait"):
+        start = time.perf_counter()
+        deadline = start + timeout
+        while True:
+            try:
+                result = condition()
+            except Exception:
+                result = None
+            if result:
+                stats.record(label, time.perf_counter() - start, True)
+                return result
+            if time.perf_counter() >= deadline:
+                stats.record(label, time.perf_counter() - start, False)
+                if raise_on_timeout:
+                    raise WaitTimeout(f"{label} 等待逾時（{timeout} 秒）")
+                return False
+            time.sleep(poll)
+
+
+def pause(seconds, label="pause"):
+    """刻意的固定間隔（重試退避、錯開啟動），同樣列入統計"""
+    with tracing.span(label, cat="wait"):
+        time.sleep(seconds)
+    stats.record(label, seconds, True)
+
+
+def _quiet_for(probe, quiet_time):
+    """
+    包裝 probe()：probe 回傳 (ready, signature)
+    ready 為真且 signature 連續 quiet_time 秒未變化才算成立
+    """
+    state = {"signature": None, "since": None}
+
+    def condition():
+        ready, signature = probe()
+        now = time.perf_counter()
+        if not ready or signature != state["signature"]:
+            state["signature"] = signature
+            state["since"] = now if ready else None
+            return False
+        return state["since"] is not None and now - state["since"] >= quiet_time
+
+    return condition
+
+
+def _resolve(driver, target):
+    """target 可以是 WebElement 或 XPath 字串"""
+    if isinstance(target, str):
+        return driver.find_element("xpath", target)
+    return target
+
+
+# ============================
+# 頁面狀態 JavaScript
+# ============================
+# 安裝 XHR / fetch 進行中請求計數器，並回傳頁面狀態
+_PAGE_STATE_JS = """
+var xpaths = arguments[0] || [];
+if (!window.__jfwNet) {
+    var net = window.__jfwNet = {inflight: 0};
+    try { performance.setResourceTimingBufferSize(100000); } catch (e) {}
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        net.inflight++;
+        this.addEventListener('loadend', function () { net.inflight = Math.max(0, net.inflight - 1); });
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var origFetch = window.fetch;
+        window.fetch = function () {
+            net.inflight++;
+            var done = function () { net.inflight = Math.max(0, net.inflight - 1); };
+            var p = origFetch.apply(this, arguments);
+            p.then(done, done);
+            return p;
+        };
+    }
+}
+function visible(el) {
+    if (!el || !el.getClientRects || !el.getClientRects().length) return false;
+    var style = window.getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.display !== 'none' && style.opacity !== '0';
+}
+var loading = false;
+var masks = document.querySelectorAll('.el-loading-mask');
+for (var i = 0; i < masks.length && !loading; i++) loading = visible(masks[i]);
+for (var j = 0; j < xpaths.length && !loading; j++) {
+    var snap = document.evaluate(xpaths[j], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var k = 0; k < snap.snapshotLength && !loading; k++) loading = visible(snap.snapshotItem(k));
+}
+return [document.readyState, window.__jfwNet.inflight, performance.getEntriesByType('resource').length, loading];
+"""
+
+_RECT_JS = """
+var el = arguments[0];
+if (!el.getClientRects().length) return null;
+var r = el.getBoundingClientRect();
+return [Math.round(r.left), Math.round(r.top), Math.round(r.width), Math.round(r.height)];
+"""
+
+
+# ============================
+# 常用等待條件
+# ============================
+def loading_gone(driver, loading_xpaths=(), timeout=None, label="loading 消失"):
+    """等待 el-loading-mask 及指定的 loading 元素全部不可見"""
+    xpaths = list(loading_xpaths)
+
+    def condition():
+        return not driver.execute_script(_PAGE_STATE_JS, xpaths)[3]
+
+    return wait_until(condition, timeout=timeout, label=label)
+
+
+def network_idle(driver, timeout=None, quiet_time=None, label="網路閒置"):
+    """等待文件載入完成、沒有進行中的 XHR/fetch，且資源數量維持不變 quiet_time 秒"""
+    quiet_time = QUIET_TIME if quiet_time is None else quiet_time
+
+    def probe():
+        ready_state, inflight, resources, _ = driver.execute_script(_PAGE_STATE_JS, [])
+        return ready_state == "complete" and inflight == 0, resources
+
+    return wait_until(_quiet_for(probe, quiet_time), timeout=timeout, label=label)
+
+
+def settle(driver, loading_xpaths=(), timeout=None, quiet_time=None, label="頁面穩定"):
+    """
+    等待頁面完全穩定：文件載入完成 + 網路閒置 + 沒有 loading 遮罩
+    一次輪詢只需要一次 execute_script，用來取代「等待頁面加載」的固定 sleep
+    """
+    quiet_time = QUIET_TIME if quiet_time is None else quiet_time
+    xpaths = list(loading_xpaths)
+
+    def probe():
+        ready_state, inflight, resources, loading = driver.execute_script(_PAGE_STATE_JS, xpaths)
+        return ready_state == "complete" and inflight == 0 and not loading, resources
+
+    return wait_until(_quiet_for(probe, quiet_time), timeout=timeout, label=label)
+
+
+def element_stable(driver, target, timeout=None, quiet_time=None, label="元素穩定"):
+    """等待元素可見且位置/大小維持不變（捲動動畫、展開動畫結束）"""
+    quiet_time = QUIET_TIME if quiet_time is None else quiet_time
+
+    def probe():
+        rect = driver.execute_script(_RECT_JS, _resolve(driver, target))
+        return rect is not None, rect
+
+    return wait_until(_quiet_for(probe, quiet_time), timeout=timeout, label=label)
+
+
+def scroll_settled(driver, timeout=None, quiet_time=None, label="捲動結束"):
+    """等待視窗捲動位置不再變化"""
+    quiet_time = QUIET_TIME if quiet_time is None else quiet_time
+
+    def probe():
+        return True, driver.execute_script("return window.pageYOffset;")
+
+    return wait_until(_quiet_for(probe, quiet_time), timeout=timeout, label=label)
+
+
+def input_filled(driver, target, expected=None, timeout=None, label="輸入框有值", raise_on_timeout=False):
+    """
+    等待輸入框有值（expected 不為 None 時需等於 expected）
+    :return: 輸入框的值；逾時回傳 False（raise_on_timeout=True 時丟出 WaitTimeout）
+    """
+
+    def condition():
+        value = _resolve(driver, target).get_attribute("value")
+        if expected is None:
+            return value
+        return value if value == str(expected) else None
+
+    return wait_until(condition, timeout=timeout, label=label, raise_on_timeout=raise_on_timeout)
+
+
+def url_changed(driver, fragment, timeout=None, label="頁面跳轉"):
+    """等待網址不再包含 fragment（例如登入後離開 agent-login）"""
+    return wait_until(lambda: fragment not in driver.current_url, timeout=timeout, label=label)
+
+
+def invisible(driver, target, timeout=None, label="元素消失"):
+    """等待元素不可見或已從 DOM 移除"""
+
+    def condition():
+        try:
+            return not _resolve(driver, target).is_displayed()
+        except Exception as e:
+            # 元素不存在或已失效都算消失
+            return e.__class__.__name__ in ("NoSuchElementException", "StaleElementReferenceException")
+
+    return wait_until(condition, timeout=timeout, label=label)
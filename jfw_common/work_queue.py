@@ -0,0 +1,124 @@
+"""
+工作佇列執行緒池
+固定數量的 worker 從佇列取工作，做完一個立刻取下一個，不再以批次為單位互相等待
+"""
+import queue
+import threading
+import time
+
+
+class JobFailed(Exception):
+    """
+    工作沒有完成，但有部分結果（例如部分帳號創建失敗）
+    worker 會把 result 保留在 JobResult.result，同時把工作標記為失敗
+    """
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+class JobResult:
+    """單一工作的執行結果與時間"""
+
+    def __init__(self, job_id, submitted_at):
+        self.job_id = job_id
+        self.submitted_at = submitted_at
+        self.started_at = None
+        self.finished_at = None
+        self.worker = None
+        self.ok = False
+        self.result = None
+        self.error = None
+
+    @property
+    def queue_wait(self):
+        """從送出到開始執行等了多久（秒）"""
+        if self.started_at is None:
+            return 0.0
+        return self.started_at - self.submitted_at
+
+    @property
+    def run_time(self):
+        """實際執行時間（秒）"""
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+class WorkerPool:
+    """
+    :param concurrency: 同時執行的工作數上限
+    :param name: 執行緒名稱前綴
+    """
+
+    def __init__(self, concurrency=5, name="worker"):
+        self.concurrency = max(1, concurrency)
+        self.name = name
+        self._queue = queue.Queue()
+        self._results = []
+        self._started_at = None
+        self._finished_at = None
+
+    def submit(self, job_id, fn, *args, **kwargs):
+        """加入一個工作，回傳對應的 JobResult"""
+        job = JobResult(job_id, time.perf_counter())
+        self._results.append(job)
+        self._queue.put((job, fn, args, kwargs))
+        return job
+
+    def _worker_loop(self):
+        worker_name = threading.current_thread().name
+        while True:
+            try:
+                job, fn, args, kwargs = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            job.worker = worker_name
+            job.started_at = time.perf_counter()
+            try:
+                job.result = fn(*args, **kwargs)
+                job.ok = True
+            except JobFailed as e:
+                job.error = e
+                job.result = e.result
+                print(f"[{job.job_id}] 工作未完成：{e}")
+            except Exception as e:
+                job.error = e
+                print(f"[{job.job_id}] 工作失敗：{e}")
+            finally:
+                job.finished_at = time.perf_counter()
+                self._queue.task_done()
+
+    def run(self):
+        """啟動 worker 執行所有已送出的工作，全部完成後依送出順序回傳結果"""
+        self._started_at = time.perf_counter()
+        worker_count = min(self.concurrency, self._queue.qsize())
+        threads = [
+            threading.Thread(target=self._worker_loop, name=f"{self.name}-{i + 1}")
+            for i in range(worker_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self._finished_at = time.perf_counter()
+        return list(self._results)
+
+    @property
+    def wall_time(self):
+        if self._started_at is None or self._finished_at is None:
+            return 0.0
+        return self._finished_at - self._started_at
+
+    def summary(self):
+        """回傳每個工作的排隊 / 執行時間摘要"""
+        failed = sum(1 for job in self._results if not job.ok)
+        lines = [f"工作佇列：{len(self._results)} 個工作（失敗 {failed} 個），{self.concurrency} 個 worker，"
+                 f"總耗時 {self.wall_time:.1f} 秒"]
+        for job in self._results:
+            status = "成功" if job.ok else f"失敗（{job.error}）"
+            lines.append(
+                f"  {job.job_id}：排隊 {job.queue_wait:.1f} 秒，執行 {job.run_time:.1f} 秒，{status}"
+            )
+        return "\n".join(lines)
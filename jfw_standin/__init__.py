@@ -0,0 +1,5 @@
+"""
+JFW 代理後台本機模擬
+重現 create_account / return_points / get_report 依賴的頁面結構，
+搭配各工具的 --base-url 參數在本機測量效能，不會碰到正式站
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from jfw_standin.server import main
+
+sys.exit(main())
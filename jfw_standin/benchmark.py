@@ -0,0 +1,496 @@
+"""
+三個工具的端對端效能測試
+對本機模擬後台實際執行 create_account.process_user、return_points.process_single_account
+與 get_report.collect_agent_report，記錄吞吐量與每個步驟的 p50 / p95 耗時，
+輸出 JSON 並與儲存的基準比較
+
+用法：
+    python -m jfw_standin.benchmark --list
+    python -m jfw_standin.benchmark --scenarios "create-*" "return-a1-*"
+    python -m jfw_standin.benchmark --save-baseline          # 把這次結果存成基準
+    python -m jfw_standin.benchmark --base-url http://127.0.0.1:8765   # 使用已啟動的模擬後台
+"""
+import argparse
+import fnmatch
+import importlib.util
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from jfw_common import endpoints, metrics, tracing
+from jfw_common.driver_pool import DriverPool
+from jfw_common.journal import RunJournal
+from jfw_common.ledger import LedgerWriter
+from jfw_common.work_queue import WorkerPool
+from jfw_standin.data import StandinConfig
+from jfw_standin.server import start_server
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "效能測試結果.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "效能測試基準.json")
+
+AGENT_PASSWORD = "bench1234"
+RETURN_TARGET = 1000
+
+# 標準情境：tool 為 create / return / report
+#   create：agents 個代理各創建 accounts 隻帳號
+#   return：agents 個代理各有 members 位會員，餘額調整到 RETURN_TARGET
+#   report：agents 個代理查詢上週與本週報表（每週 report_rows 筆）
+SCENARIOS = {
+    "create-a1-n10": {"tool": "create", "agents": 1, "accounts": 10},
+    "create-a5-n10": {"tool": "create", "agents": 5, "accounts": 10},
+    "create-a5-n50": {"tool": "create", "agents": 5, "accounts": 50},
+    "create-a20-n10": {"tool": "create", "agents": 20, "accounts": 10},
+    "create-a20-n50": {"tool": "create", "agents": 20, "accounts": 50},
+    "return-a1-m10": {"tool": "return", "agents": 1, "members": 10},
+    "return-a1-m100": {"tool": "return", "agents": 1, "members": 100},
+    "return-a1-m500": {"tool": "return", "agents": 1, "members": 500},
+    "return-a5-m100": {"tool": "return", "agents": 5, "members": 100},
+    "return-a20-m100": {"tool": "return", "agents": 20, "members": 100},
+    "return-a20-m500": {"tool": "return", "agents": 20, "members": 500},
+    "report-a1": {"tool": "report", "agents": 1, "report_rows": 50},
+    "report-a5": {"tool": "report", "agents": 5, "report_rows": 50},
+    "report-a20": {"tool": "report", "agents": 20, "report_rows": 50},
+}
+
+# 各工具量測耗時的函數（模組屬性名稱 -> 步驟名稱）
+# create_account 的步驟已由 run_step 記錄，這裡只需要另外兩個工具
+TIMED_FUNCTIONS = {
+    "return": {
+        "login_to_system": "login",
+        "navigate_to_players": "navigate_to_players",
+        "collect_members": "collect_members",
+        "adjust_member": "adjust_member",
+        "return_to_member_list": "return_to_member_list",
+        "return_to_players_page": "return_to_players_page",
+        "set_page_size_to_500": "set_page_size_to_500",
+        "locate_plan_row": "locate_plan_row",
+        "search_member": "search_member",
+    },
+    "report": {
+        "login_agent": "login",
+        "submit_week_query": "submit_week_query",
+        "read_week_report": "read_week_report",
+        "parse_agent_report": "parse_agent_report",
+    },
+}
+
+TOOL_PATHS = {
+    "create": os.path.join(ROOT_DIR, "create_account", "main.py"),
+    "return": os.path.join(ROOT_DIR, "return_points", "main.py"),
+    "report": os.path.join(ROOT_DIR, "get_report", "main.py"),
+}
+
+
+# ============================
+# 步驟耗時
+# ============================
+def percentile(values, q):
+    """線性內插的百分位數（q 介於 0~1）"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * q
+    low = math.floor(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+class StepRecorder:
+    """
+    收集每個步驟的耗時樣本（執行緒安全）
+    介面與 StepTimings 的 record / mean 相同，可以直接傳給 create_account.process_user
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, step, seconds):
+        with self._lock:
+            self._samples.setdefault(step, []).append(seconds)
+
+    def mean(self, step, default):
+        with self._lock:
+            samples = self._samples.get(step)
+            return sum(samples) / len(samples) if samples else default
+
+    def timed(self, fn, step):
+        """包裝函數，每次呼叫都記錄耗時（例外也會記錄）"""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(step, time.perf_counter() - start)
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+    def summary(self):
+        """{步驟: {"count", "mean", "p50", "p95", "max"}}（秒）"""
+        with self._lock:
+            samples = {step: list(values) for step, values in self._samples.items()}
+        return {
+            step: {
+                "count": len(values),
+                "mean": round(sum(values) / len(values), 4),
+                "p50": round(percentile(values, 0.50), 4),
+                "p95": round(percentile(values, 0.95), 4),
+                "max": round(max(values), 4),
+            }
+            for step, values in sorted(samples.items())
+        }
+
+
+class patched:
+    """暫時替換模組屬性的 context manager，離開時還原"""
+
+    def __init__(self, module, replacements):
+        self.module = module
+        self.replacements = replacements
+        self._originals = {}
+
+    def __enter__(self):
+        for name, value in self.replacements.items():
+            self._originals[name] = getattr(self.module, name)
+            setattr(self.module, name, value)
+        return self
+
+    def __exit__(self, *exc):
+        for name, value in self._originals.items():
+            setattr(self.module, name, value)
+        return False
+
+
+# ============================
+# 模擬後台
+# ============================
+class StandinClient:
+    """透過 /_standin/ 管理介面設定模擬後台並讀取統計"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def configure(self, reset=True, **options):
+        """更新設定；reset 時清除所有代理資料與請求統計"""
+        return self._request("POST", "/_standin/config", dict(options, reset=reset))
+
+    def stats(self):
+        return self._request("GET", "/_standin/stats")
+
+
+def load_tool(tool):
+    """以獨立模組名稱載入工具的 main.py（三個工具的檔名都是 main.py）"""
+    path = TOOL_PATHS[tool]
+    tool_dir = os.path.dirname(path)
+    if tool_dir not in sys.path:
+        sys.path.insert(0, tool_dir)
+    spec = importlib.util.spec_from_file_location(f"jfw_bench_{tool}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ============================
+# 各工具的執行方式
+# ============================
+def run_create(module, agents, spec, pool, recorder, workers, work_dir):
+    """回傳 (工作結果, 工具回報的數量)"""
+    journal = RunJournal(os.path.join(work_dir, "創建紀錄.jsonl"), fresh=True)
+    ledger = LedgerWriter()
+    work_queue = WorkerPool(concurrency=workers, name="bench-create")
+    # 帳號 TXT 寫到暫存資料夾，不寫到桌面
+    with patched(module, {"get_desktop_path": lambda: work_dir}):
+        for account, password in agents:
+            user_info = {"account": account, "password": password, "create_count": spec["accounts"]}
+            work_queue.submit(account, module.process_user, user_info, pool, recorder, journal, ledger, 1)
+        try:
+            jobs = work_queue.run()
+        finally:
+            ledger.close()
+            journal.close()
+    created = sum(job.result.created_total for job in jobs if job.result is not None)
+    return jobs, {"accounts_created": created}
+
+
+def run_return(module, agents, spec, pool, recorder, workers, work_dir):
+    work_queue = WorkerPool(concurrency=workers, name="bench-return")
+    timed = {name: recorder.timed(getattr(module, name), step)
+             for name, step in TIMED_FUNCTIONS["return"].items()}
+
+    # 以 collect_members 實際讀到的會員數計算，不用情境設定推算
+    scanned = []
+    timed_collect = timed["collect_members"]
+
+    def counting_collect(*args, **kwargs):
+        members = timed_collect(*args, **kwargs)
+        scanned.append(len(members))
+        return members
+
+    timed["collect_members"] = counting_collect
+    with patched(module, timed):
+        for account, password in agents:
+            work_queue.submit(account, module.process_single_account, account, password, RETURN_TARGET, pool)
+        jobs = work_queue.run()
+    return jobs, {"members_scanned": sum(scanned)}
+
+
+def run_report(module, agents, spec, pool, recorder, workers, work_dir):
+    work_queue = WorkerPool(concurrency=workers, name="bench-report")
+    timed = {name: recorder.timed(getattr(module, name), step)
+             for name, step in TIMED_FUNCTIONS["report"].items()}
+    with patched(module, timed):
+        for account, password in agents:
+            work_queue.submit(account, module.collect_agent_report, account, password, pool)
+        jobs = work_queue.run()
+    return jobs, {"report_rows": sum(len(job.result) for job in jobs if job.ok)}
+
+
+RUNNERS = {"create": run_create, "return": run_return, "report": run_report}
+DRIVER_FACTORIES = {"create": "create_driver", "return": "init_driver", "report": "create_driver"}
+
+
+def throughput(tool, counts, server_stats, agents_done, elapsed):
+    """每分鐘處理量（以模擬後台實際收到的結果為準）"""
+    minutes = elapsed / 60 if elapsed > 0 else float("nan")
+    result = {"agents_per_min": round(agents_done / minutes, 2)}
+    if tool == "create":
+        result["accounts_per_min"] = round(server_stats["created"] / minutes, 2)
+    elif tool == "return":
+        result["members_per_min"] = round(counts["members_scanned"] / minutes, 2)
+        result["adjustments_per_min"] = round(server_stats["adjusted"] / minutes, 2)
+    else:
+        result["rows_per_min"] = round(counts["report_rows"] / minutes, 2)
+    return result
+
+
+def run_scenario(name, spec, client, modules, args):
+    tool = spec["tool"]
+    module = modules[tool]
+    print(f"\n{'=' * 60}\n情境 {name}：{json.dumps(spec, ensure_ascii=False)}\n{'=' * 60}")
+    client.configure(
+        members=spec.get("members", 0), report_rows=spec.get("report_rows", args.report_rows),
+        latency=args.latency, jitter=args.jitter, fail_rate=args.fail_rate, fail_on=args.fail_on,
+        password=AGENT_PASSWORD, seed=args.seed,
+    )
+    agents = [(f"bench{n:02d}", AGENT_PASSWORD) for n in range(1, spec["agents"] + 1)]
+    workers = max(1, min(args.workers, len(agents)))
+    recorder = StepRecorder()
+
+    # 瀏覽器啟動不計入情境耗時
+    pool = DriverPool(getattr(module, DRIVER_FACTORIES[tool]), size=workers, max_uses=module.DRIVER_MAX_USES)
+    pool.prewarm(workers)
+    failures_before = metrics.failures.snapshot()
+    work_dir = tempfile.mkdtemp(prefix=f"jfw-bench-{name}-")
+    try:
+        start = time.perf_counter()
+        jobs, counts = RUNNERS[tool](module, agents, spec, pool, recorder, workers, work_dir)
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    stats = client.stats()
+    # 工具在失敗時會往外拋（或拋出 JobFailed），job.ok 即為實際完成的代理
+    agents_done = sum(1 for job in jobs if job.ok)
+    failures = {kind: count - failures_before.get(kind, 0)
+                for kind, count in metrics.failures.snapshot().items()
+                if count > failures_before.get(kind, 0)}
+    result = {
+        "tool": tool,
+        **{k: v for k, v in spec.items() if k != "tool"},
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 2),
+        "agents_failed": len(jobs) - agents_done,
+        "failures": failures,
+        "counts": dict(counts, server_created=stats["created"], server_adjusted=stats["adjusted"]),
+        "throughput": throughput(tool, counts, stats, agents_done, elapsed),
+        "steps": recorder.summary(),
+        "server_requests": stats["requests"],
+    }
+    print_result(name, result)
+    return result
+
+
+# ============================
+# 輸出與比較
+# ============================
+def print_result(name, result):
+    rates = "，".join(f"{k} {v}" for k, v in result["throughput"].items())
+    print(f"\n[{name}] 耗時 {result['elapsed_seconds']:.1f} 秒，{rates}，失敗代理 {result['agents_failed']}")
+    if result["failures"]:
+        print(f"  失敗次數：{json.dumps(result['failures'], ensure_ascii=False)}")
+    for step, s in result["steps"].items():
+        print(f"  {step:<24} n={s['count']:<5} p50 {s['p50']:>7.3f}s  p95 {s['p95']:>7.3f}s  max {s['max']:>7.3f}s")
+
+
+def compare(current, baseline, tolerance):
+    """
+    與基準比較：吞吐量下降或步驟 p95 上升超過 tolerance 視為退步，
+    情境執行失敗、沒有結果，或失敗代理數比基準多也視為退步
+    回傳 (比較結果文字列, 退步項目列表)
+    """
+    lines = []
+    regressions = []
+    for name in current.get("selected", []):
+        if name in current["scenarios"]:
+            continue
+        error = current.get("failed_scenarios", {}).get(name, "沒有結果")
+        lines.append(f"[{name}] 情境執行失敗：{error}  ← 退步")
+        regressions.append(f"{name} 情境執行失敗")
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            lines.append(f"[{name}] 基準中沒有此情境")
+            continue
+        lines.append(f"[{name}]")
+        old_failed = base.get("agents_failed", 0)
+        if cur["agents_failed"] > old_failed:
+            lines.append(f"  {'agents_failed':<24} {old_failed:>10} -> {cur['agents_failed']:>10}  ← 退步")
+            regressions.append(f"{name} 失敗代理 {old_failed} -> {cur['agents_failed']}")
+        for metric, value in cur["throughput"].items():
+            old = base.get("throughput", {}).get(metric)
+            if not old:
+                continue
+            change = (value - old) / old
+            flag = change < -tolerance
+            lines.append(f"  {metric:<24} {old:>10.2f} -> {value:>10.2f}  {change:+.1%}{'  ← 退步' if flag else ''}")
+            if flag:
+                regressions.append(f"{name} {metric} {change:+.1%}")
+        for step, s in cur["steps"].items():
+            old = base.get("steps", {}).get(step, {}).get("p95")
+            if not old:
+                continue
+            change = (s["p95"] - old) / old
+            flag = change > tolerance
+            lines.append(f"  {step + ' p95':<24} {old:>9.3f}s -> {s['p95']:>9.3f}s  {change:+.1%}{'  ← 退步' if flag else ''}")
+            if flag:
+                regressions.append(f"{name} {step} p95 {change:+.1%}")
+    return lines, regressions
+
+
+def write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="JFW 工具端對端效能測試（使用本機模擬後台）")
+    parser.add_argument("--scenarios", nargs="+", default=["*"], metavar="PATTERN",
+                        help="要執行的情境名稱，可用萬用字元（預設全部，--list 列出所有情境）")
+    parser.add_argument("--list", action="store_true", help="列出所有情境後結束")
+    parser.add_argument("--workers", type=int, default=5, help="同時處理的代理數（預設 5）")
+    parser.add_argument("--latency", type=float, default=0.05, help="模擬後台每個 API 的延遲秒數（預設 0.05）")
+    parser.add_argument("--jitter", type=float, default=0.5, help="延遲浮動比例（預設 0.5）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="API 失敗機率（預設 0）")
+    parser.add_argument("--fail-on", nargs="*", default=[], help="只在指定的 API 注入失敗")
+    parser.add_argument("--report-rows", type=int, default=50, help="報表每週筆數（情境未指定時，預設 50）")
+    parser.add_argument("--seed", type=int, default=0, help="模擬資料的亂數種子")
+    parser.add_argument("--base-url", help="使用已啟動的模擬後台（預設在本程式內啟動一個）")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="結果 JSON 路徑")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基準 JSON 路徑（存在時自動比較）")
+    parser.add_argument("--trace", metavar="PATH", help="同時輸出所有情境的 Chrome Trace JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="把這次的結果存成基準")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="視為退步的變化比例（預設 0.10）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list:
+        for name, spec in SCENARIOS.items():
+            print(f"{name:<18} {json.dumps(spec, ensure_ascii=False)}")
+        return 0
+
+    selected = {name: spec for name, spec in SCENARIOS.items()
+                if any(fnmatch.fnmatch(name, pattern) for pattern in args.scenarios)}
+    if not selected:
+        print(f"沒有符合 {' '.join(args.scenarios)} 的情境（--list 列出所有情境）")
+        return 1
+
+    if args.trace:
+        tracing.enable(args.trace)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_server(StandinConfig())
+        base_url = server.url
+        print(f"已啟動模擬後台：{base_url}")
+    endpoints.set_base_url(base_url)
+    client = StandinClient(base_url)
+
+    modules = {tool: load_tool(tool) for tool in sorted({spec["tool"] for spec in selected.values()})}
+    results = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "base_url": base_url,
+        "settings": {"workers": args.workers, "latency": args.latency, "jitter": args.jitter,
+                     "fail_rate": args.fail_rate, "fail_on": args.fail_on, "seed": args.seed},
+        "selected": list(selected),
+        "scenarios": {},
+        "failed_scenarios": {},
+    }
+    try:
+        for name, spec in selected.items():
+            try:
+                results["scenarios"][name] = run_scenario(name, spec, client, modules, args)
+            except Exception as e:
+                print(f"[{name}] 情境執行失敗：{e}")
+                results["failed_scenarios"][name] = str(e)
+            # 每個情境完成就寫檔，中途中斷也保留已完成的結果
+            write_json(args.output, results)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    print(f"\n結果已寫入：{args.output}")
+    if tracing.save():
+        print(f"{tracing.tracer.summary()}，已輸出：{tracing.tracer.path}")
+    regressions = []
+    failed = results["failed_scenarios"]
+    if failed:
+        print(f"\n有 {len(failed)} 個情境執行失敗：{', '.join(failed)}")
+    if args.save_baseline:
+        if failed:
+            print("有情境執行失敗，不存成基準")
+            return 1
+        write_json(args.baseline, results)
+        print(f"已存成基準：{args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressions = compare(results, baseline, args.tolerance)
+        print(f"\n與基準比較（{baseline.get('generated_at', '?')}，容許 {args.tolerance:.0%}）：")
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n有 {len(regressions)} 項退步：")
+            for item in regressions:
+                print(f"  - {item}")
+    else:
+        print("尚未有基準，可加上 --save-baseline 把這次結果存成基準")
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
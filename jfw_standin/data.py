@@ -0,0 +1,260 @@
+"""
+模擬後台的資料
+代理在第一次登入時建立；會員與報表數字由 (seed, 代理帳號) 決定，
+同樣的設定每次啟動都會產生相同的資料，方便前後比較
+"""
+import html
+import random
+import secrets
+import string
+import threading
+import time
+
+MEMBER_TYPES = ("現金代理", "信用代理")
+REPORT_PERIODS = ("today", "yesterday", "curweek", "lastweek", "curmonth", "lastmonth")
+REPORT_FIELDS = ['注單筆數', '下注金額', '有效投注', '玩家輸贏', '玩家退水', '玩家盈虧', '應收下線']
+
+# 可注入失敗的 API 名稱
+FAILURE_POINTS = ("login", "session", "members", "adjust", "random", "check", "create", "report")
+
+
+class StandinConfig:
+    """
+    :param members: 每個代理的直屬會員數（0 表示無會員，會顯示無內容圖片）
+    :param report_rows: 每個報表週期的資料筆數（0 表示無資料）
+    :param latency: 每個 API 請求的基本延遲秒數
+    :param jitter: 延遲的隨機浮動比例（0.5 表示 ±50%）
+    :param fail_rate: API 失敗機率（回傳 500）
+    :param fail_on: 只在這些 API 注入失敗（空值表示全部，名稱見 FAILURE_POINTS）
+    :param credit_ratio: 會員中信用代理的比例（return_points 會跳過）
+    :param popup_rate: 進入創建玩家畫面時跳出公告彈窗的機率
+    :param password: 指定時所有代理都必須使用此密碼登入，否則任何密碼都可以
+    :param session_ttl: 登入狀態幾秒後失效（0 表示不失效）
+    :param seed: 產生資料用的亂數種子
+    """
+
+    def __init__(self, members=100, report_rows=50, latency=0.2, jitter=0.5, fail_rate=0.0, fail_on=(),
+                 credit_ratio=0.1, popup_rate=0.0, password=None, session_ttl=0, seed=0):
+        self.members = members
+        self.report_rows = report_rows
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.fail_on = tuple(fail_on)
+        self.credit_ratio = credit_ratio
+        self.popup_rate = popup_rate
+        self.password = password
+        self.session_ttl = session_ttl
+        self.seed = seed
+
+    def update(self, **options):
+        """套用部分設定（未知的名稱會拋出 KeyError）"""
+        for name, value in options.items():
+            if not hasattr(self, name):
+                raise KeyError(name)
+            setattr(self, name, tuple(value) if name == "fail_on" else value)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def should_fail(self, point, rnd=random):
+        """這次請求是否要注入失敗"""
+        if self.fail_rate <= 0 or (self.fail_on and point not in self.fail_on):
+            return False
+        return rnd.random() < self.fail_rate
+
+    def delay(self, rnd=random):
+        """這次請求的延遲秒數"""
+        if self.latency <= 0:
+            return 0.0
+        spread = self.latency * self.jitter
+        return max(0.0, self.latency + rnd.uniform(-spread, spread))
+
+
+def _money(value):
+    return f"{value:,.2f}"
+
+
+class ConsoleData:
+    """所有代理、會員、登入狀態（執行緒安全）"""
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._agents = {}        # 代理帳號 -> {"password", "members": [...], "index": {帳號: 會員}}
+        self._sessions = {}      # token -> (代理帳號, 到期時間或 None)
+        self._accounts = set()   # 已使用的遊戲帳號（隨機帳號不重複）
+
+        # 統計資料
+        self.created = 0
+        self.adjusted = 0
+
+    def reset(self):
+        """清除所有資料與登入狀態（更改 members、seed 等設定後使用）"""
+        with self._lock:
+            self._agents.clear()
+            self._sessions.clear()
+            self._accounts.clear()
+            self.created = 0
+            self.adjusted = 0
+
+    # ----------------------------
+    # 代理與登入
+    # ----------------------------
+    def _agent(self, name):
+        agent = self._agents.get(name)
+        if agent is None:
+            agent = {"members": [], "index": {}, "created": []}
+            rnd = random.Random(f"{self.config.seed}:{name}")
+            for i in range(1, self.config.members + 1):
+                member = {
+                    "account": f"{name}m{i:04d}",
+                    "name": f"會員{i}",
+                    "type": MEMBER_TYPES[1] if rnd.random() < self.config.credit_ratio else MEMBER_TYPES[0],
+                    "balance": float(rnd.choice([0, 500, 1000, 1000, 2000, rnd.randint(0, 5000)])),
+                    "credit": 5000.0,
+                }
+                agent["members"].append(member)
+                agent["index"][member["account"]] = member
+                self._accounts.add(member["account"])
+            self._agents[name] = agent
+        return agent
+
+    def login(self, account, password):
+        """登入成功回傳 token，帳密錯誤回傳 None"""
+        if not account or not password:
+            return None
+        if self.config.password is not None and password != self.config.password:
+            return None
+        token = secrets.token_hex(16)
+        ttl = self.config.session_ttl
+        with self._lock:
+            self._agent(account)
+            self._sessions[token] = (account, time.time() + ttl if ttl else None)
+        return token
+
+    def agent_for(self, token):
+        """token 對應的代理帳號；未登入或已過期回傳 None"""
+        with self._lock:
+            session = self._sessions.get(token or "")
+            if session is None:
+                return None
+            agent, expires = session
+            if expires is not None and time.time() > expires:
+                del self._sessions[token]
+                return None
+            return agent
+
+    def logout(self, token):
+        with self._lock:
+            self._sessions.pop(token or "", None)
+
+    # ----------------------------
+    # 會員
+    # ----------------------------
+    def members(self, agent, keyword="", page=1, size=10):
+        """回傳 (總筆數, 該頁會員列表)"""
+        with self._lock:
+            members = self._agent(agent)["members"]
+            if keyword:
+                members = [m for m in members if keyword in m["account"]]
+            start = (max(1, page) - 1) * size
+            rows = [
+                {"account": m["account"], "name": m["name"], "type": m["type"],
+                 "balance": _money(m["balance"]), "credit": _money(m["credit"])}
+                for m in members[start:start + size]
+            ]
+            return len(members), rows
+
+    def member(self, agent, account):
+        with self._lock:
+            member = self._agent(agent)["index"].get(account)
+            return dict(member, balance=_money(member["balance"])) if member else None
+
+    def adjust(self, agent, account, delta):
+        """調整會員餘額，回傳調整後餘額；會員不存在時拋出 KeyError，餘額不足時拋出 ValueError"""
+        with self._lock:
+            member = self._agent(agent)["index"][account]
+            if member["balance"] + delta < 0:
+                raise ValueError("餘額不足")
+            member["balance"] += delta
+            self.adjusted += 1
+            return member["balance"]
+
+    # ----------------------------
+    # 創建玩家
+    # ----------------------------
+    def random_account(self):
+        """產生一個尚未使用的遊戲帳號"""
+        alphabet = string.ascii_lowercase + string.digits
+        with self._lock:
+            while True:
+                account = "u" + "".join(secrets.choice(alphabet) for _ in range(8))
+                if account not in self._accounts:
+                    return account
+
+    def account_available(self, account):
+        with self._lock:
+            return account not in self._accounts
+
+    def create_player(self, agent, account, password, nickname, credit):
+        """新增現金玩家；帳號重複或資料不完整時拋出 ValueError"""
+        if not account or not password or not nickname:
+            raise ValueError("資料不完整")
+        with self._lock:
+            if account in self._accounts:
+                raise ValueError("帳號已存在")
+            data = self._agent(agent)
+            member = {"account": account, "name": nickname, "type": MEMBER_TYPES[0],
+                      "balance": 0.0, "credit": float(credit or 0)}
+            data["members"].append(member)
+            data["index"][account] = member
+            data["created"].append(account)
+            self._accounts.add(account)
+            self.created += 1
+
+    def created_players(self, agent=None):
+        """{代理: [本次啟動後創建的帳號, ...]}"""
+        with self._lock:
+            return {name: list(data["created"]) for name, data in self._agents.items()
+                    if agent is None or name == agent}
+
+    # ----------------------------
+    # 報表
+    # ----------------------------
+    def report_html(self, agent, period):
+        """產生與正式站相同結構的報表 HTML（strip-item 列表，無資料時為無內容圖片）"""
+        if self.config.report_rows <= 0:
+            return '<div class="empty"><img src="/static/icon_no content.png" alt=""><p>暫無資料</p></div>'
+        rnd = random.Random(f"{self.config.seed}:{agent}:{period}")
+        items = []
+        for i in range(1, self.config.report_rows + 1):
+            account = html.escape(f"{agent}m{i:04d}")
+            bets = rnd.randint(0, 500)
+            amount = rnd.randint(0, 5_000_000) / 100
+            valid = round(amount * rnd.uniform(0.8, 1.0), 2)
+            win = round(rnd.uniform(-0.2, 0.2) * amount, 2)
+            rebate = round(valid * 0.005, 2)
+            values = [bets, amount, valid, win, rebate, round(win + rebate, 2), round(-(win + rebate), 2)]
+            panels = "".join(self._panel(title, value) for title, value in zip(REPORT_FIELDS, values))
+            status = "正常" if i % 13 else "停用"
+            items.append(
+                f'<div class="strip-item" data-v-95d7a5b4="">'
+                f'<div class="cratedate" data-v-95d7a5b4="">帳號：{account}</div>'
+                f'<div class="cratedate" data-v-95d7a5b4="">名稱：會員{i}</div>'
+                f'<div class="tag" data-v-95d7a5b4=""><div class="txt" data-v-95d7a5b4=""> {status} </div></div>'
+                f'{panels}</div>'
+            )
+        return "".join(items)
+
+    @staticmethod
+    def _panel(title, value):
+        if isinstance(value, int):
+            des = f'<span data-v-95d7a5b4="">{value:,}</span>'
+        else:
+            whole, frac = f"{value:,.2f}".split(".")
+            des = (f'<span data-v-95d7a5b4=""><span data-v-95d7a5b4="">{whole}</span>'
+                   f'<span data-v-95d7a5b4="">.{frac}</span></span>')
+        return (f'<div class="panelBox" data-v-95d7a5b4="">'
+                f'<div class="item-data-feild-title title-sm" data-v-95d7a5b4=""> {title} </div>'
+                f'<div class="item-data-des" data-v-95d7a5b4="">{des}</div></div>')
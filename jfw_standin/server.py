@@ -0,0 +1,349 @@
+"""
+本機模擬後台 HTTP 伺服器
+提供與正式站相同 DOM 結構的單頁介面（console.html）與其使用的 JSON API，
+每個 API 請求可設定延遲與失敗機率，用來離線測量三個工具的效能
+
+用法：python -m jfw_standin [--port 8765] [--members 100] [--latency 0.2] [--fail-rate 0.05]
+工具端：python main.py --base-url http://127.0.0.1:8765
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from jfw_standin.data import FAILURE_POINTS, ConsoleData, StandinConfig
+
+CONSOLE_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "console.html")
+
+# 1x1 透明 PNG（無內容圖片）
+NO_CONTENT_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)
+
+
+class ApiError(Exception):
+    """API 業務錯誤（回傳 code != 0）"""
+
+    def __init__(self, message, status=200):
+        super().__init__(message)
+        self.status = status
+
+
+class RequestStats:
+    """各 API 的請求數、注入失敗數與處理時間"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, seconds, failed):
+        with self._lock:
+            entry = self._stats.setdefault(name, {"requests": 0, "failures": 0, "seconds": 0.0})
+            entry["requests"] += 1
+            entry["failures"] += int(failed)
+            entry["seconds"] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class StandinServer(ThreadingHTTPServer):
+    """同時服務多個瀏覽器的模擬後台"""
+
+    daemon_threads = True
+
+    def __init__(self, address, config, verbose=False):
+        super().__init__(address, StandinHandler)
+        self.config = config
+        self.data = ConsoleData(config)
+        self.stats = RequestStats()
+        self.verbose = verbose
+        with open(CONSOLE_HTML, "rb") as f:
+            self.console_html = f.read()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = "jfw-standin/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # ----------------------------
+    # API：(方法, 路徑) -> (失敗注入名稱, 處理函數名稱, 是否需要登入)
+    # ----------------------------
+    ROUTES = {
+        ("POST", "/api/login"): ("login", "api_login", False),
+        ("POST", "/api/logout"): (None, "api_logout", False),
+        ("GET", "/api/session"): ("session", "api_session", True),
+        ("GET", "/api/members"): ("members", "api_members", True),
+        ("GET", "/api/members/detail"): ("members", "api_member_detail", True),
+        ("POST", "/api/members/adjust"): ("adjust", "api_adjust", True),
+        ("GET", "/api/players/notice"): (None, "api_notice", True),
+        ("GET", "/api/players/random"): ("random", "api_random_account", True),
+        ("GET", "/api/players/check"): ("check", "api_check_account", True),
+        ("POST", "/api/players"): ("create", "api_create_player", True),
+        ("GET", "/api/report"): ("report", "api_report", True),
+    }
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    # ----------------------------
+    # 請求處理
+    # ----------------------------
+    def _dispatch(self, method):
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.body = self._read_body() if method == "POST" else {}
+        self.set_cookies = []
+
+        if method == "GET" and path in ("/", "/index.html"):
+            return self._send(200, self.server.console_html, "text/html; charset=utf-8")
+        if method == "GET" and path.startswith("/static/icon_no content"):
+            return self._send(200, NO_CONTENT_PNG, "image/png")
+        if method == "GET" and path == "/favicon.ico":
+            return self._send(204, b"", "image/x-icon")
+        if path.startswith("/_standin/"):
+            return self._admin(method, path)
+
+        route = self.ROUTES.get((method, path))
+        if route is None:
+            return self._json(404, {"code": 404, "msg": "not found"})
+        point, handler_name, need_login = route
+        self._api(path, point, getattr(self, handler_name), need_login)
+
+    def _api(self, name, point, handler, need_login):
+        config = self.server.config
+        start = time.perf_counter()
+        failed = False
+        try:
+            time.sleep(config.delay())
+            if point and config.should_fail(point):
+                failed = True
+                return self._json(500, {"code": 500, "msg": "模擬伺服器錯誤"})
+            agent = self.server.data.agent_for(self._token())
+            if need_login and agent is None:
+                return self._json(401, {"code": 401, "msg": "登入已失效，請重新登入"})
+            try:
+                data = handler(agent)
+            except ApiError as e:
+                return self._json(e.status, {"code": 1, "msg": str(e)})
+            self._json(200, {"code": 0, "data": data})
+        finally:
+            self.server.stats.record(name, time.perf_counter() - start, failed)
+
+    def _admin(self, method, path):
+        """測試用管理介面：統計、設定（不套用延遲與失敗注入）"""
+        server = self.server
+        if method == "GET" and path == "/_standin/stats":
+            return self._json(200, {
+                "config": server.config.to_dict(),
+                "requests": server.stats.snapshot(),
+                "created": server.data.created,
+                "adjusted": server.data.adjusted,
+                "created_players": server.data.created_players(),
+            })
+        if method == "POST" and path == "/_standin/config":
+            options = dict(self.body)
+            reset = options.pop("reset", False)
+            try:
+                server.config.update(**options)
+            except KeyError as e:
+                return self._json(400, {"code": 1, "msg": f"未知的設定：{e.args[0]}"})
+            if reset:
+                server.data.reset()
+                server.stats.reset()
+            return self._json(200, {"code": 0, "data": server.config.to_dict()})
+        return self._json(404, {"code": 404, "msg": "not found"})
+
+    # ----------------------------
+    # API 處理函數
+    # ----------------------------
+    def api_login(self, agent):
+        token = self.server.data.login(str(self.body.get("account", "")).strip(), str(self.body.get("password", "")))
+        if token is None:
+            raise ApiError("帳號或密碼錯誤")
+        self.set_cookies.append(f"jfw_token={token}; Path=/; HttpOnly")
+        return {"token": token}
+
+    def api_logout(self, agent):
+        self.server.data.logout(self._token())
+        self.set_cookies.append("jfw_token=; Path=/; Max-Age=0")
+        return {}
+
+    def api_session(self, agent):
+        return {"agent": agent}
+
+    def api_members(self, agent):
+        try:
+            page = int(self.query.get("page", 1))
+            size = min(500, max(1, int(self.query.get("size", 10))))
+        except ValueError:
+            raise ApiError("分頁參數錯誤", 400)
+        total, rows = self.server.data.members(agent, self.query.get("keyword", "").strip(), page, size)
+        return {"total": total, "rows": rows}
+
+    def api_member_detail(self, agent):
+        member = self.server.data.member(agent, self.query.get("account", ""))
+        if member is None:
+            raise ApiError("會員不存在")
+        return {k: (f"{v:,.2f}" if isinstance(v, float) else v) for k, v in member.items()}
+
+    def api_adjust(self, agent):
+        try:
+            delta = float(self.body.get("delta"))
+        except (TypeError, ValueError):
+            raise ApiError("金額錯誤")
+        try:
+            balance = self.server.data.adjust(agent, self.body.get("account", ""), delta)
+        except KeyError:
+            raise ApiError("會員不存在")
+        except ValueError as e:
+            raise ApiError(str(e))
+        return {"balance": f"{balance:,.2f}"}
+
+    def api_notice(self, agent):
+        return {"show": random.random() < self.server.config.popup_rate, "text": "系統公告：本機模擬後台"}
+
+    def api_random_account(self, agent):
+        return {"account": self.server.data.random_account()}
+
+    def api_check_account(self, agent):
+        return {"available": self.server.data.account_available(self.query.get("account", ""))}
+
+    def api_create_player(self, agent):
+        body = self.body
+        try:
+            self.server.data.create_player(agent, body.get("account"), body.get("password"),
+                                           body.get("nickname"), body.get("credit"))
+        except ValueError as e:
+            raise ApiError(str(e))
+        return {"account": body.get("account")}
+
+    def api_report(self, agent):
+        return {"html": self.server.data.report_html(agent, self.query.get("period", "today"))}
+
+    # ----------------------------
+    # 工具函數
+    # ----------------------------
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError:
+            return {}
+        return body if isinstance(body, dict) else {}
+
+    def _token(self):
+        token = self.headers.get("X-Token")
+        if token:
+            return token
+        cookie = SimpleCookie(self.headers.get("Cookie") or "")
+        return cookie["jfw_token"].value if "jfw_token" in cookie else None
+
+    def _json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        for cookie in self.set_cookies:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ============================
+# 啟動
+# ============================
+def start_server(config=None, host="127.0.0.1", port=0, verbose=False):
+    """
+    在背景執行緒啟動模擬後台，回傳 StandinServer（port=0 時自動選擇可用的埠）
+    結束時呼叫 server.shutdown()
+    """
+    server = StandinServer((host, port), config or StandinConfig(), verbose=verbose)
+    thread = threading.Thread(target=server.serve_forever, name="jfw-standin", daemon=True)
+    thread.start()
+    return server
+
+
+def parse_fail_on(value):
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in FAILURE_POINTS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"未知的 API：{', '.join(unknown)}（可用：{', '.join(FAILURE_POINTS)}）")
+    return names
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="JFW 代理後台本機模擬伺服器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--members", type=int, default=100, help="每個代理的直屬會員數（預設 100）")
+    parser.add_argument("--report-rows", type=int, default=50, help="每個報表週期的資料筆數（預設 50）")
+    parser.add_argument("--latency", type=float, default=0.2, help="每個 API 請求的延遲秒數（預設 0.2）")
+    parser.add_argument("--jitter", type=float, default=0.5, help="延遲的隨機浮動比例（預設 0.5，即 ±50%%）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="API 失敗機率（預設 0）")
+    parser.add_argument("--fail-on", type=parse_fail_on, default=[],
+                        help=f"只在指定的 API 注入失敗，以逗號分隔（{','.join(FAILURE_POINTS)}）")
+    parser.add_argument("--credit-ratio", type=float, default=0.1, help="信用代理會員比例（預設 0.1）")
+    parser.add_argument("--popup-rate", type=float, default=0.0, help="創建玩家時跳出公告彈窗的機率（預設 0）")
+    parser.add_argument("--password", help="指定時代理必須使用此密碼登入（預設任何密碼都可以）")
+    parser.add_argument("--session-ttl", type=float, default=0, help="登入狀態幾秒後失效（預設 0，不失效）")
+    parser.add_argument("--seed", type=int, default=0, help="產生資料用的亂數種子")
+    parser.add_argument("--verbose", action="store_true", help="輸出每個 HTTP 請求")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = StandinConfig(
+        members=args.members, report_rows=args.report_rows, latency=args.latency, jitter=args.jitter,
+        fail_rate=args.fail_rate, fail_on=args.fail_on, credit_ratio=args.credit_ratio,
+        popup_rate=args.popup_rate, password=args.password, session_ttl=args.session_ttl, seed=args.seed,
+    )
+    server = StandinServer((args.host, args.port), config, verbose=args.verbose)
+    print(f"模擬後台已啟動：{server.url}")
+    print(f"每個代理 {config.members} 位會員，報表 {config.report_rows} 筆，"
+          f"延遲 {config.latency}s（±{config.jitter:.0%}），失敗機率 {config.fail_rate:.0%}")
+    print(f"工具端加上 --base-url {server.url}（或設定環境變數 JFW_BASE_URL）即可連到此伺服器")
+    print("按 Ctrl+C 結束")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,7 @@
 
 a = Analysis(
     ['JFW_WIN.py'],
-    pathex=[],
+    pathex=['..'],
     binaries=[],
     datas=[('用戶資訊.txt', '.')],
     hiddenimports=['colorama', 'selenium', 'webdriver_manager'],
@@ -5,16 +5,28 @@ from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from colorama import init, Fore, Style
 from datetime import datetime
-import subprocess
 import logging
-from webdriver_manager.chrome import ChromeDriverManager
 import re
+import json
+import csv
+from collections import Counter
 from selenium.common.exceptions import StaleElementReferenceException
 import threading
 
+# 共用模組（jfw_common）位於專案根目錄
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from jfw_common.driver_pool import DriverPool
+from jfw_common.driver_resolver import resolve_chromedriver
+from jfw_common import waits, endpoints, tracing, metrics
+from jfw_common.cli import build_parser, add_journal_arguments, add_session_arguments, apply_common_arguments
+from jfw_common.work_queue import WorkerPool, JobFailed
+from jfw_common.journal import RunJournal
+from jfw_common.session_store import open_store
+
 
 def get_base_dir():
     """获取资源根目录"""
@@ -28,11 +40,24 @@ def get_base_dir():
         return os.path.dirname(os.path.abspath(__file__))
 
 
+def get_output_dir():
+    """取得輸出檔案目錄（打包後為 exe 所在目錄，不寫進 _internal）"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
 base_dir = get_base_dir()
 
 # 建立執行緒鎖,避免日誌輸出混亂
 print_lock = threading.Lock()
 
+# 同一個瀏覽器最多服務幾個代理後重新啟動
+DRIVER_MAX_USES = 20
+
+# 預設同時處理的帳號數（可用 --workers 調整）
+MAX_WORKERS = 5
+
 
 def load_accounts():
     """加载账号信息 (账号, 密码, 调整金额)"""
@@ -97,25 +122,24 @@ def init_environment():
     os.system("title " + "RICH_PANDA後台管理系統")
     os.system("mode con: cols=100 lines=30")
 
+    # 在啟動執行緒前先解析 chromedriver，之後所有執行緒直接共用結果
     try:
-        result = subprocess.run(["chromedriver", "--version"], capture_output=True, text=True, timeout=5)
-        if result.returncode == 0 and result.stdout:
-            version = result.stdout.split()[1]
-            print(f"ChromeDriver {version}")
-        else:
-            print("ChromeDriver 將自動下載安裝")
-    except (FileNotFoundError, Exception) as e:
-        print("ChromeDriver 未安裝，將使用 webdriver-manager 自動下載")
+        resolve_chromedriver()
+    except Exception as e:
+        print(f"ChromeDriver 解析失敗，將在啟動瀏覽器時重試：{e}")
 
     init(autoreset=True)
 
 
 def init_driver():
-    """初始化 Chrome WebDriver"""
+    """
+    初始化 Chrome WebDriver（連線池的 factory，會在背景執行緒中呼叫）
+    啟動失敗時印出原因並拋出例外，由呼叫端決定是否結束程式
+    """
     try:
         with print_lock:
             print("\n正在初始化 Chrome 瀏覽器...")
-        service = Service(ChromeDriverManager().install())
+        service = Service(resolve_chromedriver())
         options = webdriver.ChromeOptions()
         options.add_experimental_option('excludeSwitches', ['enable-logging'])
         options.add_argument('--log-level=3')
@@ -129,8 +153,7 @@ def init_driver():
             print(f"\033[31m錯誤：無法啟動 Chrome 瀏覽器：{e}\033[0m")
             print("\033[33m請確保已安裝 Google Chrome 瀏覽器\033[0m")
             print("\033[33m下載地址：https://www.google.com/chrome/\033[0m")
-        input("\n按 Enter 結束...")
-        sys.exit(1)
+        raise
 
 
 def click_with_retry(driver, xpath, next_xpath, retries=3, delay=1):
@@ -138,13 +161,13 @@ def click_with_retry(driver, xpath, next_xpath, retries=3, delay=1):
     for attempt in range(retries):
         try:
             element = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, xpath)))
-            time.sleep(0.5)
+            waits.element_stable(driver, element, timeout=3, label="點擊前元素穩定")
             element.click()
             WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.XPATH, next_xpath)))
             return True
         except Exception as e:
             if attempt < retries - 1:
-                time.sleep(delay)
+                waits.pause(delay, label="點擊重試間隔")
             else:
                 print(f"点击失败：{xpath}，错误信息：{e}")
                 return False
@@ -152,15 +175,7 @@ def click_with_retry(driver, xpath, next_xpath, retries=3, delay=1):
 
 def wait_for_scroll_end(driver, timeout=10, interval=0.1):
     """等待滚动结束"""
-    end_time = time.time() + timeout
-    last_scroll_position = driver.execute_script("return window.pageYOffset;")
-    while time.time() < end_time:
-        time.sleep(interval)
-        new_scroll_position = driver.execute_script("return window.pageYOffset;")
-        if new_scroll_position == last_scroll_position:
-            return True
-        last_scroll_position = new_scroll_position
-    return False
+    return bool(waits.scroll_settled(driver, timeout=timeout, quiet_time=interval, label="等待滾動結束"))
 
 
 def log_info(message):
@@ -206,23 +221,28 @@ def wait_for_element(driver, xpath, timeout=20, retries=3):
             return element
         except Exception as e:
             print(f"尝试 {i+1}/{retries} 失败，错误：{e}")
-            time.sleep(2)
+            waits.pause(2, label="等待元素重試間隔")
     raise Exception(f"元素 {xpath} 在 {retries} 次尝试后仍未找到！")
 
 
-def login_to_system(driver, username_text, password_text):
-    """登入系統"""
+@tracing.traced("login")
+def login_to_system(driver, username_text, password_text, session_store=None):
+    """登入系統；有保存的登入狀態且仍有效時直接沿用"""
     loading_xpath = "/html/body/div[2]/div/p"
     loading_xpath2 = "/html/body/div[2]/div/i"
     
-    driver.get("https://ad.jfw-win.com/#/agent-login")
     driver.maximize_window()
+    if session_store is not None and session_store.restore(driver, username_text, endpoints.HOME_ROUTE):
+        log_success(f"{username_text} 沿用已保存的登入狀態")
+        return loading_xpath, loading_xpath2
+    
+    driver.get(endpoints.page_url(endpoints.LOGIN_ROUTE))
 
     username = WebDriverWait(driver, 180).until(
         EC.element_to_be_clickable((By.XPATH, '//input[@placeholder="請輸入帳號"]'))
     )
     username.click()
-    time.sleep(0.5)
+    waits.element_stable(driver, username, timeout=3, label="帳號欄位就緒")
     username.clear()
     username.send_keys(username_text)
 
@@ -230,7 +250,7 @@ def login_to_system(driver, username_text, password_text):
         EC.element_to_be_clickable((By.XPATH, '//input[@placeholder="請輸入密碼"]'))
     )
     password.click()
-    time.sleep(0.5)
+    waits.element_stable(driver, password, timeout=3, label="密碼欄位就緒")
     password.clear()
     password.send_keys(password_text)
 
@@ -239,9 +259,9 @@ def login_to_system(driver, username_text, password_text):
     )
     login.click()
 
-    time.sleep(5)
     log_loading_light("登入中...\n")
-    time.sleep(8)
+    waits.url_changed(driver, "agent-login", timeout=30, label="登入跳轉")
+    waits.settle(driver, [loading_xpath, loading_xpath2], timeout=30, label="登入後載入")
 
     try:
         current_url = driver.current_url
@@ -250,6 +270,8 @@ def login_to_system(driver, username_text, password_text):
         log_error(f"瀏覽器連接已斷開: {e}")
         raise
     
+    if session_store is not None:
+        session_store.save(driver, username_text)
     return loading_xpath, loading_xpath2
 
 
@@ -268,15 +290,16 @@ def safe_click(driver, by, locator, retries=3):
     return False
 
 
+@tracing.traced
 def navigate_to_players(driver, loading_xpath, loading_xpath2):
     """導航到直屬玩家頁面，返回 True 表示有資料，False 表示無資料"""
     log_info("正在跳轉到帳戶管理頁面...")
-    driver.get("https://ad.jfw-win.com/#/agent/user-manage/agent-user")
+    driver.get(endpoints.page_url(endpoints.AGENT_USER_ROUTE))
 
     WebDriverWait(driver, 180).until(
         EC.presence_of_element_located((By.XPATH, '//*[@id="app"]'))
     )
-    time.sleep(1)
+    waits.network_idle(driver, timeout=30, label="帳戶管理頁載入")
 
     # 等待第一層 loading 消失
     WebDriverWait(driver, 180).until(
@@ -285,7 +308,7 @@ def navigate_to_players(driver, loading_xpath, loading_xpath2):
     WebDriverWait(driver, 180).until(
         EC.invisibility_of_element_located((By.XPATH, loading_xpath2))
     )
-    time.sleep(2)
+    waits.settle(driver, [loading_xpath, loading_xpath2], timeout=30, label="帳戶管理頁穩定")
 
     # 等待 loading mask 完全消失
     try:
@@ -294,8 +317,6 @@ def navigate_to_players(driver, loading_xpath, loading_xpath2):
         )
     except:
         pass
-    
-    time.sleep(1)
 
     # 確認元素可見
     element = WebDriverWait(driver, 180).until(
@@ -315,7 +336,7 @@ def navigate_to_players(driver, loading_xpath, loading_xpath2):
     except:
         pass
     
-    time.sleep(1)
+    waits.element_stable(driver, player, timeout=5, label="直屬玩家頁籤就緒")
     log_loading_light("點選[直屬玩家]\n")
     
     # 使用 JavaScript 點擊，避免被遮擋
@@ -338,7 +359,7 @@ def navigate_to_players(driver, loading_xpath, loading_xpath2):
     except:
         pass
     
-    time.sleep(2)
+    waits.settle(driver, [loading_xpath], timeout=30, label="直屬玩家列表載入")
     
     # 檢查是否有「無內容」圖片
     try:
@@ -355,31 +376,30 @@ def navigate_to_players(driver, loading_xpath, loading_xpath2):
             EC.element_to_be_clickable(
                 (By.XPATH, '//*[@id="app-main"]/section/footer/div[2]/div/span[2]/div/div/span/span/i'))
         )
-        time.sleep(1)
         return True  # 有分頁元素，表示有資料
     except:
         log_warning("此帳號底下無會員資料，跳過處理")
         return False
 
 
+@tracing.traced
 def set_page_size_to_500(driver):
     """切换到 500 条/页"""
     try:
-        log_info("目前頁面會員均已符合條件")
         log_info("切換至 500條/頁 檢查")
         page_dropdown = WebDriverWait(driver, 180).until(
             EC.element_to_be_clickable(
                 (By.XPATH, '//*[@id="app-main"]/section/footer/div[2]/div/span[2]/div/div/span/span/i'))
         )
-        time.sleep(1)
+        waits.element_stable(driver, page_dropdown, timeout=5, label="分頁選單就緒")
         page_dropdown.click()
 
         page_option_500 = WebDriverWait(driver, 180).until(
             EC.element_to_be_clickable((By.XPATH, '/html/body/div[2]/div[1]/div[1]/ul/li[5]/span'))
         )
-        time.sleep(1)
+        waits.element_stable(driver, page_option_500, timeout=5, label="分頁選項展開")
         page_option_500.click()
-        time.sleep(3)
+        waits.settle(driver, timeout=30, label="切換 500 條/頁")
         log_info("已切换至 500 条/页")
     except Exception as e:
         log_error(f"切换至 500 条/页失败: {e}")
@@ -389,7 +409,7 @@ def process_member_add_balance(driver, account_name, member_balance, num, loadin
     """處理上分邏輯"""
     log_info(f"餘額：{member_balance} ，低於目標金額： {num} ，準備上分...")
 
-    time.sleep(3)
+    waits.settle(driver, [loading_xpath], timeout=30, label="會員詳情載入")
 
     if click_with_retry(driver,
                         '//*[@id="app-main"]/section/main/div[2]/div[1]/div[2]/div[6]/div[5]/div/button[3]',
@@ -409,11 +429,10 @@ def process_member_add_balance(driver, account_name, member_balance, num, loadin
             EC.element_to_be_clickable((By.XPATH,
                                         '//*[@id="app-main"]/section/main/div[2]/div[2]/div[1]/div/div[2]/div[3]/div[3]/div[2]/input'))
         )
-        time.sleep(0.2)
         adjust.clear()
-        time.sleep(0.2)
+        waits.wait_until(lambda: adjust.get_attribute("value") == "", timeout=3, label="清空調整金額")
         adjust.send_keys(str(num - member_balance))
-        time.sleep(0.2)
+        waits.input_filled(driver, adjust, expected=num - member_balance, timeout=3, label="調整金額輸入完成")
     except Exception as e:
         log_warning(f"调整余额失败：{e}")
 
@@ -427,14 +446,14 @@ def process_member_add_balance(driver, account_name, member_balance, num, loadin
     WebDriverWait(driver, 180).until_not(
         EC.presence_of_element_located((By.XPATH, loading_xpath))
     )
-    time.sleep(2)
+    waits.settle(driver, [loading_xpath], timeout=30, label="上分送出")
 
 
 def process_member_deduct_balance(driver, account_name, member_balance, num, loading_xpath):
     """處理扣分邏輯"""
     log_info(f"{account_name} 餘額 {member_balance} 大於 {num}，準備扣分")
 
-    time.sleep(3)
+    waits.settle(driver, [loading_xpath], timeout=30, label="會員詳情載入")
 
     if click_with_retry(driver,
                         '//*[@id="app-main"]/section/main/div[2]/div[1]/div[2]/div[6]/div[5]/div/button[3]',
@@ -443,7 +462,7 @@ def process_member_deduct_balance(driver, account_name, member_balance, num, loa
     else:
         log_warning("点击额度设定失败")
 
-    time.sleep(1)
+    waits.settle(driver, [loading_xpath], timeout=15, label="額度設定選單")
 
     if click_with_retry(driver, '/html/body/div[2]/div/div[2]/div[1]/div/div[3]/div[2]',
                         '//*[@id="app-main"]/section/main/div[2]/div[2]/div[1]/div/div[2]/div[3]/div[2]/div[2]/label[2]/span[1]/span'):
@@ -451,7 +470,7 @@ def process_member_deduct_balance(driver, account_name, member_balance, num, loa
     else:
         log_warning("点击点数分配失败")
 
-    time.sleep(1)
+    waits.settle(driver, [loading_xpath], timeout=15, label="點數分配表單")
 
     if click_with_retry(driver,
                         '//*[@id="app-main"]/section/main/div[2]/div[2]/div[1]/div/div[2]/div[3]/div[2]/div[2]/label[2]/span[1]/span',
@@ -460,23 +479,21 @@ def process_member_deduct_balance(driver, account_name, member_balance, num, loa
     else:
         log_warning("点击减少余额失败")
 
-    time.sleep(1)
+    waits.settle(driver, [loading_xpath], timeout=15, label="減少餘額切換")
 
     try:
         adjust = WebDriverWait(driver, 10).until(
             EC.element_to_be_clickable((By.XPATH,
                                         '//*[@id="app-main"]/section/main/div[2]/div[2]/div[1]/div/div[2]/div[3]/div[3]/div[2]/input'))
         )
-        time.sleep(0.2)
         adjust.clear()
-        time.sleep(0.2)
+        waits.wait_until(lambda: adjust.get_attribute("value") == "", timeout=3, label="清空調整金額")
         adjust.send_keys(str(member_balance - num))
+        waits.input_filled(driver, adjust, expected=member_balance - num, timeout=3, label="調整金額輸入完成")
         log_info("调整余额成功")
     except Exception as e:
         log_warning(f"调整余额失败: {e}")
 
-    time.sleep(0.2)
-
     if click_with_retry(driver,
                         '//*[@id="app-main"]/section/main/div[2]/div[2]/div[1]/div/div[2]/div[3]/div[5]/div[2]',
                         '//*[@id="app-main"]/section/main/div[2]/div[1]/div[2]'):
@@ -487,14 +504,15 @@ def process_member_deduct_balance(driver, account_name, member_balance, num, loa
     WebDriverWait(driver, 180).until_not(
         EC.presence_of_element_located((By.XPATH, loading_xpath))
     )
-    time.sleep(2)
+    waits.settle(driver, [loading_xpath], timeout=30, label="扣分送出")
 
 
+@tracing.traced
 def return_to_players_page(driver):
     """返回玩家列表頁面"""
     log_important("返回代理帳號")
-    driver.get("https://ad.jfw-win.com/#/agent/user-manage/agent-user")
-    time.sleep(4)
+    driver.get(endpoints.page_url(endpoints.AGENT_USER_ROUTE))
+    waits.settle(driver, timeout=30, label="返回代理帳號頁")
 
     log_important("跳轉[直屬玩家]頁面\n")
 
@@ -508,14 +526,14 @@ def return_to_players_page(driver):
                 EC.element_to_be_clickable(
                     (By.XPATH, '//div[@role="tablist"]//div[@id="tab-gameUser"]'))
             )
-            time.sleep(1)
+            waits.element_stable(driver, player, timeout=5, label="直屬玩家頁籤就緒")
             player.click()
             clicked = True
         except Exception as e:
             attempt += 1
             log_important(f"点击直属玩家失败，尝试 {attempt} 次")
             if attempt < max_attempts:
-                time.sleep(2)
+                waits.pause(2, label="直屬玩家重試間隔")
             else:
                 log_important("点击直属玩家失败，已达最大重试次数。")
 
@@ -523,177 +541,538 @@ def return_to_players_page(driver):
         EC.element_to_be_clickable(
             (By.XPATH, '//*[@id="app-main"]/section/footer/div[2]/div/span[2]/div/div/span/span/i'))
     )
-    time.sleep(1)
+    waits.settle(driver, timeout=30, label="直屬玩家列表載入")
+
+
+# ============================
+# 會員列表 XPath 與快照
+# ============================
+MEMBER_ACCOUNTS_XPATH = '//*[@id="app-main"]/section/main/div[4]/div[2]/div/div/div[1]/div[1]/div[2]/div[2]'
+MEMBER_ROW_XPATH = '//*[@id="agent-bbox-id"]/div[2]/div/div[{idx}]'
+MEMBER_BUTTON_XPATH = MEMBER_ROW_XPATH + '/div[1]/div[3]/div[1]'
+MEMBER_TYPE_XPATH = MEMBER_ROW_XPATH + '/div[1]/div[2]/div[1]/div[2]'
+MEMBER_BALANCE_XPATH = MEMBER_ROW_XPATH + '/div[1]/div[2]/div[5]/div[2]'
+
+# 在頁面內一次讀完所有會員列，回傳 [[列號, 帳號, 類型, 餘額文字], ...] 的 JSON
+SNAPSHOT_MEMBERS_JS = """
+var accountsXpath = arguments[0], buttonXpath = arguments[1];
+var typeXpath = arguments[2], balanceXpath = arguments[3];
+var startRow = arguments[4], maxRows = arguments[5];
+function first(xpath) {
+    return document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+function text(el) {
+    return el ? (el.innerText || el.textContent || '').trim() : '';
+}
+var accounts = document.evaluate(accountsXpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+var rows = [];
+for (var idx = startRow; idx <= maxRows && idx <= accounts.snapshotLength; idx++) {
+    if (!first(buttonXpath.replace('{idx}', idx))) break;
+    rows.push([
+        idx,
+        text(accounts.snapshotItem(idx - 1)),
+        text(first(typeXpath.replace('{idx}', idx))),
+        text(first(balanceXpath.replace('{idx}', idx)))
+    ]);
+}
+return JSON.stringify(rows);
+"""
+
+
+def snapshot_members(driver, start=1, max_rows=999):
+    """
+    一次 execute_script 讀取目前頁面第 start ~ max_rows 列會員
+    回傳 [{"idx": 列號, "account": 帳號, "agent_type": 類型, "balance": 餘額文字}, ...]
+    """
+    raw = driver.execute_script(
+        SNAPSHOT_MEMBERS_JS,
+        MEMBER_ACCOUNTS_XPATH, MEMBER_BUTTON_XPATH, MEMBER_TYPE_XPATH, MEMBER_BALANCE_XPATH, start, max_rows,
+    )
+    return [
+        {"idx": idx, "account": account, "agent_type": agent_type, "balance": balance}
+        for idx, account, agent_type, balance in json.loads(raw or "[]")
+    ]
 
 
-def process_all_members(driver, num, loading_xpath):
-    """處理所有會員的上下分邏輯"""
-    with print_lock:
-        print("")
-        print(Fore.MAGENTA + "腳本開始執行!\n" + Style.RESET_ALL)
-    log_loading_light("重新整理页面\n")
+def read_member_row(driver, idx):
+    """只重新讀取單一列（調整後驗證用），該列不存在時回傳 None"""
+    rows = snapshot_members(driver, start=idx, max_rows=idx)
+    return rows[0] if rows else None
+
+
+def parse_balance(text):
+    """把 '1,234.00' 這類餘額文字轉成整數"""
+    return int(float(text.replace(",", "")))
+
+
+@tracing.traced
+def adjust_member(driver, member, member_balance, num, loading_xpath):
+    """點擊會員列並執行上分或扣分，完成後返回直屬玩家列表"""
+    account_name = member["account"]
+    button = driver.find_element(By.XPATH, MEMBER_BUTTON_XPATH.format(idx=member["idx"]))
+    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
+    if wait_for_scroll_end(driver):
+        waits.element_stable(driver, button, timeout=5, label="會員按鈕就緒")
+        button.click()
+        log_info("準備上分" if member_balance < num else "準備扣除")
+    else:
+        log_info("滾動超時未結束")
+
+    if member_balance < num:
+        process_member_add_balance(driver, account_name, member_balance, num, loading_xpath)
+        log_success(f"{account_name} 已完成上分並標記為已處理")
+    else:
+        process_member_deduct_balance(driver, account_name, member_balance, num, loading_xpath)
+        log_success(f"{account_name} 已完成扣分並標記為已處理")
+
 
-    page_size_50_checked = False
-    switching_to_500 = False
-    all_members_checked = False
-    processed_accounts = set()  # 記錄已處理過的帳號
+# ============================
+# 對帳計畫：先唯讀掃描，再批次執行
+# ============================
+PLAN_FIELDS = ["代理", "會員", "列號", "目前餘額", "目標金額", "差額", "動作"]
 
+
+@tracing.traced
+def collect_members(driver, loading_xpath):
+    """切換到 500 條/頁後一次讀取所有直屬會員（唯讀，不做任何調整）"""
     player = WebDriverWait(driver, 180).until(
         EC.element_to_be_clickable((By.XPATH, '//div[@role="tablist"]//div[@id="tab-gameUser"]'))
     )
-    time.sleep(1)
+    waits.element_stable(driver, player, timeout=5, label="直屬玩家頁籤就緒")
     player.click()
 
-    while not all_members_checked:
+    WebDriverWait(driver, 180).until_not(
+        EC.presence_of_element_located((By.XPATH, loading_xpath))
+    )
+    set_page_size_to_500(driver)
+
+    log_loading_light("正在取得會員帳號\n")
+    waits.settle(driver, [loading_xpath], timeout=60, label="會員列表載入")
+    WebDriverWait(driver, 180).until(
+        EC.presence_of_element_located((By.XPATH, MEMBER_ACCOUNTS_XPATH))
+    )
+
+    # 一次 execute_script 取得整頁會員的帳號、類型、餘額
+    return snapshot_members(driver)
+
+
+def build_plan(agent, members, num):
+    """由會員快照建立對帳計畫，只包含餘額與目標不同的現金代理會員"""
+    plan = []
+    for member in members:
+        if member["agent_type"] == "信用代理":
+            continue
         try:
-            WebDriverWait(driver, 180).until_not(
-                EC.presence_of_element_located((By.XPATH, loading_xpath))
-            )
+            balance = parse_balance(member["balance"])
+        except ValueError:
+            log_error(f"{member['account']} 餘額格式無法解析：{member['balance']}")
+            continue
+        if balance == num:
+            continue
+        plan.append({
+            "代理": agent,
+            "會員": member["account"],
+            "列號": member["idx"],
+            "目前餘額": balance,
+            "目標金額": num,
+            "差額": num - balance,
+            "動作": "上分" if balance < num else "扣分",
+        })
+    return plan
+
+
+def write_plan_csv(plan, csv_path):
+    """把對帳計畫寫成 CSV（utf-8-sig，Excel 可直接開啟）"""
+    with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=PLAN_FIELDS)
+        writer.writeheader()
+        writer.writerows(plan)
+
+
+@tracing.traced
+def locate_plan_row(driver, entry):
+    """
+    確認計畫中的會員仍在原本的列號，回傳目前的會員列
+    列表順序若已改變，重新快照並依帳號找到新的列號
+    """
+    row = read_member_row(driver, entry["列號"])
+    if row and row["account"] == entry["會員"]:
+        return row
+    log_info("會員列表順序已變動，重新讀取列表")
+    for row in snapshot_members(driver):
+        if row["account"] == entry["會員"]:
+            return row
+    return None
+
+
+def find_member_row(driver, entry, loading_xpath, use_search=False):
+    """
+    回到會員列表並取得計畫中該會員目前的列
+    預設重新載入直屬玩家列表、切到 500 條/頁後依快照定位
+    use_search 時先用搜尋框定位，找不到搜尋框或搜尋不到該會員時改回預設流程
+    """
+    if use_search:
+        try:
+            return_to_member_list(driver, loading_xpath)
+            if driver.find_elements(By.XPATH, MEMBER_SEARCH_INPUT_XPATH):
+                row = search_member(driver, entry["會員"], loading_xpath)
+                if row is not None:
+                    return row
+            log_info(f"搜尋框無法定位 {entry['會員']}，改用完整列表")
+        except Exception as e:
+            log_warning(f"搜尋框定位 {entry['會員']} 失敗，改用完整列表：{e}")
+    return_to_players_page(driver)
+    set_page_size_to_500(driver)
+    return locate_plan_row(driver, entry)
+
+
+def execute_plan(driver, plan, loading_xpath, journal=None, use_search=False):
+    """
+    依序執行對帳計畫
+    每位會員執行前重新讀取該列確認餘額，執行後重新載入列表、只讀取該列驗證
+    驗證後的列表（500 條/頁）直接用來定位下一位；use_search 時改用搜尋框定位與驗證
+    journal 不為 None 時，每個步驟都會寫入執行紀錄
+    """
+    start = time.perf_counter()
+    adjusted = 0
+    # 每位實際調整的會員從定位到驗證完成的耗時（秒）
+    member_times = []
+    # 完整列表（500 條/頁）是否仍在畫面上（進入會員詳情或搜尋後列表會改變）
+    list_intact = True
+    for entry in plan:
+        agent = entry["代理"]
+        account_name = entry["會員"]
+        num = entry["目標金額"]
+        member_balance = entry["目前餘額"]
+        member_start = time.perf_counter()
+        try:
+            if list_intact:
+                row = locate_plan_row(driver, entry)
+            else:
+                row = find_member_row(driver, entry, loading_xpath, use_search)
+            list_intact = not use_search
+            if row is None:
+                log_warning(f"{account_name} 已不在會員列表中，跳過")
+                journal_member(journal, agent, account_name, member_balance, num, "missing")
+                continue
+
+            # 計畫建立後餘額可能已被其他人調整，以目前餘額為準
+            member_balance = parse_balance(row["balance"])
+            if member_balance == num:
+                log_info(f"{account_name} 餘額已符合目標 {num}，跳過")
+                journal_member(journal, agent, account_name, member_balance, num, "verified")
+                continue
+
+            log_info(f"{account_name}，類型：『現金代理』，餘額: {member_balance}，開始處理")
+            journal_member(journal, agent, account_name, member_balance, num, "adjusting")
+            list_intact = False
+            adjust_member(driver, row, member_balance, num, loading_xpath)
+            adjusted += 1
+            metrics.members_adjusted.inc(agent=agent)
+
+            # 只重新讀取剛調整的那一列驗證結果
+            row = find_member_row(driver, {"列號": row["idx"], "會員": account_name}, loading_xpath, use_search)
+            list_intact = not use_search
+            if row and parse_balance(row["balance"]) == num:
+                log_success(f"{account_name} 驗證完成，目前餘額 {num}")
+                journal_member(journal, agent, account_name, member_balance, num, "verified")
+            else:
+                log_warning(f"{account_name} 調整後餘額與目標 {num} 不符")
+                journal_member(journal, agent, account_name, member_balance, num, "mismatch")
+                metrics.failures.inc(kind="mismatch")
+            member_times.append(time.perf_counter() - member_start)
+            log_info(f"{account_name} 耗時 {member_times[-1]:.1f} 秒")
 
-            log_loading_light("正在取得會員帳號\n")
-            time.sleep(5)
+        except Exception as e:
+            log_error(f"{account_name} 處理失敗（耗時 {time.perf_counter() - member_start:.1f} 秒）: {e}")
+            journal_member(journal, agent, account_name, member_balance, num, "failed")
+            metrics.failures.inc(kind="adjust")
+            # 瀏覽器可能還停在會員詳情或調整表單，重新載入完整列表再處理下一位
+            return_to_players_page(driver)
+            set_page_size_to_500(driver)
+            list_intact = True
+
+    average = sum(member_times) / len(member_times) if member_times else 0.0
+    log_info(f"計畫執行完成：調整 {adjusted}/{len(plan)} 位，耗時 {time.perf_counter() - start:.1f} 秒，"
+             f"平均每位 {average:.1f} 秒")
+    return adjusted
+
+
+# ============================
+# 執行紀錄：中斷後重新執行時，跳過已驗證的會員與已完成的代理
+# ============================
+# 同一位會員調整後驗證不符達到這個次數就不再重試
+MAX_MISMATCH_ATTEMPTS = 3
+
+
+def journal_member(journal, agent, account_name, balance, num, status):
+    """
+    記錄一位會員的處理狀態
+    status：adjusting（開始調整）/ verified（已驗證符合目標）/ mismatch / failed / missing
+    """
+    if journal is None:
+        return
+    delta = None if balance is None else num - balance
+    journal.record("member", agent=agent, member=account_name,
+                   old_balance=balance, delta=delta, target=num, status=status)
+
+
+def member_statuses(journal, agent, num):
+    """回傳 {會員: 最後狀態}（只看同一個目標金額的紀錄）"""
+    if journal is None:
+        return {}
+    return {r["member"]: r["status"] for r in journal.find("member", agent=agent, target=num)}
+
+
+def settled_members(journal, agent, num):
+    """
+    本輪不需再處理的會員：已驗證、已不在會員列表（missing），
+    或調整後驗證不符已達 MAX_MISMATCH_ATTEMPTS 次
+    """
+    if journal is None:
+        return set()
+    mismatches = Counter(r["member"] for r in journal.find("member", agent=agent, target=num, status="mismatch"))
+    return {m for m, status in member_statuses(journal, agent, num).items()
+            if status in ("verified", "missing")
+            or (status == "mismatch" and mismatches[m] >= MAX_MISMATCH_ATTEMPTS)}
+
+
+def unfinished_members(journal, agent, num):
+    """本輪有紀錄但仍需處理的會員（adjusting / failed / 次數未滿的 mismatch）"""
+    settled = settled_members(journal, agent, num)
+    return [m for m in member_statuses(journal, agent, num) if m not in settled]
+
+
+def agent_done(journal, agent, num):
+    """代理在本輪是否已完整處理過"""
+    return journal is not None and bool(journal.find("agent_done", agent=agent, target=num))
+
+
+# ============================
+# 指定會員快速模式：用會員列表的搜尋框直接定位
+# ============================
+MEMBER_SEARCH_INPUT_XPATH = '//*[@id="app-main"]//input[contains(@placeholder, "帳號")]'
+MEMBER_SEARCH_BUTTON_XPATH = '//*[@id="app-main"]//button[contains(., "查詢") or contains(., "搜尋")]'
+
+
+def load_plan_csv(csv_path, agent_targets=None):
+    """
+    讀取對帳計畫或會員清單 CSV，回傳 {代理: [會員, ...]}
+    至少需要「代理」「會員」兩欄（--plan-only 產生的檔案可直接使用）
+    目標金額一律以 用戶資訊.txt 為準；agent_targets（{代理: 目標金額}）不為 None 時，
+    CSV 的「目標金額」欄與其不同會提出警告
+    """
+    targets = {}
+    mismatched = {}
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            agent = (row.get("代理") or "").strip()
+            member = (row.get("會員") or "").strip()
+            if agent and member:
+                targets.setdefault(agent, []).append(member)
+
+            csv_target = (row.get("目標金額") or "").strip()
+            if not agent_targets or agent not in agent_targets or not csv_target:
+                continue
+            try:
+                if parse_balance(csv_target) != agent_targets[agent]:
+                    mismatched.setdefault(agent, csv_target)
+            except ValueError:
+                pass
+
+    for agent, csv_target in mismatched.items():
+        log_warning(f"{agent} 在 CSV 中的目標金額 {csv_target} 與 用戶資訊.txt 的 "
+                    f"{agent_targets[agent]} 不同，以 用戶資訊.txt 為準")
+    return targets
+
+
+@tracing.traced
+def search_member(driver, account_name, loading_xpath):
+    """在會員列表搜尋框輸入帳號，回傳搜尋結果中該會員的列；找不到回傳 None"""
+    search_input = WebDriverWait(driver, 30).until(
+        EC.element_to_be_clickable((By.XPATH, MEMBER_SEARCH_INPUT_XPATH))
+    )
+    search_input.clear()
+    search_input.send_keys(account_name)
+    waits.input_filled(driver, search_input, expected=account_name, timeout=3, label="搜尋帳號輸入完成")
+    try:
+        driver.find_element(By.XPATH, MEMBER_SEARCH_BUTTON_XPATH).click()
+    except Exception:
+        search_input.send_keys(Keys.ENTER)
+
+    def matched_row():
+        rows = snapshot_members(driver)
+        for row in rows:
+            if row["account"] == account_name:
+                return row
+        return None
+
+    waits.settle(driver, [loading_xpath], timeout=30, label="會員搜尋結果")
+    return waits.wait_until(matched_row, timeout=10, label="會員搜尋結果") or None
+
+
+@tracing.traced
+def return_to_member_list(driver, loading_xpath):
+    """
+    調整完成後回到會員列表（優先點直屬玩家頁籤，不重新載入整頁）
+    還停在會員詳情頁時先回上一頁，由前端路由切回代理帳號頁
+    """
+    tab_xpath = '//div[@role="tablist"]//div[@id="tab-gameUser"]'
+    active_tab_xpath = '//div[@role="tablist"]//div[@id="tab-gameUser" and contains(@class, "is-active")]'
+    # 直屬玩家頁籤為目前頁籤且會員列表已顯示，才算已在會員列表
+    if driver.find_elements(By.XPATH, active_tab_xpath) and driver.find_elements(By.XPATH, MEMBER_ACCOUNTS_XPATH):
+        return
+    try:
+        if not driver.find_elements(By.XPATH, tab_xpath):
+            driver.back()
+        player = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, tab_xpath)))
+        driver.execute_script("arguments[0].click();", player)
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, active_tab_xpath))
+        )
+        waits.settle(driver, [loading_xpath], timeout=30, label="返回會員列表")
+    except Exception:
+        # 頁面狀態異常時才重新載入
+        return_to_players_page(driver)
 
-            accounts = WebDriverWait(driver, 180).until(
-                EC.presence_of_all_elements_located(
-                    (By.XPATH, '//*[@id="app-main"]/section/main/div[4]/div[2]/div/div/div[1]/div[1]/div[2]/div[2]'))
-            )
 
-            buttons = []
-            for idx in range(1, 1000):
-                try:
-                    xpath = f'//*[@id="agent-bbox-id"]/div[2]/div/div[{idx}]/div[1]/div[3]/div[1]'
-                    button = WebDriverWait(driver, 3).until(
-                        EC.presence_of_element_located((By.XPATH, xpath))
-                    )
-                    buttons.append(button)
-                except:
-                    break
+def process_targeted_members(driver, agent, num, members, loading_xpath, plan_only=False, journal=None):
+    """只處理指定的會員：逐一搜尋、調整、驗證，不掃描也不重新載入整頁列表"""
+    start = time.perf_counter()
+    plan = []
+    adjusted = 0
 
-            if not accounts or not buttons:
-                log_success("所有會員上分任務完成！\n")
-                break
+    done = settled_members(journal, agent, num)
+    if done:
+        log_info(f"執行紀錄中已有 {len(done)} 位會員已完成或不再重試，本次跳過")
+        members = [m for m in members if m not in done]
 
-            processed = False
-            skipped_accounts = set()
+    player = WebDriverWait(driver, 180).until(
+        EC.element_to_be_clickable((By.XPATH, '//div[@role="tablist"]//div[@id="tab-gameUser"]'))
+    )
+    waits.element_stable(driver, player, timeout=5, label="直屬玩家頁籤就緒")
+    player.click()
+    waits.settle(driver, [loading_xpath], timeout=60, label="會員列表載入")
 
-            for idx, (account, button) in enumerate(zip(accounts, buttons), start=1):
-                try:
-                    account_name = account.text.strip()
+    for account_name in members:
+        try:
+            row = search_member(driver, account_name, loading_xpath)
+            if row is None:
+                log_warning(f"{account_name} 搜尋不到此會員，跳過")
+                journal_member(journal, agent, account_name, None, num, "missing")
+                continue
+            entries = build_plan(agent, [row], num)
+            if not entries:
+                log_info(f"{account_name} 餘額已符合目標或為信用代理，跳過")
+                continue
+            plan.extend(entries)
+            if plan_only:
+                continue
+
+            member_balance = entries[0]["目前餘額"]
+            log_info(f"{account_name}，餘額: {member_balance}，開始處理")
+            journal_member(journal, agent, account_name, member_balance, num, "adjusting")
+            adjust_member(driver, row, member_balance, num, loading_xpath)
+            adjusted += 1
+            metrics.members_adjusted.inc(agent=agent)
+            return_to_member_list(driver, loading_xpath)
+
+            row = search_member(driver, account_name, loading_xpath)
+            if row and parse_balance(row["balance"]) == num:
+                log_success(f"{account_name} 驗證完成，目前餘額 {num}")
+                journal_member(journal, agent, account_name, member_balance, num, "verified")
+            else:
+                log_warning(f"{account_name} 調整後餘額與目標 {num} 不符")
+                journal_member(journal, agent, account_name, member_balance, num, "mismatch")
+                metrics.failures.inc(kind="mismatch")
 
-                    # 檢查是否已處理過此帳號
-                    if account_name in processed_accounts:
-                        log_info(f"{account_name} 已處理過，跳過")
-                        continue
+        except Exception as e:
+            log_error(f"{account_name} 處理失敗: {e}")
+            journal_member(journal, agent, account_name, None, num, "failed")
+            metrics.failures.inc(kind="adjust")
+            return_to_member_list(driver, loading_xpath)
 
-                    agent_type_xpath = f'//*[@id="agent-bbox-id"]/div[2]/div/div[{idx}]/div[1]/div[2]/div[1]/div[2]'
-                    agent_type_element = WebDriverWait(driver, 180).until(
-                        EC.presence_of_element_located((By.XPATH, agent_type_xpath))
-                    )
-                    agent_type = agent_type_element.text.strip()
+    log_info(f"指定會員處理完成：需調整 {len(plan)} 位，已調整 {adjusted}/{len(members)} 位，耗時 {time.perf_counter() - start:.1f} 秒")
+    return plan
 
-                    if agent_type == "信用代理":
-                        if account_name not in skipped_accounts:
-                            skipped_accounts.add(account_name)
-                        continue
 
-                    balance_xpath = f'//*[@id="agent-bbox-id"]/div[2]/div/div[{idx}]/div[1]/div[2]/div[5]/div[2]'
-                    balance_element = WebDriverWait(driver, 180).until(
-                        EC.presence_of_element_located((By.XPATH, balance_xpath))
-                    )
-                    member_balance = int(float(balance_element.text.replace(",", "")))
-
-                    if member_balance == num:
-                        skipped_accounts.add(account_name)
-                        processed_accounts.add(account_name)  # 記錄為已處理
-                        log_info(f"{account_name} 餘額已符合目標 {num}，標記為已處理")
-                        continue
-
-                    log_info(f"{account_name}，類型：『現金代理』，餘額: {member_balance}，開始處理")
-
-                    # 處理上分
-                    if member_balance < num:
-                        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
-                        if wait_for_scroll_end(driver):
-                            time.sleep(2)
-                            button.click()
-                            log_info("準備上分")
-                        else:
-                            log_info("滾動超時未結束")
-
-                        process_member_add_balance(driver, account_name, member_balance, num, loading_xpath)
-                        processed_accounts.add(account_name)  # 記錄為已處理
-                        log_success(f"{account_name} 已完成上分並標記為已處理")
-                        return_to_players_page(driver)
-
-                        if switching_to_500:
-                            set_page_size_to_500(driver)
-
-                        processed = True
-                        break
-
-                    # 處理扣分
-                    if member_balance > num:
-                        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
-                        if wait_for_scroll_end(driver):
-                            time.sleep(2)
-                            button.click()
-                            log_info("準備扣除")
-                        else:
-                            log_info("滾動超時未結束")
-
-                        process_member_deduct_balance(driver, account_name, member_balance, num, loading_xpath)
-                        processed_accounts.add(account_name)  # 記錄為已處理
-                        log_success(f"{account_name} 已完成扣分並標記為已處理")
-                        return_to_players_page(driver)
-
-                        if switching_to_500:
-                            set_page_size_to_500(driver)
-
-                        processed = True
-                        break
-
-                except Exception as e:
-                    log_error(f"{account_name} 處理失敗: {e}")
-                    continue
+def process_all_members(driver, agent, num, loading_xpath, plan_only=False, journal=None, use_search=False):
+    """
+    處理所有會員的上下分邏輯
+    1. 唯讀掃描所有會員，建立對帳計畫（會員、目前餘額、目標、差額、上分/扣分）
+    2. plan_only 時直接回傳計畫，否則依計畫批次執行（use_search 時以搜尋框定位會員）
+    """
+    with print_lock:
+        print("")
+        print(Fore.MAGENTA + "腳本開始執行!\n" + Style.RESET_ALL)
 
-            if not processed:
-                if not page_size_50_checked:
-                    set_page_size_to_500(driver)
-                    page_size_50_checked = True
-                    switching_to_500 = True
-                    continue
-                elif switching_to_500:
-                    log_success("所有直屬會員已檢查完畢，無需繼續補/扣分。\n")
-                    all_members_checked = True
-                else:
-                    log_success("所有直屬會員餘額均符合要求，無需補/扣分。\n")
-                    all_members_checked = True
+    scan_start = time.perf_counter()
+    members = collect_members(driver, loading_xpath)
+    plan = build_plan(agent, members, num)
+    log_info(f"掃描 {len(members)} 位會員，需調整 {len(plan)} 位，"
+             f"耗時 {time.perf_counter() - scan_start:.1f} 秒")
 
-        except Exception as e:
-            log_error(f"發生錯誤: {e}")
-            break
+    done = settled_members(journal, agent, num)
+    if done:
+        skipped = [e for e in plan if e["會員"] in done]
+        plan = [e for e in plan if e["會員"] not in done]
+        log_info(f"執行紀錄中已有 {len(done)} 位會員已完成或不再重試，計畫中跳過 {len(skipped)} 位")
 
-    log_success("所有會員任務完成！")
+    for entry in plan:
+        log_info(f"計畫：{entry['會員']} {entry['動作']} {abs(entry['差額'])}（目前 {entry['目前餘額']}）")
 
+    if plan_only:
+        return plan
 
-def process_single_account(username_text, password_text, num):
-    """處理單一帳號的完整流程"""
+    if not plan:
+        log_success("所有直屬會員餘額均符合要求，無需補/扣分。\n")
+    else:
+        execute_plan(driver, plan, loading_xpath, journal, use_search)
+
+    log_success("所有會員任務完成！")
+    return plan
+
+
+@tracing.traced(cat="agent")
+def process_single_account(username_text, password_text, num, pool, plan_only=False, targets=None,
+                           journal=None, session_store=None, use_search=False):
+    """
+    處理單一帳號的完整流程（瀏覽器由連線池借出），回傳該帳號的對帳計畫
+    發生錯誤時記錄後往外拋；仍有會員未完成時拋出 JobFailed（計畫保留在 result）
+    targets 為指定會員清單時，改用搜尋框逐一處理，不掃描整頁
+    journal 不為 None 時記錄每位會員的處理狀態；本輪已完成的代理直接跳過
+    session_store 不為 None 時，登入前先嘗試沿用已保存的登入狀態
+    use_search 時整頁模式調整後改用搜尋框定位與驗證會員（找不到搜尋框時自動改回完整列表）
+    """
+    tracing.set_agent(username_text)
     driver = None
+    plan = []
+    pending = []
+    if agent_done(journal, username_text, num):
+        log_info(f"帳號 {username_text} 在執行紀錄中已完成，跳過")
+        # 進度的總數包含這個代理，跳過也算完成
+        metrics.agents_done.inc()
+        return plan
     try:
         with print_lock:
             print(f"\n{'='*50}")
             print(Fore.YELLOW + f"開始處理帳號: {username_text} | 目標金額: {num}" + Style.RESET_ALL)
             print(f"{'='*50}\n")
         
-        driver = init_driver()
-        loading_xpath, loading_xpath2 = login_to_system(driver, username_text, password_text)
+        driver = pool.acquire()
+        loading_xpath, loading_xpath2 = login_to_system(driver, username_text, password_text, session_store)
         
         # 導航到玩家頁面，檢查是否有資料
         has_data = navigate_to_players(driver, loading_xpath, loading_xpath2)
         
         if has_data:
             # 有資料才處理會員
-            process_all_members(driver, num, loading_xpath)
+            if targets:
+                plan = process_targeted_members(driver, username_text, num, targets, loading_xpath,
+                                                plan_only, journal)
+            else:
+                plan = process_all_members(driver, username_text, num, loading_xpath, plan_only, journal,
+                                           use_search)
             with print_lock:
                 print(f"\n{'='*50}")
                 print(Fore.GREEN + f"帳號 {username_text} 處理完成！" + Style.RESET_ALL)
@@ -705,21 +1084,69 @@ def process_single_account(username_text, password_text, num):
                 print(Fore.YELLOW + f"帳號 {username_text} 無會員資料，已跳過" + Style.RESET_ALL)
                 print(f"{'='*50}\n")
         
+        # 所有會員都驗證完成（或已不再重試）才標記代理完成，否則下次執行會再處理一次
+        if journal is not None:
+            pending = unfinished_members(journal, username_text, num)
+            statuses = member_statuses(journal, username_text, num)
+            given_up = [m for m in settled_members(journal, username_text, num) if statuses[m] != "verified"]
+            if given_up:
+                log_warning(f"帳號 {username_text} 有 {len(given_up)} 位會員無法完成，不再重試："
+                            f"{', '.join(given_up)}")
+            if pending:
+                log_warning(f"帳號 {username_text} 仍有 {len(pending)} 位會員未完成，下次執行會繼續處理")
+            else:
+                journal.record("agent_done", agent=username_text, target=num)
+        if not pending:
+            metrics.agents_done.inc()
+        
     except Exception as e:
         log_error(f"處理帳號 {username_text} 時發生錯誤: {e}")
+        metrics.failures.inc(kind="agent")
+        raise
     finally:
         if driver:
             try:
                 with print_lock:
-                    print("\033[1;33m正在關閉瀏覽器...\033[0m")
-                driver.quit()
-                log_success(f"帳號 {username_text} 瀏覽器已關閉")
+                    print("\033[1;33m正在歸還瀏覽器...\033[0m")
+                # 連線池會清除登入狀態，壞掉的瀏覽器會直接關閉
+                pool.release(driver)
+                log_success(f"帳號 {username_text} 瀏覽器已歸還")
             except Exception as e:
-                log_error(f"關閉帳號 {username_text} 瀏覽器時發生錯誤: {e}")
+                log_error(f"歸還帳號 {username_text} 瀏覽器時發生錯誤: {e}")
+    if pending:
+        raise JobFailed(f"仍有 {len(pending)} 位會員未完成", result=plan)
+    return plan
+
+
+def parse_args(argv=None):
+    """解析命令列參數（直接執行時全部使用預設值）"""
+    parser = build_parser("JFW 會員上下分工具", default_workers=MAX_WORKERS)
+    parser.add_argument(
+        "--plan-only", action="store_true",
+        help="只掃描並輸出對帳計畫 CSV，不調整任何餘額",
+    )
+    parser.add_argument(
+        "--plan-file", default=os.path.join(get_output_dir(), "調整計畫.csv"),
+        help="對帳計畫 CSV 輸出路徑（預設為執行檔所在目錄下的 調整計畫.csv）",
+    )
+    parser.add_argument(
+        "--from-plan", metavar="CSV",
+        help="只處理 CSV 中列出的會員（需有「代理」「會員」欄，例如 --plan-only 的輸出），"
+             "以搜尋框直接定位，不掃描整頁；目標金額以 用戶資訊.txt 為準",
+    )
+    parser.add_argument(
+        "--search-shortcut", action="store_true",
+        help="整頁模式調整後改用會員搜尋框定位與驗證，不重新載入列表（找不到搜尋框時自動改回完整列表）",
+    )
+    add_journal_arguments(parser, os.path.join(get_output_dir(), "執行紀錄.jsonl"))
+    add_session_arguments(parser, os.path.join(get_output_dir(), "登入狀態.json"))
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
     """主程式入口"""
+    args = parse_args(argv)
+    apply_common_arguments(args)
     init_environment()
     
     # 載入所有帳號
@@ -730,58 +1157,110 @@ def main():
         input("按 Enter 結束...")
         sys.exit(1)
     
-    # 設定每批次處理的帳號數量
-    BATCH_SIZE = 5
+    if args.plan_only:
+        print(Fore.CYAN + "計畫模式：只掃描會員餘額，不會進行任何上下分" + Style.RESET_ALL)
+    
+    # 指定會員模式：只登入 CSV 中出現的代理
+    targets = {}
+    if args.from_plan:
+        targets = load_plan_csv(args.from_plan, {a[0]: a[2] for a in accounts})
+        accounts = [a for a in accounts if a[0] in targets]
+        if not accounts:
+            print("CSV 中的代理都不在 用戶資訊.txt 裡，沒有需要處理的帳號")
+            input("按 Enter 結束...")
+            sys.exit(1)
+        print(Fore.CYAN + f"指定會員模式：{len(accounts)} 個代理、"
+              f"{sum(len(v) for v in targets.values())} 位會員（來源 {args.from_plan}）" + Style.RESET_ALL)
+    
+    # 執行紀錄：上次中斷時沿用同一輪，跳過已完成的代理與已驗證的會員（計畫模式不寫紀錄）
+    journal = None
+    if not args.plan_only:
+        journal = RunJournal(args.journal, fresh=args.fresh, max_age_hours=args.resume_hours)
+        if journal.resumed:
+            finished = sum(1 for a in accounts if agent_done(journal, a[0], a[2]))
+            print(Fore.CYAN + f"接續上次未完成的執行（{journal.run_id}）：已完成 {finished} 個帳號，"
+                  f"{len(journal.find('member', status='verified'))} 筆會員驗證紀錄" + Style.RESET_ALL)
+            for username_text, _, num in accounts:
+                remaining = unfinished_members(journal, username_text, num)
+                if remaining and not agent_done(journal, username_text, num):
+                    print(Fore.CYAN + f"  {username_text}：{len(remaining)} 位會員待處理（{', '.join(remaining)}）"
+                          + Style.RESET_ALL)
+        elif journal.stale_run_id:
+            print(Fore.YELLOW + f"上次未完成的執行（{journal.stale_run_id}）已超過 {args.resume_hours:g} 小時，"
+                  f"開始新的一輪" + Style.RESET_ALL)
+    
+    # 同時處理的帳號上限：任一帳號完成後，空出的 worker 立刻接手下一個帳號
     total_accounts = len(accounts)
-    total_batches = (total_accounts + BATCH_SIZE - 1) // BATCH_SIZE  # 向上取整
+    workers = max(1, min(args.workers, total_accounts))
     
     print(f"\n{'='*50}")
     print(Fore.CYAN + f"共有 {total_accounts} 個帳號待處理" + Style.RESET_ALL)
-    print(Fore.CYAN + f"將分 {total_batches} 批次執行，每批次最多 {BATCH_SIZE} 個帳號" + Style.RESET_ALL)
+    print(Fore.CYAN + f"同時執行 {workers} 個帳號，完成一個立即接手下一個" + Style.RESET_ALL)
     print(f"{'='*50}\n")
     
-    # 分批處理帳號
-    for batch_num in range(total_batches):
-        start_idx = batch_num * BATCH_SIZE
-        end_idx = min(start_idx + BATCH_SIZE, total_accounts)
-        batch_accounts = accounts[start_idx:end_idx]
-        
-        print(f"\n{'='*50}")
-        print(Fore.YELLOW + f"開始執行第 {batch_num + 1}/{total_batches} 批次" + Style.RESET_ALL)
-        print(Fore.YELLOW + f"本批次處理 {len(batch_accounts)} 個帳號" + Style.RESET_ALL)
-        print(f"{'='*50}\n")
-        
-        # 建立本批次的執行緒列表
-        threads = []
-        
-        # 為本批次的每個帳號建立執行緒
-        for username_text, password_text, num in batch_accounts:
-            thread = threading.Thread(
-                target=process_single_account,
-                args=(username_text, password_text, num),
-                name=f"Thread-{username_text}"
-            )
-            threads.append(thread)
-            thread.start()
-            
-            # 稍微錯開啟動時間，避免同時初始化太多瀏覽器
-            time.sleep(2)
-        
-        # 等待本批次所有執行緒完成
-        for thread in threads:
-            thread.join()
-        
-        print(f"\n{'='*50}")
-        print(Fore.GREEN + f"第 {batch_num + 1}/{total_batches} 批次完成！" + Style.RESET_ALL)
-        print(f"{'='*50}\n")
-        
-        # 如果不是最後一批，稍作休息
-        if batch_num < total_batches - 1:
-            print(Fore.CYAN + "等待 5 秒後執行下一批次...\n" + Style.RESET_ALL)
-            time.sleep(5)
+    # 建立瀏覽器連線池並預先啟動所有 worker 需要的瀏覽器
+    pool = DriverPool(init_driver, size=workers, max_uses=DRIVER_MAX_USES)
+    if pool.prewarm(workers) == 0:
+        # 一個瀏覽器都無法啟動（通常是沒有安裝 Chrome），不需要繼續
+        pool.close()
+        print(Fore.RED + "無法啟動任何 Chrome 瀏覽器，程式結束" + Style.RESET_ALL)
+        input("\n按 Enter 結束...")
+        sys.exit(1)
+    
+    # 定時印出進度：以代理數計算速率與預估剩餘時間，另外顯示已調整的會員數
+    monitor = metrics.RunMonitor(metrics.agents_done, total=total_accounts, unit="個代理",
+                                 interval=args.status_interval, port=args.metrics_port,
+                                 extras=[("已調整會員", metrics.members_adjusted)])
+    monitor.watch_pool(pool)
+    monitor.start()
+    
+    # 保存的登入狀態（--reuse-login），沿用時省下登入表單的時間
+    session_store = open_store(args)
+    
+    work_queue = WorkerPool(concurrency=workers, name="Thread")
+    for username_text, password_text, num in accounts:
+        work_queue.submit(username_text, process_single_account,
+                          username_text, password_text, num, pool, args.plan_only,
+                          targets.get(username_text), journal, session_store, args.search_shortcut)
+    jobs = work_queue.run()
+    monitor.stop()
+    
+    pool.close()
+    
+    if journal is not None:
+        unfinished = [a[0] for a in accounts if not agent_done(journal, a[0], a[2])]
+        if unfinished:
+            print(Fore.YELLOW + f"{len(unfinished)} 個帳號未完成（{', '.join(unfinished)}），"
+                  f"重新執行會從執行紀錄繼續" + Style.RESET_ALL)
+        else:
+            journal.finish()
+        journal.close()
+    
+    failed = [job.job_id for job in jobs if not job.ok]
+    if failed:
+        print(Fore.RED + f"以下 {len(failed)} 個帳號處理失敗或未完成：{', '.join(failed)}" + Style.RESET_ALL)
+    
+    # 依帳號檔順序合併各代理的計畫（未完成的代理也保留已掃描到的部分）
+    plan = [entry for job in jobs if job.result for entry in job.result]
+    if args.plan_only:
+        write_plan_csv(plan, args.plan_file)
+        print(Fore.GREEN + f"對帳計畫已輸出：{args.plan_file}（共 {len(plan)} 筆）" + Style.RESET_ALL)
     
     print("\n" + "="*50)
     print(Fore.GREEN + "所有帳號處理完畢！" + Style.RESET_ALL)
+    print(Fore.CYAN + work_queue.summary() + Style.RESET_ALL)
+    print(Fore.CYAN + pool.summary() + Style.RESET_ALL)
+    if session_store is not None:
+        print(Fore.CYAN + session_store.summary() + Style.RESET_ALL)
+    print(Fore.CYAN + waits.stats.summary() + Style.RESET_ALL)
+    try:
+        metrics_path = monitor.dump(os.path.join(get_output_dir(), "執行指標.json"))
+        print(Fore.CYAN + f"{monitor.summary()}（已寫入 {metrics_path}）" + Style.RESET_ALL)
+    except OSError as e:
+        log_error(f"儲存執行指標失敗：{e}")
+    trace_path = tracing.save()
+    if trace_path:
+        print(Fore.CYAN + f"{tracing.tracer.summary()}，已輸出：{trace_path}" + Style.RESET_ALL)
     print("="*50)
     
     input("\n按 Enter 結束...")
@@ -0,0 +1,37 @@
+"""
+報表快取：只有非空的已結束週期結果會寫入
+"""
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "get_report"))
+
+from report_cache import ReportCache  # noqa: E402
+
+START = date(2026, 10, 5)
+ROWS = [{"帳號": "m001", "報表週期": "上週", "應收下線": "120.00"}]
+
+
+def test_put_and_get_rows(tmp_path):
+    cache = ReportCache(str(tmp_path))
+    assert cache.put("agent1", START, "上週", ROWS) is True
+    assert cache.get("agent1", START, "上週") == ROWS
+    assert cache.stored == 1
+
+
+def test_empty_rows_are_not_cached(tmp_path):
+    # 報表尚未載入完成就逾時時會解析出空列表，不能當成「無資料」快取下來
+    cache = ReportCache(str(tmp_path))
+    assert cache.put("agent1", START, "上週", []) is False
+    assert cache.get("agent1", START, "上週") is None
+    assert cache.stored == 0
+    assert cache.skipped_empty == 1
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_empty_rows_do_not_overwrite_existing_entry(tmp_path):
+    cache = ReportCache(str(tmp_path))
+    cache.put("agent1", START, "上週", ROWS)
+    cache.put("agent1", START, "上週", [])
+    assert cache.get("agent1", START, "上週") == ROWS